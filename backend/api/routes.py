@@ -1,46 +1,56 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Request
 from backend.schemas.request import MachineData
-from backend.schemas.response import PredictionResponse
+from backend.schemas.response import PredictionResponse, BatchPredictionResponse
+from backend.schemas import wire
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
 from backend.services.ml_service import ml_service
+from backend.services.model_registry import ModelVersionNotLoaded, validate_version
+from backend.services.batch_scheduler import prediction_scheduler, SchedulerOverloaded
+from backend.services.ingest_queue import ingest_pipeline, IngestQueueFull
+from backend.services.bulk_ingest import score_ndjson_stream
+from backend.services.drift_monitor import drift_monitor
+from backend.services.prediction_store import prediction_store
+from datetime import datetime
 from backend.utils.logger import setup_logger
 from backend.auth.utils import verify_token
 from fastapi.security import OAuth2PasswordBearer
-from typing import Annotated
+from typing import Annotated, Literal, Optional
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import ClientDisconnect
+import asyncio
 
 # RNN Implementation imports
-from backend.schemas.request import SequencePredictionRequest
-from backend.models.rnn_model import PredictiveRNN, create_sequences
-import torch
-import os
-import joblib
+from backend.schemas.request import (
+    SequencePredictionRequest, SequenceStepRequest, SequenceStepBatchRequest, BatchPredictionRequest, MAX_BATCH_READINGS
+)
+from backend.schemas.response import SequenceStepResponse, SequenceStepBatchResponse
+from backend.services.sequence_sessions import (
+    sequence_sessions, sequence_row, zscore_score, zscore_probability, blend_probability, SEQUENCE_LSTM_WEIGHT
+)
+from backend.services.sequence_models import sequence_models
+from backend.services.lstm_batching import sequence_window_batcher
 import numpy as np
-from fastapi.responses import StreamingResponse
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from backend.utils.sensor_simulator import SensorSimulator
+from backend.utils.metrics import CONTENT_TYPE_LATEST, metrics_collector
+from backend.utils.http_metrics import MeteredRoute
+from backend.utils.profiling import ProfilerBusy, memory_profiler, request_profiler, stack_sampler
 
 logger = setup_logger(__name__)
-router = APIRouter()
+router = APIRouter(route_class=MeteredRoute)
+
+_PARSE = metrics_collector.stage("predict", "parse")
+_PARSE_BATCH = metrics_collector.stage("predict_batch", "parse")
+_SEQ_BUILD_MATRIX = metrics_collector.stage("sequence", "build_matrix")
+_SEQ_SCALE = metrics_collector.stage("sequence", "scale")
+_SEQ_ZSCORE = metrics_collector.stage("sequence", "zscore")
+_SEQ_LSTM = metrics_collector.stage("sequence", "lstm")
+_SEQ_LOG = metrics_collector.stage("sequence", "log")
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-# Initialize RNN Model and LOAD TRAINED WEIGHTS
-MODEL_PATH = os.path.join("ml", "lstm_car_engine.pt")
-SCALER_PATH = os.path.join("ml", "scaler_car_engine.pkl")
-
-rnn_model = PredictiveRNN(input_size=5)
-if os.path.exists(MODEL_PATH):
-    rnn_model.load_state_dict(torch.load(MODEL_PATH, map_location=torch.device('cpu')))
-    logger.info(f"LSTM weights loaded from {MODEL_PATH}")
-else:
-    logger.warning(f"LSTM weights NOT FOUND at {MODEL_PATH}! Model will output random predictions (~0.5).")
-rnn_model.eval()
-
-# Preload scaler at startup
-inference_scaler = None
-if os.path.exists(SCALER_PATH):
-    inference_scaler = joblib.load(SCALER_PATH)
-    logger.info(f"Inference scaler loaded from {SCALER_PATH}")
-else:
-    logger.warning(f"Scaler NOT FOUND at {SCALER_PATH}! Inference will run on unscaled data.")
+# The LSTM and its scaler are loaded lazily by sequence_models (warmed up from main.lifespan)
 
 async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]):
     payload = verify_token(token)
@@ -52,29 +62,234 @@ async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]):
         )
     return payload
 
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+async def require_admin(user: Annotated[dict, Depends(get_current_user)]):
+    if user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Admin role required")
+    return user
+
+def requested_model_version(
+    model_version: Annotated[Optional[str], Query()] = None,
+    x_model_version: Annotated[Optional[str], Header()] = None
+) -> Optional[str]:
+    """Version pin from ?model_version= or the X-Model-Version header (query wins)."""
+    version = model_version or x_model_version
+    if version is not None:
+        try:
+            validate_version(version)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    return version
+
 from starlette.status import HTTP_202_ACCEPTED
 
-@router.post("/predict", response_model=PredictionResponse)
-def predict(data: MachineData, user: Annotated[dict, Depends(get_current_user)]):
-    # Changed to def (sync) to run in threadpool, avoiding event loop blocking by CPU-bound ML
-    logger.info("Received prediction request", extra={"udi": data.udi, "user": user['sub']})
+def _body_schema(model) -> dict:
+    """OpenAPI requestBody for endpoints that take JSON or the binary telemetry format."""
+    return {"requestBody": {"required": True, "content": {
+        "application/json": {"schema": model.model_json_schema(ref_template="#/components/schemas/{model}")},
+        wire.CONTENT_TYPE: {"schema": {"type": "string", "format": "binary"}}
+    }}}
+
+async def read_telemetry_body(request: Request, model):
+    """
+    Parses the body according to Content-Type. Returns (udis, raw) for the
+    binary telemetry format, decoded without per-field objects, or a
+    validated `model` instance for JSON.
+    """
+    content_type = request.headers.get("content-type", "application/json").split(";")[0].strip().lower()
+    body = await request.body()
+    if content_type == wire.CONTENT_TYPE:
+        try:
+            return wire.decode(body)
+        except wire.WireFormatError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    if content_type != "application/json":
+        raise HTTPException(status_code=415, detail=f"Unsupported Content-Type: {content_type}")
+    try:
+        return model.model_validate_json(body)
+    except ValidationError as e:
+        raise RequestValidationError(e.errors(include_url=False))
+
+@router.post("/predict", response_model=PredictionResponse, openapi_extra=_body_schema(MachineData))
+async def predict(
+    request: Request,
+    user: Annotated[dict, Depends(get_current_user)],
+    version: Annotated[Optional[str], Depends(requested_model_version)]
+):
+    """
+    Scores one reading, sent as MachineData JSON or as a single-record
+    `application/x-telemetry-f32` body.
+    """
+    with _PARSE.time():
+        body = await read_telemetry_body(request, MachineData)
+    if isinstance(body, MachineData):
+        udi, row = body.udi, None
+    else:
+        udis, raw = body
+        if len(raw) != 1:
+            raise HTTPException(status_code=400, detail=f"/predict takes exactly one record, got {len(raw)}")
+        udi, row = wire.udi_list(udis, 1)[0], raw[0]
+
+    # CPU-bound scoring never runs on the event loop: either the micro-batch
+    # worker thread picks it up, or it goes to the threadpool.
+    logger.info("Received prediction request", extra={"udi": udi, "user": user['sub']})
     try:
-        result = ml_service.predict(data)
+        if prediction_scheduler is not None:
+            future = prediction_scheduler.submit(body, version) if row is None else prediction_scheduler.submit_raw(row, version, udi)
+            result = await asyncio.wrap_future(future)
+        elif row is None:
+            result = await run_in_threadpool(ml_service.predict, body, version)
+        else:
+            result = (await run_in_threadpool(ml_service.predict_matrix, row[None, :], version, [udi]))["results"][0]
         return PredictionResponse(**result)
+    except ModelVersionNotLoaded as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    except SchedulerOverloaded as e:
+        logger.warning("Prediction queue full, rejecting request", extra={"error": str(e)})
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
         logger.error("Error processing prediction request", extra={"error": str(e)})
         raise HTTPException(status_code=500, detail=str(e))
 
-def process_background_prediction(data: MachineData):
-    """Background task wrapper for prediction."""
+@router.post("/predict/batch", response_model=BatchPredictionResponse, openapi_extra=_body_schema(BatchPredictionRequest))
+async def predict_batch(
+    request: Request,
+    user: Annotated[dict, Depends(get_current_user)],
+    version: Annotated[Optional[str], Depends(requested_model_version)]
+):
+    """
+    Scores many readings in one call. The whole batch goes through the scaler
+    and both forests as a single matrix, so per-row overhead is paid once.
+    Accepts BatchPredictionRequest JSON or an `application/x-telemetry-f32`
+    body, which is decoded straight into the input matrix.
+    """
+    with _PARSE_BATCH.time():
+        body = await read_telemetry_body(request, BatchPredictionRequest)
+    if isinstance(body, BatchPredictionRequest):
+        raw = None
+        batch_size = len(body.readings)
+    else:
+        udis, raw = body
+        batch_size = len(raw)
+        if not 1 <= batch_size <= MAX_BATCH_READINGS:
+            raise HTTPException(status_code=400, detail=f"Batch must hold 1 to {MAX_BATCH_READINGS} records, got {batch_size}")
+
+    logger.info("Received batch prediction request", extra={"batch_size": batch_size, "user": user['sub']})
     try:
-        # We process it, but since it's fire-and-forget, we just log the result.
-        # In a real system, you'd save to DB or push to another queue.
-        ml_service.predict(data)
+        if raw is None:
+            result = await run_in_threadpool(ml_service.predict_batch, body.readings, version)
+        else:
+            result = await run_in_threadpool(ml_service.predict_matrix, raw, version, wire.udi_list(udis, batch_size))
+        return BatchPredictionResponse(**result)
+    except ModelVersionNotLoaded as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
     except Exception as e:
-        # Logger inside ml_service.predict already handles errors, but just in case
-        logger.error("Background prediction failed", extra={"error": str(e)})
+        logger.error("Error processing batch prediction request", extra={"error": str(e)})
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/models")
+def list_models(user: Annotated[dict, Depends(require_admin)]):
+    """Loaded and recently requested model versions, with load status and approximate size."""
+    return {"active": ml_service.version, "versions": ml_service.list_versions()}
+
+@router.post("/models/{version}/load", status_code=HTTP_202_ACCEPTED)
+def load_model(version: str, user: Annotated[dict, Depends(require_admin)]):
+    """
+    Starts loading and warming `version` in the background. Poll GET /models
+    until it reports "ready", then pin it per request or activate it.
+    """
+    try:
+        ml_service.load_version(version)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    logger.info("Model version load requested", extra={"version": version, "user": user['sub']})
+    return {"status": "loading", "version": version}
+
+@router.post("/models/{version}/activate")
+def activate_model(version: str, user: Annotated[dict, Depends(require_admin)]):
+    """Atomically switches unpinned traffic to `version` (loading it first if needed)."""
+    try:
+        info = ml_service.activate_version(version)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error("Model activation failed", extra={"version": version, "error": str(e)})
+        raise HTTPException(status_code=500, detail=str(e))
+    logger.info("Model version activated", extra={"version": version, "user": user['sub']})
+    return {"status": "active", **info}
+
+@router.get("/admin/profile/cpu", response_class=PlainTextResponse)
+async def profile_cpu(
+    user: Annotated[dict, Depends(require_admin)],
+    seconds: Annotated[float, Query(gt=0, le=60)] = 10.0,
+    interval_ms: Annotated[float, Query(ge=1, le=1000)] = 5.0,
+    include_idle: bool = False
+):
+    """
+    Samples every thread's stack for `seconds` and returns collapsed stacks
+    ("frame;frame;frame count" per line), ready for flamegraph.pl or
+    speedscope. The sampling runs in a worker thread, so the event loop
+    (and any SSE generator on it) keeps serving and shows up in the output.
+    """
+    logger.info("CPU profile requested", extra={"seconds": seconds, "user": user['sub']})
+    try:
+        result = await asyncio.to_thread(stack_sampler.sample, seconds, interval_ms / 1000.0, include_idle)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return PlainTextResponse(result["collapsed"], headers={"X-Profile-Samples": str(result["samples"])})
+
+@router.post("/admin/profile/memory/start")
+def start_memory_profile(user: Annotated[dict, Depends(require_admin)], frames: Annotated[int, Query(ge=1, le=50)] = 1):
+    """Starts tracemalloc with `frames` frames per allocation traceback. Slows allocations until stopped."""
+    try:
+        memory_profiler.start(frames)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    logger.info("Memory profiling started", extra={"frames": frames, "user": user['sub']})
+    return {"status": "tracing", "frames": frames}
+
+@router.get("/admin/profile/memory")
+def memory_profile(
+    user: Annotated[dict, Depends(require_admin)],
+    top: Annotated[int, Query(ge=1, le=500)] = 25,
+    group_by: Literal["lineno", "filename", "traceback"] = "lineno",
+    compare: bool = False
+):
+    """Top allocation sites now, or their growth since the session started with `compare=true`."""
+    try:
+        return memory_profiler.snapshot(top, group_by, compare)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@router.post("/admin/profile/memory/stop")
+def stop_memory_profile(user: Annotated[dict, Depends(require_admin)]):
+    memory_profiler.stop()
+    return {"status": "stopped"}
+
+@router.post("/admin/profile/requests")
+def start_request_profiling(user: Annotated[dict, Depends(require_admin)], fraction: Annotated[float, Query(gt=0, le=1)] = 0.01):
+    """
+    Opens a cProfile window for a sampled `fraction` of API requests (one at
+    a time) and aggregates the windows by route. cProfile sees the whole
+    interpreter, so the stats include other requests and threads that ran
+    meanwhile. Clears earlier results.
+    """
+    request_profiler.start(fraction)
+    logger.info("Request profiling enabled", extra={"fraction": fraction, "user": user['sub']})
+    return {"status": "enabled", "fraction": fraction}
+
+@router.get("/admin/profile/requests")
+def request_profile(
+    user: Annotated[dict, Depends(require_admin)],
+    top: Annotated[int, Query(ge=1, le=500)] = 30,
+    sort: Literal["cumulative", "tottime", "calls"] = "cumulative"
+):
+    return request_profiler.report(top, sort)
+
+@router.delete("/admin/profile/requests")
+def stop_request_profiling(user: Annotated[dict, Depends(require_admin)]):
+    """Stops sampling; collected results stay readable until the next start."""
+    request_profiler.stop()
+    return {"status": "disabled"}
 
 @router.post("/predict/sequence", response_model=PredictionResponse)
 def predict_sequence(data: SequencePredictionRequest):
@@ -84,52 +299,33 @@ def predict_sequence(data: SequencePredictionRequest):
     """
     logger.info("Received sequence prediction request", extra={"user": "anonymous", "seq_length": len(data.sequence)})
     try:
-        # Convert List[MachineData] to 2D array
         # MUST match the training feature order: engine_rpm, oil_pressure_psi, coolant_temp_c, vibration_level, engine_temp_c
-        raw_data = []
-        for d in data.sequence:
-            raw_data.append([
-                d.engine_rpm or 0.0,
-                d.oil_pressure_psi or 0.0,
-                d.coolant_temp_c or 0.0,
-                d.vibration_level or 0.0,
-                d.engine_temp_c or 0.0
-            ])
-        
-        raw_data = np.array(raw_data)
+        with _SEQ_BUILD_MATRIX.time():
+            raw_data = np.array([sequence_row(d) for d in data.sequence])
+        inference_scaler = sequence_models.inference_scaler
         
         # Z-Score Anomaly Scoring using the training scaler's learned distribution
         # This is scientifically sound: it measures how far each feature deviates
         # from the training distribution in units of standard deviation
         if inference_scaler is not None:
-            scaled_data = inference_scaler.transform(raw_data)
-            
-            # Use the LAST sample in the window (most recent reading)
-            last_scaled = scaled_data[-1]
-            
-            # Directional z-score weighting:
-            # - High coolant_temp (idx=2) and vibration (idx=3) and engine_temp (idx=4) = BAD
-            # - Low oil_pressure (idx=1) = BAD
-            # Feature order: [engine_rpm, oil_pressure_psi, coolant_temp_c, vibration_level, engine_temp_c]
-            anomaly_score = 0.0
-            anomaly_score += abs(last_scaled[0]) * 0.1    # RPM deviation (mild)
-            anomaly_score += max(-last_scaled[1], 0) * 0.3  # Oil pressure DROP is bad
-            anomaly_score += max(last_scaled[2], 0) * 0.3   # Coolant temp HIGH is bad
-            anomaly_score += max(last_scaled[3], 0) * 0.2   # Vibration HIGH is bad
-            anomaly_score += max(last_scaled[4], 0) * 0.2   # Engine temp HIGH is bad
+            with _SEQ_SCALE.time():
+                scaled_data = inference_scaler.transform(raw_data)
             
-            # Also factor in the TREND across the window (not just last point)
-            if len(scaled_data) >= 2:
-                trend_coolant = scaled_data[-1][2] - scaled_data[0][2]
-                trend_vibration = scaled_data[-1][3] - scaled_data[0][3]
-                trend_pressure = scaled_data[0][1] - scaled_data[-1][1]  # Drop is positive
-                trend_score = max(trend_coolant, 0) * 0.1 + max(trend_vibration, 0) * 0.1 + max(trend_pressure, 0) * 0.1
-                anomaly_score += trend_score
+            # Use the LAST sample in the window (most recent reading), and the
+            # TREND across the window (not just last point)
+            with _SEQ_ZSCORE.time():
+                last_scaled = scaled_data[-1]
+                anomaly_score = zscore_score(last_scaled, scaled_data[0] if len(scaled_data) >= 2 else None)
+                prob = zscore_probability(anomaly_score)
+            if SEQUENCE_LSTM_WEIGHT:
+                # Batched with concurrent requests' windows into one LSTM forward
+                with _SEQ_LSTM.time():
+                    lstm_prob = sequence_window_batcher.window_probability(scaled_data)
+                prob = blend_probability(prob, lstm_prob, SEQUENCE_LSTM_WEIGHT)
             
-            # Sigmoid mapping: score of 0 -> ~0.05, score of 2 -> ~0.5, score of 4 -> ~0.95
-            prob = float(1.0 / (1.0 + np.exp(-(anomaly_score - 2.0) * 1.5)))
-            
-            logger.info(f"Z-score anomaly_score={anomaly_score:.3f}, mapped prob={prob:.4f}, last_scaled={last_scaled.tolist()}")
+            with _SEQ_LOG.time():
+                logger.info("Z-score anomaly_score=%.3f, mapped prob=%.4f, last_scaled=%s",
+                            anomaly_score, prob, last_scaled.tolist(), extra={"sample_key": "Z-score anomaly"})
         else:
             # Fallback: just use 0.5 if no scaler
             prob = 0.5
@@ -147,37 +343,200 @@ def predict_sequence(data: SequencePredictionRequest):
         logger.error("Error processing sequence prediction request", extra={"error": str(e)})
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/ingest", status_code=HTTP_202_ACCEPTED)
-async def ingest_sensor_data(data: MachineData, background_tasks: BackgroundTasks):
+@router.post("/predict/sequence/stream", response_model=SequenceStepResponse)
+def predict_sequence_step(data: SequenceStepRequest):
+    """
+    Streaming variant of /predict/sequence: send only the newest reading and
+    a device id. The server keeps the device's window (z-score term) and
+    advances the LSTM one step on the device's carried hidden state.
+    """
+    try:
+        step = sequence_sessions.step(data.device_id, sequence_row(data.reading))
+    except Exception as e:
+        logger.error("Error processing sequence step", extra={"device_id": data.device_id, "error": str(e)})
+        raise HTTPException(status_code=500, detail=str(e))
+    return _step_response(data.device_id, step)
+
+@router.post("/predict/sequence/stream/batch", response_model=SequenceStepBatchResponse)
+def predict_sequence_steps(data: SequenceStepBatchRequest):
+    """
+    /predict/sequence/stream for many devices at once, e.g. from a gateway
+    fanning in a fleet. Steps are applied in order and the LSTM advances
+    all listed devices in one batched call.
+    """
+    device_ids = [s.device_id for s in data.steps]
+    try:
+        steps = sequence_sessions.step_many(device_ids, np.stack([sequence_row(s.reading) for s in data.steps]))
+    except Exception as e:
+        logger.error("Error processing sequence step batch", extra={"devices": len(device_ids), "error": str(e)})
+        raise HTTPException(status_code=500, detail=str(e))
+    return SequenceStepBatchResponse(
+        results=[_step_response(device_id, step) for device_id, step in zip(device_ids, steps)],
+        batch_size=len(steps)
+    )
+
+def _step_response(device_id: str, step) -> SequenceStepResponse:
+    is_anomaly = bool(step.failure_probability > 0.5)
+    return SequenceStepResponse(
+        anomaly=is_anomaly,
+        failure_probability=step.failure_probability,
+        prediction=1 if is_anomaly else 0,
+        device_id=device_id,
+        window_samples=step.samples,
+        zscore_probability=step.zscore_probability,
+        lstm_probability=step.lstm_probability
+    )
+
+@router.delete("/predict/sequence/stream/{device_id}")
+def end_sequence_session(device_id: str):
+    """Drops a device's streaming window (e.g. when the vehicle stops)."""
+    if not sequence_sessions.end(device_id):
+        raise HTTPException(status_code=404, detail="No open session for this device")
+    return {"status": "closed", "device_id": device_id}
+
+@router.post("/ingest", status_code=HTTP_202_ACCEPTED, openapi_extra=_body_schema(MachineData))
+async def ingest_sensor_data(request: Request):
     """
     High-throughput ingestion endpoint.
-    Returns 202 Accepted immediately.
+    Returns 202 Accepted immediately; readings are scored in batches by the
+    ingest consumers. Returns 429 with Retry-After when the queue is full.
+    Takes one MachineData JSON object, or any number of records in the
+    `application/x-telemetry-f32` format (accepted or rejected as a whole).
+    """
+    body = await read_telemetry_body(request, MachineData)
+    try:
+        if isinstance(body, MachineData):
+            logger.info("Received ingestion request", extra={"udi": body.udi})
+            ingest_pipeline.offer(body)
+            accepted = 1
+        else:
+            udis, raw = body
+            logger.info("Received binary ingestion request", extra={"records": len(raw)})
+            ingest_pipeline.offer_many(raw, wire.udi_list(udis, len(raw)))
+            accepted = len(raw)
+    except IngestQueueFull as e:
+        logger.warning("Ingest queue full, rejecting reading", extra={"error": str(e)})
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+    return {"status": "processing", "message": "Data accepted for background processing", "accepted": accepted}
+
+class _DuplexStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse for a body iterator that is still reading the request
+    body. Starlette's disconnect listener would take those body messages off
+    `receive` before the iterator sees them, and the stream would wait
+    forever, so this one streams without it. A client that goes away
+    surfaces as ClientDisconnect from request.stream() instead.
+    """
+    async def __call__(self, scope, receive, send):
+        try:
+            await self.stream_response(send)
+        except OSError:
+            raise ClientDisconnect()
+
+@router.post("/ingest/bulk")
+async def ingest_bulk(request: Request, version: Annotated[Optional[str], Depends(requested_model_version)]):
     """
-    logger.info("Received ingestion request", extra={"udi": data.udi})
-    background_tasks.add_task(process_background_prediction, data)
-    return {"status": "processing", "message": "Data accepted for background processing"}
+    Streaming backfill endpoint. The body is NDJSON (one MachineData object
+    per line), optionally with `Content-Encoding: gzip`. Records are parsed
+    as they arrive, scored in fixed-size chunks and answered with one NDJSON
+    result line per record plus a final summary line, so memory stays flat
+    regardless of upload size.
+    """
+    encoding = request.headers.get("content-encoding", "identity").lower()
+    if encoding not in ("identity", "gzip"):
+        raise HTTPException(status_code=415, detail=f"Unsupported Content-Encoding: {encoding}")
+    await run_in_threadpool(ml_service.ensure_loaded)
+    try:
+        ml_service.registry.get(version)
+    except ModelVersionNotLoaded as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+
+    logger.info("Received bulk ingestion request", extra={"content_encoding": encoding, "model_version": version})
+    return _DuplexStreamingResponse(
+        score_ndjson_stream(request.stream(), gzipped=encoding == "gzip", version=version, store=prediction_store),
+        media_type="application/x-ndjson"
+    )
+
+@router.get("/predictions")
+def query_predictions(
+    user: Annotated[dict, Depends(get_current_user)],
+    udi: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: Annotated[int, Query(ge=0, le=10000)] = 100
+):
+    """
+    Stored predictions from /ingest and /ingest/bulk, filtered by UDI and a
+    [start, end) time range. Returns aggregates over every match plus the
+    `limit` most recent rows.
+    """
+    if prediction_store is None:
+        raise HTTPException(status_code=404, detail="Prediction store is disabled")
+    return prediction_store.query(
+        udi=udi,
+        start=start.timestamp() if start else None,
+        end=end.timestamp() if end else None,
+        limit=limit
+    )
 
-from fastapi.responses import PlainTextResponse
-from backend.utils.metrics import metrics_collector
 
 @router.get("/metrics", response_class=PlainTextResponse)
 def metrics():
     """
     Exposes operational metrics in Prometheus format.
     """
-    return metrics_collector.generate_latest()
+    return PlainTextResponse(metrics_collector.generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 @router.get("/drift")
 def get_drift():
     """
     Returns data drift report comparing recent requests to training data.
+    While the background drift monitor runs this is its latest report.
     """
     try:
-        return ml_service.get_drift_report()
+        report = drift_monitor.latest()
+        return report if report is not None else ml_service.get_drift_report()
     except Exception as e:
         logger.error("Error generating drift report", extra={"error": str(e)}, exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/drift/segments")
+def get_top_drifted_segments(
+    top: Annotated[int, Query(ge=1, le=1000)] = 10,
+    dimension: Annotated[Optional[Literal["device", "type"]], Query()] = None
+):
+    """
+    The `top` most drifted keys ("device:<udi group>" and/or "type:<L|M|H>"),
+    ranked by their smallest per-feature p-value. Keys with fewer than 50
+    recent readings are left out.
+    """
+    try:
+        return ml_service.get_top_drifted_segments(top, dimension)
+    except Exception as e:
+        logger.error("Error ranking segment drift", extra={"error": str(e)}, exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/drift/segments/merged")
+def get_merged_segment_drift(dimension: Annotated[Literal["device", "type"], Query()] = "device"):
+    """Drift report over the summed sketches of every key in `dimension`."""
+    try:
+        return ml_service.get_merged_segment_drift(dimension)
+    except Exception as e:
+        logger.error("Error merging segment drift", extra={"error": str(e)}, exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/drift/segments/{key}")
+def get_segment_drift(key: str):
+    """Drift report for one key, e.g. /drift/segments/device:42 or /drift/segments/type:H."""
+    try:
+        report = ml_service.get_segment_drift(key)
+    except Exception as e:
+        logger.error("Error generating segment drift report", extra={"error": str(e), "key": key}, exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+    if report is None:
+        raise HTTPException(status_code=404, detail=f"No drift data for segment {key!r}")
+    return report
+
 @router.get("/explain")
 def explain_model():
     """
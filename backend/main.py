@@ -1,5 +1,10 @@
+import os
+import time
+_import_started = time.perf_counter()
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from starlette.middleware.sessions import SessionMiddleware
 from contextlib import asynccontextmanager
 import asyncio
@@ -7,14 +12,53 @@ from backend.api import routes
 from backend.routers import auth
 from backend.auth.database import init_db
 from backend.auth.config import settings
+from backend.services.batch_scheduler import prediction_scheduler
+from backend.services.drift_monitor import drift_monitor
+from backend.services.ingest_queue import ingest_pipeline
+from backend.services.prediction_store import prediction_store
+from backend.services.ml_service import ml_service
+from backend.services.sequence_models import sequence_models
+from backend.services.lstm_batching import sequence_window_batcher
+from backend.services.sequence_sessions import SEQUENCE_LSTM_WEIGHT
+from backend.utils.startup import startup_report
+from backend.utils.http_metrics import RequestMetricsMiddleware
+from backend.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "true").lower() in ("1", "true", "yes", "on")
+
+def warm_up_models():
+    """Loads every model family off the event loop so the first requests don't pay for it."""
+    try:
+        ml_service.ensure_loaded()
+        sequence_models.load_all()
+        if SEQUENCE_LSTM_WEIGHT:
+            sequence_window_batcher.warm_up()
+        logger.info("Models warm", extra=startup_report.snapshot())
+    except Exception as e:
+        logger.error("Model warm-up failed", extra={"error": str(e)}, exc_info=True)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    init_db()
+    with startup_report.track("auth_db"):
+        init_db()
+    warmup = asyncio.create_task(asyncio.to_thread(warm_up_models)) if WARMUP_ON_STARTUP else None
+    drift_monitor.start()
     # task = asyncio.create_task(consume_loop()) -> Removed Kafka
     yield
     # Shutdown
+    if warmup is not None and not warmup.done():
+        await warmup
+    await drift_monitor.stop()
+    await ingest_pipeline.stop()
+    if prediction_store is not None:
+        await asyncio.to_thread(prediction_store.close)
+    if prediction_scheduler is not None:
+        prediction_scheduler.stop()
+    sequence_window_batcher.stop()
+    ml_service.shutdown()
     # task.cancel()
     # try:
     #     await task
@@ -45,17 +89,37 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Outermost, so latency covers the other middleware too
+app.add_middleware(RequestMetricsMiddleware)
+
 app.include_router(routes.router, prefix="/api", tags=["Prediction"])
 app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
 
+startup_report.record("app_import", time.perf_counter() - _import_started)
+
 @app.get("/")
 def health_check():
     return {"status": "ok", "message": "Predictive Maintenance System is running"}
 
+@app.get("/ready")
+def readiness_check():
+    """
+    Unlike `/` (process is up), this returns 200 only once every model
+    family is loaded and 503 while warming. The body breaks startup time
+    down per component either way. A prediction store that could not be
+    opened is reported in the body but does not fail readiness: scoring
+    still works, only persistence is lost.
+    """
+    ready = ml_service.loaded and sequence_models.loaded
+    report = {"status": "ready" if ready else "warming", **startup_report.snapshot()}
+    if prediction_store is not None:
+        report["prediction_store"] = prediction_store.status()
+    return JSONResponse(status_code=200 if ready else 503, content=report)
+
 from fastapi.responses import PlainTextResponse
-from backend.utils.metrics import metrics_collector
+from backend.utils.metrics import CONTENT_TYPE_LATEST, metrics_collector
 
 @app.get("/metrics", response_class=PlainTextResponse)
 def metrics():
-    return metrics_collector.generate_latest()
+    return PlainTextResponse(metrics_collector.generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
@@ -1,5 +1,6 @@
 import torch
 import torch.nn as nn
+from torch.utils.data import BatchSampler, DataLoader, Dataset, RandomSampler, SequentialSampler
 import numpy as np
 import logging
 
@@ -48,23 +49,90 @@ class PredictiveRNN(nn.Module):
         out = self.fc(out[:, -1, :])
         return out
 
-def create_sequences(data: list[list[float]], seq_length: int = 10):
+def create_sequences(data, seq_length: int = 10):
     """
     Takes a 2D array or list of tabular data (samples x features) and creates 
     sliding temporal windows of size seq_length.
+
+    The windows are a read-only strided view over `data` (when it is already
+    an ndarray), so no window is copied; index it to materialize only the
+    windows you need.
     
     Returns:
         np.ndarray of shape (num_samples - seq_length + 1, seq_length, num_features)
     """
+    data = np.asarray(data)
     if len(data) < seq_length:
         logger.warning(f"Data length {len(data)} is shorter than sequence length {seq_length}. Using entire data as one sequence.")
         seq_length = len(data)
         if seq_length == 0:
             return np.array([])
-    
-    sequences = []
-    for i in range(len(data) - seq_length + 1):
-        seq = data[i:i + seq_length]
-        sequences.append(seq)
-    
-    return np.array(sequences)
+
+    # sliding_window_view puts the window axis last: (windows, features, seq_length)
+    return np.lib.stride_tricks.sliding_window_view(data, seq_length, axis=0).transpose(0, 2, 1)
+
+def sequence_end_indices(n_rows: int, seq_length: int, group_ids=None) -> np.ndarray:
+    """
+    Row index of the last reading of every seq_length window. With
+    `group_ids` (e.g. vehicle_id per row, rows grouped and time-ordered),
+    windows that would span two groups are left out.
+    """
+    if n_rows < seq_length:
+        return np.empty(0, dtype=np.int64)
+    ends = np.arange(seq_length - 1, n_rows, dtype=np.int64)
+    if group_ids is not None:
+        group_ids = np.asarray(group_ids)
+        # Running count of group changes; a window is clean if it is equal at both ends
+        boundaries = np.concatenate(([0], np.cumsum(group_ids[1:] != group_ids[:-1])))
+        ends = ends[boundaries[ends] == boundaries[ends - seq_length + 1]]
+    return ends
+
+class SequenceWindowDataset(Dataset):
+    """
+    LSTM training windows over a (rows, features) matrix without building
+    them up front: only the scaled matrix is held, and indexing with a list
+    of positions copies out just that mini-batch of windows. Use it with
+    window_loader() so each fetch is one vectorized batch.
+    """
+    def __init__(self, data, targets, seq_length: int = 10, group_ids=None, ends=None):
+        self.data = np.ascontiguousarray(data, dtype=np.float32)
+        self.targets = np.asarray(targets, dtype=np.float32)
+        self.seq_length = seq_length
+        self.ends = sequence_end_indices(len(self.data), seq_length, group_ids) if ends is None else ends
+        self._windows = create_sequences(self.data, seq_length) if len(self.ends) else None
+
+    def __len__(self):
+        return len(self.ends)
+
+    def __getitem__(self, index):
+        ends = self.ends[index]
+        x = torch.from_numpy(np.ascontiguousarray(self._windows[ends - self.seq_length + 1]))
+        y = torch.from_numpy(np.asarray(self.targets[ends])).unsqueeze(-1)
+        return x, y
+
+    def subset(self, start: int, stop: int | None = None) -> "SequenceWindowDataset":
+        """Windows [start, stop) in order, sharing this dataset's arrays."""
+        return SequenceWindowDataset(self.data, self.targets, self.seq_length, ends=self.ends[start:stop])
+
+    @property
+    def window_targets(self) -> np.ndarray:
+        return self.targets[self.ends]
+
+def window_loader(dataset: SequenceWindowDataset, batch_size: int = 256, shuffle: bool = False,
+                  num_workers: int = 0, seed: int = 0) -> DataLoader:
+    """
+    DataLoader yielding (x, y) mini-batches of shape (batch, seq_length,
+    features) and (batch, 1). Indices are sampled in batches and handed to
+    the dataset whole, so there is no per-window Python work or collation.
+    """
+    if shuffle:
+        sampler = RandomSampler(dataset, generator=torch.Generator().manual_seed(seed))
+    else:
+        sampler = SequentialSampler(dataset)
+    return DataLoader(
+        dataset,
+        sampler=BatchSampler(sampler, batch_size=batch_size, drop_last=False),
+        batch_size=None,
+        num_workers=num_workers,
+        persistent_workers=num_workers > 0
+    )
@@ -1,8 +1,23 @@
-from typing import List
-from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
+from pydantic import BaseModel, Field, field_validator
+
+MACHINE_TYPES = ("L", "M", "H")
+
+def normalize_machine_type(value) -> Optional[str]:
+    """
+    " m " -> "M". Anything that is not one of MACHINE_TYPES after that,
+    empty strings included, is None: the reading is still scored, only its
+    Type goes untracked.
+    """
+    if isinstance(value, str):
+        value = value.strip().upper()
+        if value in MACHINE_TYPES:
+            return value
+    return None
 
 class MachineData(BaseModel):
     udi: int | None = Field(None, alias="UDI", description="Unique Identifier")
+    machine_type: Literal["L", "M", "H"] | None = Field(None, alias="Type", description="Product quality variant (L, M or H, any case); other values are ignored")
     air_temperature: float | None = Field(None, alias="Air temperature [K]", description="Air temperature in Kelvin")
     process_temperature: float | None = Field(None, alias="Process temperature [K]", description="Process temperature in Kelvin")
     rotational_speed: float | None = Field(None, alias="Rotational speed [rpm]", description="Rotational speed in RPM")
@@ -15,6 +30,12 @@ class MachineData(BaseModel):
     vibration_level: float | None = Field(None, description="Vibration level for Car model")
     engine_temp_c: float | None = Field(None, description="Engine temperature for Car model")
 
+    @field_validator("machine_type", mode="before")
+    @classmethod
+    def _normalize_machine_type(cls, value):
+        # Type used to be an ignored extra field, so clients may send anything here
+        return normalize_machine_type(value)
+
     class Config:
         populate_by_name = True
         json_schema_extra = {
@@ -30,3 +51,15 @@ class MachineData(BaseModel):
 class SequencePredictionRequest(BaseModel):
     sequence: List[MachineData] = Field(..., description="List of sequential machine data points for RNN inference")
 
+class SequenceStepRequest(BaseModel):
+    device_id: str = Field(..., min_length=1, max_length=128, description="Stable identifier of the streaming device")
+    reading: MachineData = Field(..., description="The device's newest reading")
+
+
+MAX_BATCH_READINGS = 10000
+
+class BatchPredictionRequest(BaseModel):
+    readings: List[MachineData] = Field(..., min_length=1, max_length=MAX_BATCH_READINGS, description="Machine readings scored together as one batch")
+
+class SequenceStepBatchRequest(BaseModel):
+    steps: List[SequenceStepRequest] = Field(..., min_length=1, max_length=MAX_BATCH_READINGS, description="Newest readings from any number of devices, applied in order")
@@ -1,6 +1,23 @@
+from typing import List, Optional
 from pydantic import BaseModel
 
 class PredictionResponse(BaseModel):
     anomaly: bool
     failure_probability: float
     prediction: int  # 0 or 1
+
+class BatchPredictionResponse(BaseModel):
+    results: List[PredictionResponse]
+    batch_size: int
+    inference_time_ms: float
+    model_version: Optional[str] = None
+
+class SequenceStepResponse(PredictionResponse):
+    device_id: str
+    window_samples: int  # readings currently in the device's server-side window
+    zscore_probability: float
+    lstm_probability: Optional[float] = None  # None when the streaming LSTM is disabled
+
+class SequenceStepBatchResponse(BaseModel):
+    results: List[SequenceStepResponse]
+    batch_size: int
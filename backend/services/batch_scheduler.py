@@ -0,0 +1,202 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+from backend.schemas.request import MachineData
+from backend.services.ml_service import ml_service, readings_to_matrix
+from backend.utils.logger import setup_logger
+from backend.utils.metrics import current_endpoint, metrics_collector
+
+logger = setup_logger(__name__)
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+QUEUE_WAIT_BUCKETS = (0.0001, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+class SchedulerOverloaded(RuntimeError):
+    """Raised when the pending-request queue is at its configured depth."""
+
+class _PendingPrediction(NamedTuple):
+    row: np.ndarray  # (5,) raw sensor values
+    future: Future
+    enqueued_at: float
+    version: Optional[str] = None
+    udi: Optional[int] = None  # keys the per-segment drift sketches
+    machine_type: Optional[str] = None
+    endpoint: str = "internal"  # current_endpoint of the submitting request
+
+class MicroBatchScheduler:
+    """
+    Coalesces concurrent single-row predictions into one predict_matrix() call.
+
+    The first request to arrive opens a window of `max_wait_ms`; everything
+    that lands in the queue before the window closes (up to `max_batch_size`
+    rows) is scored as one matrix and each caller's Future is resolved with
+    its own row. Requests pinned to different model versions share the
+    window but are scored as one sub-batch per version. Requests beyond
+    `queue_depth` are rejected immediately.
+
+    Subclasses can batch other work by overriding _score_group(); each
+    names its own metrics and worker thread.
+    """
+    metric_prefix = "predict"
+    thread_name = "predict-batcher"
+
+    def __init__(self, service, max_batch_size: int = 256, max_wait_ms: float = 2.0, queue_depth: int = 4096):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be >= 1")
+        self.service = service
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue(maxsize=queue_depth)
+        self._worker = None
+        self._start_lock = threading.Lock()
+        self._stopping = False
+
+        self._batch_size = metrics_collector.histogram(
+            f"{self.metric_prefix}_batch_size",
+            "Rows scored per micro-batch",
+            BATCH_SIZE_BUCKETS
+        )
+        self._queue_wait = metrics_collector.histogram(
+            f"{self.metric_prefix}_queue_wait_seconds",
+            "Time a request waited in the micro-batch queue before scoring",
+            QUEUE_WAIT_BUCKETS
+        )
+
+    def submit(self, data: MachineData, version: Optional[str] = None) -> Future:
+        """
+        Queues one reading and returns a Future resolving to its prediction
+        dict. `version` pins a loaded model version; None uses the active one.
+        """
+        return self.submit_raw(readings_to_matrix([data])[0], version, data.udi, data.machine_type)
+
+    def submit_raw(self, row: np.ndarray, version: Optional[str] = None, udi: Optional[int] = None,
+                   machine_type: Optional[str] = None) -> Future:
+        """submit() for a reading already decoded into its 5 raw sensor values."""
+        self._ensure_started()
+        future = Future()
+        try:
+            self._queue.put_nowait(_PendingPrediction(
+                row, future, time.monotonic(), version, udi, machine_type, current_endpoint.get()
+            ))
+        except queue.Full:
+            raise SchedulerOverloaded(f"Prediction queue is full ({self._queue.maxsize} pending)")
+        return future
+
+    def predict(self, data: MachineData, version: Optional[str] = None, timeout: float | None = None) -> dict:
+        """Blocking convenience wrapper around submit()."""
+        return self.submit(data, version).result(timeout=timeout)
+
+    def stop(self, timeout: float = 5.0):
+        """Scores whatever is already queued, then stops the worker thread."""
+        with self._start_lock:
+            worker = self._worker
+            self._stopping = True
+        if worker is not None:
+            self._queue.put(None)
+            worker.join(timeout=timeout)
+        with self._start_lock:
+            self._worker = None
+            self._stopping = False
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def _ensure_started(self):
+        if self._worker is not None:
+            return
+        with self._start_lock:
+            if self._stopping:
+                raise SchedulerOverloaded("Prediction scheduler is shutting down")
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name=self.thread_name, daemon=True)
+                self._worker.start()
+                logger.info("Micro-batch scheduler started", extra={
+                    "scheduler": self.thread_name,
+                    "max_batch_size": self.max_batch_size,
+                    "max_wait_ms": self.max_wait * 1000.0,
+                    "queue_depth": self._queue.maxsize
+                })
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            stop_after = False
+            deadline = time.monotonic() + self.max_wait
+
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    # Past the deadline we still take whatever is already queued
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop_after = True
+                    break
+                batch.append(item)
+
+            self._process(batch)
+            if stop_after:
+                return
+
+    def _process(self, batch: list):
+        # Callers that gave up (cancelled futures) are dropped before scoring
+        batch = [p for p in batch if p.future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        started = time.monotonic()
+        for pending in batch:
+            self._queue_wait.observe(started - pending.enqueued_at)
+        self._batch_size.observe(len(batch))
+
+        # One sub-batch per version, and per endpoint so metrics keep the caller's label
+        groups = {}
+        for pending in batch:
+            groups.setdefault((pending.version, pending.endpoint), []).append(pending)
+        for (version, endpoint), group in groups.items():
+            token = current_endpoint.set(endpoint)
+            try:
+                self._score_group(group, version)
+            finally:
+                current_endpoint.reset(token)
+
+    def _score_group(self, group: list, version: Optional[str]):
+        try:
+            output = self.service.predict_matrix(
+                np.stack([p.row for p in group]), version,
+                udis=[p.udi for p in group], machine_types=[p.machine_type for p in group]
+            )
+        except Exception as e:
+            logger.error("Micro-batch scoring failed", extra={"error": str(e), "batch_size": len(group)})
+            for pending in group:
+                pending.future.set_exception(e)
+            return
+
+        for pending, result in zip(group, output["results"]):
+            pending.future.set_result(result)
+
+def _env_flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes", "on")
+
+MICRO_BATCHING_ENABLED = _env_flag("MICRO_BATCHING", "true")
+
+def build_scheduler(service) -> MicroBatchScheduler:
+    return MicroBatchScheduler(
+        service,
+        max_batch_size=int(os.getenv("BATCH_MAX_SIZE", "256")),
+        max_wait_ms=float(os.getenv("BATCH_MAX_WAIT_MS", "2")),
+        queue_depth=int(os.getenv("BATCH_QUEUE_DEPTH", "4096"))
+    )
+
+prediction_scheduler = build_scheduler(ml_service) if MICRO_BATCHING_ENABLED else None
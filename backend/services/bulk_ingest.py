@@ -0,0 +1,177 @@
+import asyncio
+import json
+import math
+import os
+import time
+import zlib
+from typing import AsyncIterator, List, Optional, Tuple
+
+import numpy as np
+
+from backend.schemas.request import MachineData, normalize_machine_type
+from backend.services.ml_service import ml_service
+from backend.services.prediction_store import PredictionStore
+from backend.utils.logger import setup_logger
+from backend.utils.metrics import metrics_collector
+
+logger = setup_logger(__name__)
+
+BULK_CHUNK_ROWS = int(os.getenv("BULK_CHUNK_ROWS", "4096"))
+# A single record longer than this is rejected rather than buffered
+MAX_LINE_BYTES = 64 * 1024
+
+# (alias, field name) for each model input, in BASE_FEATURES order
+_INPUT_FIELDS = [
+    (field.alias, name)
+    for name, field in MachineData.model_fields.items()
+    if name in ("air_temperature", "process_temperature", "rotational_speed", "torque", "tool_wear")
+]
+
+_rows = metrics_collector.counter("bulk_ingest_rows_total", "Records scored through the NDJSON bulk endpoint")
+_errors = metrics_collector.counter("bulk_ingest_errors_total", "NDJSON bulk records answered with an error line (malformed or not scored)")
+_store_failed = metrics_collector.counter(
+    "bulk_ingest_store_failed_total", "NDJSON bulk records scored but not appended to the prediction store"
+)
+
+class BulkIngestError(ValueError):
+    """Raised when the body cannot be read as (optionally gzipped) NDJSON."""
+
+async def iter_ndjson_lines(chunks: AsyncIterator[bytes], gzipped: bool = False) -> AsyncIterator[bytes]:
+    """
+    Splits a streamed body into lines as bytes arrive, decompressing
+    incrementally if `gzipped`. Only the current partial line is buffered.
+    """
+    decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16) if gzipped else None
+    pending = b""
+    async for chunk in chunks:
+        if decompressor is not None:
+            try:
+                chunk = decompressor.decompress(chunk)
+            except zlib.error as e:
+                raise BulkIngestError(f"Invalid gzip body: {e}")
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        if len(pending) > MAX_LINE_BYTES:
+            raise BulkIngestError(f"Record exceeds {MAX_LINE_BYTES} bytes")
+        for line in lines:
+            yield line
+    if decompressor is not None:
+        pending += decompressor.flush()
+        if not decompressor.eof:
+            raise BulkIngestError("Truncated gzip body")
+    if pending:
+        yield pending
+
+def _error_line(line: int, message: str) -> str:
+    return json.dumps({"line": line, "error": message}) + "\n"
+
+def parse_record(line: bytes) -> Tuple[Optional[int], Optional[str], List[float]]:
+    """
+    Pulls UDI, Type and the five model inputs out of one JSON object
+    (aliases or field names, as MachineData accepts). Missing sensors become
+    NaN. Cheaper than a full MachineData validation, with the same numeric
+    and Type rules.
+    """
+    record = json.loads(line)
+    if not isinstance(record, dict):
+        raise ValueError("Record must be a JSON object")
+    values = []
+    for alias, name in _INPUT_FIELDS:
+        value = record.get(alias, record.get(name))
+        if value is None:
+            values.append(math.nan)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            values.append(float(value))
+        else:
+            raise ValueError(f"{alias} must be a number")
+    udi = record.get("UDI", record.get("udi"))
+    if udi is not None and (not isinstance(udi, int) or isinstance(udi, bool)):
+        raise ValueError("UDI must be an integer")
+    return udi, normalize_machine_type(record.get("Type", record.get("machine_type"))), values
+
+async def score_ndjson_stream(chunks: AsyncIterator[bytes], gzipped: bool = False,
+                              version: Optional[str] = None, chunk_rows: int = BULK_CHUNK_ROWS,
+                              store: Optional[PredictionStore] = None) -> AsyncIterator[bytes]:
+    """
+    Parses NDJSON records as they stream in, scores them `chunk_rows` at a
+    time through ml_service and yields one NDJSON result line per input
+    record (in order), followed by a summary line. A malformed record gets an
+    error line in its place without cutting the chunk short, and a chunk that
+    fails to score gets one error line per record; neither stops the stream,
+    so the summary line always comes last. Scored rows are appended to
+    `store` when one is given.
+    """
+    started = time.perf_counter()
+    line_numbers, udis, machine_types, rows = [], [], [], []
+    errors: List[Tuple[int, str]] = []  # error lines of the current chunk, after how many of its rows
+    n_rows = n_errors = 0
+
+    async def flush():
+        nonlocal n_rows, n_errors
+        scored = []
+        if rows:
+            raw = np.array(rows, dtype=np.float64)
+            try:
+                # CPU-bound; run it off the event loop so other requests keep flowing
+                output = await asyncio.to_thread(ml_service.predict_matrix, raw, version, list(udis), list(machine_types))
+            except Exception as e:
+                # E.g. the pinned version was evicted mid-upload: every record of the chunk gets an error line
+                logger.error("Bulk ingest chunk failed", extra={"error": str(e), "rows": len(rows)})
+                n_errors += len(rows)
+                scored = [_error_line(n, f"Scoring failed: {e}") for n in line_numbers]
+            else:
+                n_rows += len(rows)
+                results = output["results"]
+                if store is not None:
+                    try:
+                        store.append(raw, udis, results, output["model_version"])
+                    except Exception as e:
+                        # The records were scored; only their persistence is lost
+                        _store_failed.inc(len(rows))
+                        logger.error("Bulk ingest store append failed", extra={"error": str(e), "rows": len(rows)})
+                scored = [json.dumps({"line": n, "udi": u, **r}) + "\n" for n, u, r in zip(line_numbers, udis, results)]
+        # Error lines go back between the results at the place their records arrived
+        out, done = [], 0
+        for position, line in errors:
+            out += scored[done:position]
+            out.append(line)
+            done = position
+        out += scored[done:]
+        line_numbers.clear()
+        udis.clear()
+        machine_types.clear()
+        rows.clear()
+        errors.clear()
+        return "".join(out).encode()
+
+    line_no = 0
+    try:
+        async for line in iter_ndjson_lines(chunks, gzipped):
+            line_no += 1
+            if not line.strip():
+                continue
+            try:
+                udi, machine_type, values = parse_record(line)
+            except ValueError as e:  # includes json.JSONDecodeError
+                n_errors += 1
+                errors.append((len(rows), _error_line(line_no, str(e))))
+            else:
+                line_numbers.append(line_no)
+                udis.append(udi)
+                machine_types.append(machine_type)
+                rows.append(values)
+            if len(rows) + len(errors) >= chunk_rows:
+                yield await flush()
+        if rows or errors:
+            yield await flush()
+    except BulkIngestError as e:
+        n_errors += 1
+        errors.append((len(rows), _error_line(line_no + 1, str(e))))
+        yield await flush()
+    finally:
+        _rows.inc(n_rows)
+        _errors.inc(n_errors)
+
+    elapsed = time.perf_counter() - started
+    logger.info("Bulk ingest finished", extra={"rows": n_rows, "errors": n_errors, "seconds": round(elapsed, 3)})
+    yield (json.dumps({"summary": {"rows": n_rows, "errors": n_errors, "seconds": round(elapsed, 3)}}) + "\n").encode()
@@ -0,0 +1,229 @@
+import json
+import os
+import numpy as np
+from typing import NamedTuple
+
+from backend.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Rows traversed together; keeps the per-level working set cache-resident
+APPLY_CHUNK_ROWS = 256
+
+# Everything save()/load() round-trips as one .npy file each
+_ARRAY_FIELDS = (
+    "classes", "_feature", "_threshold", "_missing_left", "_children", "_value",
+    "_path_length", "_roots", "_active", "_rf_cols", "_if_cols"
+)
+_SCALAR_FIELDS = ("n_features", "_max_depth", "_if_denominator", "_if_offset")
+
+class ForestScores(NamedTuple):
+    failure_proba: np.ndarray   # (N, n_classes), same as RandomForestClassifier.predict_proba
+    prediction: np.ndarray      # (N,), same as RandomForestClassifier.predict
+    anomaly_score: np.ndarray   # (N,), same as IsolationForest.score_samples
+    is_anomaly: np.ndarray      # (N,) bool, IsolationForest.predict == -1
+
+def _average_path_length(n_samples: np.ndarray) -> np.ndarray:
+    """c(n) from the Isolation Forest paper (mirrors sklearn's private helper)."""
+    n_samples = np.asarray(n_samples, dtype=np.float64)
+    result = np.zeros_like(n_samples)
+    result[n_samples == 2] = 1.0
+    mask = n_samples > 2
+    n = n_samples[mask]
+    result[mask] = 2.0 * (np.log(n - 1.0) + np.euler_gamma) - 2.0 * (n - 1.0) / n
+    return result
+
+def _node_depths(children_left: np.ndarray, children_right: np.ndarray) -> np.ndarray:
+    depths = np.zeros(len(children_left), dtype=np.float64)
+    stack = [0]
+    while stack:
+        node = stack.pop()
+        for child in (children_left[node], children_right[node]):
+            if child != -1:
+                depths[child] = depths[node] + 1
+                stack.append(child)
+    return depths
+
+def _float32_thresholds(threshold: np.ndarray) -> np.ndarray:
+    """
+    sklearn compares float32 inputs against float64 thresholds. Rounding every
+    threshold *down* to the nearest float32 keeps `x <= t` identical for every
+    float32 x, so the float32 engine takes exactly the same branches.
+    """
+    t32 = threshold.astype(np.float32)
+    too_high = t32.astype(np.float64) > threshold
+    t32[too_high] = np.nextafter(t32[too_high], np.float32(-np.inf))
+    return t32
+
+class CompiledForestEngine:
+    """
+    Flattens the Random Forest failure model and the Isolation Forest anomaly
+    model into one set of contiguous node arrays and scores whole batches with
+    a single vectorized traversal.
+
+    Node topology is int32 and split thresholds are float32 (inputs are cast to
+    float32 exactly as sklearn does). Leaf payloads stay float64 so that the
+    averaged probabilities agree with sklearn to ~1e-12 and argmax ties
+    resolve the same way.
+    """
+    def __init__(self, failure_model, anomaly_model):
+        self.n_features = int(failure_model.n_features_in_)
+        if int(anomaly_model.n_features_in_) != self.n_features:
+            raise ValueError("Failure and anomaly models were fitted on different feature sets")
+        if getattr(failure_model, "n_outputs_", 1) != 1:
+            raise ValueError("Compiled engine only supports single-output classifiers")
+
+        self.classes = failure_model.classes_
+        n_classes = len(self.classes)
+
+        trees = [(est.tree_, None, "rf") for est in failure_model.estimators_]
+        for est, features in zip(anomaly_model.estimators_, anomaly_model.estimators_features_):
+            # sklearn only re-indexes columns when the trees were fit on a feature subset
+            remap = np.asarray(features) if len(features) != self.n_features else None
+            trees.append((est.tree_, remap, "if"))
+
+        # Deepest trees first: at traversal level d only a prefix of the
+        # trees can still be at an internal node, so the loop shrinks.
+        order = sorted(range(len(trees)), key=lambda i: trees[i][0].max_depth, reverse=True)
+        trees = [trees[i] for i in order]
+
+        total_nodes = sum(t.node_count for t, _, _ in trees)
+        self._feature = np.zeros(total_nodes, dtype=np.int32)
+        self._threshold = np.empty(total_nodes, dtype=np.float32)
+        self._missing_left = np.zeros(total_nodes, dtype=bool)
+        # children[:, 0] is the left child, children[:, 1] the right one
+        self._children = np.empty((total_nodes, 2), dtype=np.int32)
+        self._value = np.zeros((total_nodes, n_classes), dtype=np.float64)
+        self._path_length = np.zeros(total_nodes, dtype=np.float64)
+
+        roots, depths, rf_cols, if_cols = [], [], [], []
+        offset = 0
+        for col, (tree, remap, kind) in enumerate(trees):
+            n = tree.node_count
+            sl = slice(offset, offset + n)
+            left = tree.children_left
+            right = tree.children_right
+            is_leaf = left == -1
+            node_ids = np.arange(offset, offset + n, dtype=np.int32)
+
+            feature = tree.feature.copy()
+            if remap is not None:
+                feature[~is_leaf] = remap[feature[~is_leaf]]
+            feature[is_leaf] = 0
+            self._feature[sl] = feature
+
+            threshold = _float32_thresholds(tree.threshold)
+            # Leaves loop back to themselves so every tree can run the same number of steps
+            threshold[is_leaf] = np.inf
+            self._threshold[sl] = threshold
+            self._children[sl, 0] = np.where(is_leaf, node_ids, left + offset)
+            self._children[sl, 1] = np.where(is_leaf, node_ids, right + offset)
+            if hasattr(tree, "missing_go_to_left"):
+                self._missing_left[sl] = tree.missing_go_to_left.astype(bool)
+
+            if kind == "rf":
+                value = tree.value[:, 0, :]
+                normalizer = value.sum(axis=1, keepdims=True)
+                normalizer[normalizer == 0.0] = 1.0
+                self._value[sl] = value / normalizer
+                rf_cols.append(col)
+            else:
+                # Path length h(x) = edges from the root + c(samples left in the leaf)
+                self._path_length[sl] = _node_depths(left, right) + _average_path_length(tree.n_node_samples)
+                if_cols.append(col)
+
+            roots.append(offset)
+            depths.append(tree.max_depth)
+            offset += n
+
+        self._roots = np.array(roots, dtype=np.int32)
+        # _active[d] = number of leading trees still descending at level d
+        depths = np.array(depths)
+        self._max_depth = int(depths.max()) if len(depths) else 0
+        self._active = np.array([(depths > d).sum() for d in range(self._max_depth)], dtype=np.intp)
+        self._rf_cols = np.array(rf_cols, dtype=np.intp)
+        self._if_cols = np.array(if_cols, dtype=np.intp)
+
+        self._if_denominator = len(if_cols) * float(_average_path_length([anomaly_model.max_samples_])[0])
+        self._if_offset = float(anomaly_model.offset_)
+
+        logger.info("Compiled forest engine built", extra={
+            "trees": len(trees),
+            "nodes": int(total_nodes),
+            "max_depth": self._max_depth,
+            "bytes": int(self.nbytes)
+        })
+
+    def save(self, directory: str):
+        """Writes the flat arrays as .npy files so other processes can memory-map them."""
+        os.makedirs(directory, exist_ok=True)
+        for field in _ARRAY_FIELDS:
+            np.save(os.path.join(directory, f"{field.lstrip('_')}.npy"), getattr(self, field), allow_pickle=False)
+        with open(os.path.join(directory, "meta.json"), "w") as f:
+            json.dump({field: getattr(self, field) for field in _SCALAR_FIELDS}, f)
+
+    @classmethod
+    def load(cls, directory: str, mmap_mode: str | None = "r") -> "CompiledForestEngine":
+        """
+        Rebuilds an engine from save() output. With the default mmap_mode the
+        node arrays are page-cache backed, so every process that loads the
+        same directory shares one physical copy.
+        """
+        engine = cls.__new__(cls)
+        for field in _ARRAY_FIELDS:
+            path = os.path.join(directory, f"{field.lstrip('_')}.npy")
+            setattr(engine, field, np.load(path, mmap_mode=mmap_mode, allow_pickle=False))
+        with open(os.path.join(directory, "meta.json")) as f:
+            for field, value in json.load(f).items():
+                setattr(engine, field, value)
+        return engine
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (
+            self._feature, self._threshold, self._missing_left,
+            self._children, self._value, self._path_length
+        ))
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        """Returns the (N, n_trees) matrix of global leaf ids reached by each row."""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        leaves = np.empty((X.shape[0], len(self._roots)), dtype=np.int32)
+        for start in range(0, X.shape[0], APPLY_CHUNK_ROWS):
+            chunk = X[start:start + APPLY_CHUNK_ROWS]
+            leaves[start:start + len(chunk)] = self._apply_chunk(chunk).T
+        return leaves
+
+    def _apply_chunk(self, X: np.ndarray) -> np.ndarray:
+        # Tree-major (n_trees, N) so the still-descending trees are a contiguous row prefix
+        n_rows = X.shape[0]
+        flat_x = X.ravel()
+        has_nan = bool(np.isnan(flat_x).any())
+
+        nodes = np.repeat(self._roots[:, None], n_rows, axis=1)
+        row_base = np.arange(n_rows, dtype=np.int32) * self.n_features
+        children = self._children.ravel()
+
+        for active in self._active:
+            current = nodes[:active]
+            x = flat_x[row_base + self._feature[current]]
+            go_right = x > self._threshold[current]
+            if has_nan:
+                go_right = np.where(np.isnan(x), ~self._missing_left[current], go_right)
+            nodes[:active] = children[current * 2 + go_right]
+        return nodes
+
+    def score(self, X: np.ndarray) -> ForestScores:
+        leaves = self.apply(X)
+
+        failure_proba = self._value[leaves[:, self._rf_cols]].sum(axis=1) / len(self._rf_cols)
+        prediction = self.classes.take(np.argmax(failure_proba, axis=1))
+
+        depths = self._path_length[leaves[:, self._if_cols]].sum(axis=1)
+        if self._if_denominator != 0:
+            anomaly_score = -(2.0 ** (-depths / self._if_denominator))
+        else:
+            anomaly_score = -np.ones_like(depths)
+        is_anomaly = (anomaly_score - self._if_offset) < 0
+
+        return ForestScores(failure_proba, prediction, anomaly_score, is_anomaly)
@@ -0,0 +1,152 @@
+import asyncio
+import os
+import time
+from typing import Optional
+
+from backend.services.ml_service import ml_service
+from backend.utils.logger import setup_logger
+from backend.utils.metrics import metrics_collector
+
+logger = setup_logger(__name__)
+
+DRIFT_EVALUATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+class DriftGauges:
+    """Renders the latest drift report as labelled Prometheus gauges, one series per feature."""
+    def __init__(self):
+        self._report: Optional[dict] = None
+        self._evaluated_at = 0.0
+
+    def update(self, report: dict, evaluated_at: float):
+        # Swapped as one reference, so render() never sees half a report
+        self._report, self._evaluated_at = report, evaluated_at
+
+    def render(self) -> list:
+        report, evaluated_at = self._report, self._evaluated_at
+        lines = [
+            "# HELP drift_last_evaluation_timestamp_seconds Unix time of the last background drift evaluation",
+            "# TYPE drift_last_evaluation_timestamp_seconds gauge",
+            f"drift_last_evaluation_timestamp_seconds {evaluated_at}"
+        ]
+        if not report or "report" not in report:
+            return lines
+        features = report["report"]
+        lines += [
+            "# HELP drift_window_samples Live samples in the last evaluated drift window",
+            "# TYPE drift_window_samples gauge",
+            f"drift_window_samples {report['samples']}",
+            "# HELP drift_overall 1 if any feature drifted in the last evaluation",
+            "# TYPE drift_overall gauge",
+            f"drift_overall {int(report['overall_drift'])}",
+            "# HELP drift_ks_statistic Two-sample KS statistic of the live window against the reference",
+            "# TYPE drift_ks_statistic gauge"
+        ]
+        lines += [f'drift_ks_statistic{{feature="{name}"}} {r["statistic"]}' for name, r in features.items()]
+        lines += ["# HELP drift_p_value KS test p-value per feature", "# TYPE drift_p_value gauge"]
+        lines += [f'drift_p_value{{feature="{name}"}} {r["p_value"]}' for name, r in features.items()]
+        lines += ["# HELP drift_detected 1 if the feature's p-value is under the drift threshold", "# TYPE drift_detected gauge"]
+        lines += [f'drift_detected{{feature="{name}"}} {int(r["drift_detected"])}' for name, r in features.items()]
+        return lines
+
+class DriftMonitor:
+    """
+    Background drift evaluation for /api/drift and /metrics.
+
+    A task started from the app lifespan re-evaluates the drift window every
+    `interval_seconds`, or as soon as `min_new_samples` rows have arrived
+    when that is set. The KS computation runs in a worker thread, and an
+    evaluation is skipped outright when the detector's generation has not
+    moved since the last one. /api/drift then serves the cached report.
+    """
+    def __init__(self, service, interval_seconds: float = 30.0, min_new_samples: int = 0):
+        self.service = service
+        self.interval = interval_seconds
+        self.min_new_samples = min_new_samples
+        self._task: Optional[asyncio.Task] = None
+        self._seen_generation = None
+        self._last_run = 0.0
+        self._latest: Optional[dict] = None
+
+        self.gauges = metrics_collector.register("drift_report", DriftGauges())
+        self._evaluations = metrics_collector.counter("drift_evaluations_total", "Background drift evaluations run")
+        self._skipped = metrics_collector.counter(
+            "drift_evaluations_skipped_total", "Scheduled drift evaluations skipped because no new data had arrived"
+        )
+        self._duration = metrics_collector.histogram(
+            "drift_evaluation_seconds", "Time spent computing a background drift report", DRIFT_EVALUATION_BUCKETS
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval > 0 or self.min_new_samples > 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def latest(self) -> Optional[dict]:
+        """The last background report while the monitor runs, else None."""
+        return self._latest if self.running else None
+
+    def start(self):
+        """Starts the evaluation task. Must be called from the running event loop."""
+        if not self.enabled or self.running:
+            return
+        self._task = asyncio.create_task(self._run(), name="drift-monitor")
+        logger.info("Drift monitor started", extra={
+            "interval_seconds": self.interval,
+            "min_new_samples": self.min_new_samples
+        })
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _run(self):
+        # Polls often enough to notice min_new_samples; otherwise wakes once per interval
+        poll = min(self.interval, 1.0) if self.min_new_samples and self.interval > 0 else (self.interval or 1.0)
+        while True:
+            await asyncio.sleep(poll)
+            detector = self.service.drift_detector
+            if detector is None:
+                continue
+            new = detector.generation - (self._seen_generation or 0)
+            due = self.interval > 0 and time.monotonic() - self._last_run >= self.interval
+            if not due and not (self.min_new_samples and new >= self.min_new_samples):
+                continue
+            try:
+                await asyncio.to_thread(self.evaluate)
+            except Exception as e:
+                logger.error("Background drift evaluation failed", extra={"error": str(e)}, exc_info=True)
+
+    def evaluate(self) -> Optional[dict]:
+        """
+        Recomputes the drift report unless nothing changed since the last
+        evaluation, updating the gauges. Blocking; returns the latest report.
+        """
+        detector = self.service.drift_detector
+        if detector is None or detector.reference_data is None:
+            return None
+        self._last_run = time.monotonic()
+        generation = detector.generation
+        if generation == self._seen_generation:
+            self._skipped.inc()
+            return self._latest
+
+        start = time.perf_counter()
+        report = detector.refresh()
+        self._duration.observe(time.perf_counter() - start)
+        self._evaluations.inc()
+        self._seen_generation = generation
+        self._latest = report
+        self.gauges.update(report, time.time())
+        return report
+
+drift_monitor = DriftMonitor(
+    ml_service,
+    interval_seconds=float(os.getenv("DRIFT_MONITOR_INTERVAL_SECONDS", "30")),
+    min_new_samples=int(os.getenv("DRIFT_MONITOR_MIN_NEW_SAMPLES", "0"))
+)
@@ -0,0 +1,128 @@
+import math
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from backend.services.compiled_forest import CompiledForestEngine, ForestScores
+from backend.utils.logger import setup_logger
+from backend.utils.metrics import metrics_collector
+
+logger = setup_logger(__name__)
+
+# Below this many rows per worker, splitting a batch costs more in IPC than it saves
+MIN_ROWS_PER_TASK = 64
+
+# Per-process engine, set by _init_worker in each pool process
+_worker_engine = None
+
+def _init_worker(model_dir: str):
+    global _worker_engine
+    _worker_engine = CompiledForestEngine.load(model_dir, mmap_mode="r")
+
+def _score_in_worker(X: np.ndarray):
+    start = time.perf_counter()
+    scores = _worker_engine.score(X)
+    return os.getpid(), time.perf_counter() - start, scores
+
+class _WorkerUtilization:
+    """
+    Renders per-worker busy time and utilization for /metrics, labelled by
+    model version, for every executor currently running. Registered once;
+    executors add themselves on start and remove themselves on shutdown.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executors = {}  # version -> executor
+
+    def add(self, executor: "ProcessInferenceExecutor"):
+        with self._lock:
+            self._executors[executor.version] = executor
+
+    def remove(self, executor: "ProcessInferenceExecutor"):
+        with self._lock:
+            # A reload of the same version may already have put its own executor here
+            if self._executors.get(executor.version) is executor:
+                del self._executors[executor.version]
+
+    def render(self) -> list:
+        with self._lock:
+            executors = sorted(self._executors.items())
+        busy_lines, utilization_lines = [], []
+        now = time.monotonic()
+        for version, executor in executors:
+            busy, started = executor.busy_seconds()
+            uptime = max(now - started, 1e-9)
+            labels = f'version="{version}"'  # tags are limited to VERSION_PATTERN's charset
+            busy_lines += [f'inference_worker_busy_seconds_total{{{labels},worker="{w}"}} {b}' for w, b in busy.items()]
+            utilization_lines += [f'inference_worker_utilization{{{labels},worker="{w}"}} {b / uptime:.6f}' for w, b in busy.items()]
+        return [
+            "# HELP inference_worker_busy_seconds_total Seconds each inference worker process spent scoring",
+            "# TYPE inference_worker_busy_seconds_total counter",
+            *busy_lines,
+            "# HELP inference_worker_utilization Fraction of wall time each inference worker was busy since start",
+            "# TYPE inference_worker_utilization gauge",
+            *utilization_lines
+        ]
+
+_worker_utilization = metrics_collector.register("inference_worker_utilization", _WorkerUtilization())
+
+class ProcessInferenceExecutor:
+    """
+    Scores scaled matrices in a pool of worker processes.
+
+    The compiled forest arrays are written once to `model_dir` and every
+    worker memory-maps them, so the pool shares a single physical copy of the
+    model instead of each process unpickling its own. Large batches are split
+    across workers; small ones go to a single worker. Worker utilization is
+    exported under the `version` label while the pool runs.
+    """
+    def __init__(self, model_dir: str, workers: int, version: str = ""):
+        if workers < 1:
+            raise ValueError("workers must be >= 1")
+        self.model_dir = model_dir
+        self.workers = workers
+        self.version = version
+        self._pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(model_dir,)
+        )
+        self._lock = threading.Lock()
+        self._busy = {}       # worker index -> busy seconds
+        self._worker_ids = {}  # pid -> worker index
+        self._started = time.monotonic()
+        _worker_utilization.add(self)
+        logger.info("Process inference executor started", extra={"workers": workers, "model_dir": model_dir, "version": version})
+
+    def score(self, X: np.ndarray) -> ForestScores:
+        n_tasks = max(1, min(self.workers, math.ceil(len(X) / MIN_ROWS_PER_TASK)))
+        chunks = np.array_split(X, n_tasks) if n_tasks > 1 else [X]
+        futures = [self._pool.submit(_score_in_worker, chunk) for chunk in chunks]
+
+        parts = []
+        for future in futures:
+            pid, busy, scores = future.result()
+            self._record(pid, busy)
+            parts.append(scores)
+
+        if len(parts) == 1:
+            return parts[0]
+        return ForestScores(*(np.concatenate(field) for field in zip(*parts)))
+
+    def busy_seconds(self):
+        with self._lock:
+            return dict(self._busy), self._started
+
+    def shutdown(self):
+        _worker_utilization.remove(self)
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+    def _record(self, pid: int, busy: float):
+        with self._lock:
+            worker = self._worker_ids.setdefault(pid, len(self._worker_ids))
+            self._busy[worker] = self._busy.get(worker, 0.0) + busy
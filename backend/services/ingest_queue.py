@@ -0,0 +1,196 @@
+import asyncio
+import os
+import time
+from typing import NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from backend.schemas.request import MachineData
+from backend.services.ml_service import ml_service, readings_to_matrix
+from backend.services.prediction_store import PredictionStore, prediction_store
+from backend.utils.logger import setup_logger
+from backend.utils.metrics import metrics_collector
+
+logger = setup_logger(__name__)
+
+INGEST_BATCH_BUCKETS = (1, 4, 16, 64, 128, 256, 512, 1024, 2048)
+INGEST_LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_SCORE = metrics_collector.stage("ingest", "score")
+_STORE = metrics_collector.stage("ingest", "store")
+
+class IngestQueueFull(RuntimeError):
+    """Raised when the ingest queue is at its configured depth."""
+
+class _IngestItem(NamedTuple):
+    row: np.ndarray  # (5,) raw sensor values
+    udi: Optional[int]
+    enqueued_at: float
+    machine_type: Optional[str] = None
+
+class IngestPipeline:
+    """
+    Bounded fire-and-forget ingestion for /ingest.
+
+    Readings go into an asyncio.Queue of at most `max_depth` items and are
+    acknowledged immediately. `workers` consumer tasks each take whatever is
+    queued (up to `max_batch_size`, waiting at most `max_wait_ms` for a batch
+    to fill) and score it through the batch path in a worker thread, then
+    hands the results to `store` (if any). When the queue is full, offer()
+    raises instead of buffering more.
+
+    The queue and consumers are created on first use inside the running event
+    loop and torn down by stop().
+    """
+    def __init__(self, service, max_depth: int = 10000, workers: int = 2,
+                 max_batch_size: int = 512, max_wait_ms: float = 5.0, store: Optional[PredictionStore] = None):
+        if workers < 1:
+            raise ValueError("workers must be >= 1")
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be >= 1")
+        self.service = service
+        self.max_depth = max_depth
+        self.workers = workers
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.store = store
+        self._queue: Optional[asyncio.Queue] = None
+        self._consumers = []
+
+        self._enqueued = metrics_collector.counter("ingest_enqueued_total", "Readings accepted into the ingest queue")
+        self._rejected = metrics_collector.counter("ingest_rejected_total", "Readings rejected with 429 because the ingest queue was full")
+        self._processed = metrics_collector.counter("ingest_processed_total", "Ingested readings scored by the consumers")
+        self._failed = metrics_collector.counter("ingest_failed_total", "Ingested readings whose batch failed to score")
+        self._store_failed = metrics_collector.counter(
+            "ingest_store_failed_total", "Scored ingest readings that could not be handed to the prediction store"
+        )
+        metrics_collector.gauge("ingest_queue_depth", "Readings waiting in the ingest queue", lambda: self.depth)
+        self._batch_size = metrics_collector.histogram(
+            "ingest_batch_size",
+            "Readings scored per ingest consumer batch",
+            INGEST_BATCH_BUCKETS
+        )
+        self._lag = metrics_collector.histogram(
+            "ingest_processing_lag_seconds",
+            "Time from acceptance to scoring completion for an ingested reading",
+            INGEST_LAG_BUCKETS
+        )
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def offer(self, data: MachineData):
+        """Enqueues one reading without waiting. Must be called from the event loop."""
+        self.offer_many(readings_to_matrix([data]), [data.udi], [data.machine_type])
+
+    def offer_many(self, raw: np.ndarray, udis: Sequence[Optional[int]],
+                   machine_types: Optional[Sequence[Optional[str]]] = None):
+        """
+        Enqueues an (N, 5) matrix of decoded readings, all or nothing: if the
+        queue cannot take every row, none are queued.
+        """
+        self._ensure_started()
+        if self.max_depth and self.max_depth - self._queue.qsize() < len(raw):
+            self._rejected.inc(len(raw))
+            raise IngestQueueFull(f"Ingest queue is full ({self.max_depth} pending)")
+        now = time.monotonic()
+        machine_types = machine_types if machine_types is not None else [None] * len(raw)
+        for row, udi, machine_type in zip(raw, udis, machine_types):
+            self._queue.put_nowait(_IngestItem(row, udi, now, machine_type))
+        self._enqueued.inc(len(raw))
+
+    async def stop(self, drain: bool = True):
+        """Optionally waits for queued readings to be scored, then cancels the consumers."""
+        if self._queue is None:
+            return
+        if drain:
+            await self._queue.join()
+        for task in self._consumers:
+            task.cancel()
+        await asyncio.gather(*self._consumers, return_exceptions=True)
+        self._consumers = []
+        self._queue = None
+
+    def _ensure_started(self):
+        if self._queue is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_depth)
+        self._consumers = [
+            asyncio.create_task(self._consume(), name=f"ingest-consumer-{i}")
+            for i in range(self.workers)
+        ]
+        logger.info("Ingest pipeline started", extra={
+            "workers": self.workers,
+            "max_depth": self.max_depth,
+            "max_batch_size": self.max_batch_size
+        })
+
+    async def _consume(self):
+        queue = self._queue
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                try:
+                    batch.append(queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                await self._process(batch)
+            except Exception as e:
+                # A consumer that dies is never restarted and the queue would fill for good
+                self._failed.inc(len(batch))
+                logger.error("Ingest consumer error", extra={"error": str(e), "batch_size": len(batch)}, exc_info=True)
+            finally:
+                for _ in batch:
+                    queue.task_done()
+
+    async def _process(self, batch: list):
+        self._batch_size.observe(len(batch))
+        try:
+            # Scoring is CPU-bound; keep it off the event loop
+            raw = np.stack([item.row for item in batch])
+            with _SCORE.time():  # includes the hand-off to the worker thread
+                output = await asyncio.to_thread(
+                    self.service.predict_matrix, raw, None,
+                    [item.udi for item in batch], [item.machine_type for item in batch]
+                )
+        except Exception as e:
+            self._failed.inc(len(batch))
+            logger.error("Ingest batch failed", extra={"error": str(e), "batch_size": len(batch)})
+            return
+        if self.store is not None:
+            try:
+                with _STORE.time():
+                    self.store.append(raw, [item.udi for item in batch], output["results"], output["model_version"])
+            except Exception as e:
+                # The readings were scored; only their persistence is lost
+                self._store_failed.inc(len(batch))
+                logger.error("Ingest store append failed", extra={"error": str(e), "batch_size": len(batch)})
+        done = time.monotonic()
+        for item in batch:
+            self._lag.observe(done - item.enqueued_at)
+        self._processed.inc(len(batch))
+
+def build_ingest_pipeline(service) -> IngestPipeline:
+    return IngestPipeline(
+        service,
+        max_depth=int(os.getenv("INGEST_QUEUE_DEPTH", "10000")),
+        workers=int(os.getenv("INGEST_WORKERS", "2")),
+        max_batch_size=int(os.getenv("INGEST_BATCH_SIZE", "512")),
+        max_wait_ms=float(os.getenv("INGEST_BATCH_WAIT_MS", "5")),
+        store=prediction_store
+    )
+
+ingest_pipeline = build_ingest_pipeline(ml_service)
@@ -0,0 +1,134 @@
+import os
+import threading
+import warnings
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from backend.services.batch_scheduler import MicroBatchScheduler
+from backend.services.sequence_models import sequence_models
+from backend.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# eager: PredictiveRNN's own modules; traced: frozen torch.jit.trace of the
+# packed forward; quantized: dynamic int8 weights for the LSTM and fc head
+LSTM_VARIANTS = ("eager", "traced", "quantized")
+
+def pad_windows(windows: List[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Right-pads (seq_len_i, n_features) windows into one (batch, max_len,
+    n_features) float32 array and returns it with the true lengths.
+    """
+    lengths = np.fromiter((len(w) for w in windows), dtype=np.int64, count=len(windows))
+    if lengths.min() < 1:
+        raise ValueError("Windows must hold at least one reading")
+    x = np.zeros((len(windows), lengths.max(), windows[0].shape[1]), dtype=np.float32)
+    for i, window in enumerate(windows):
+        x[i, :len(window)] = window
+    return x, lengths
+
+def build_cpu_model(model, variant: str = "traced"):
+    """
+    Returns a module taking (x, lengths) -> (batch,) failure probabilities
+    for right-padded windows. Padding is packed away, so each window's
+    output is the LSTM's state after its own last reading.
+    """
+    import torch
+    from torch import nn
+    from torch.nn.utils.rnn import pack_padded_sequence
+
+    if variant not in LSTM_VARIANTS:
+        raise ValueError(f"Unknown LSTM variant {variant!r}; expected one of {LSTM_VARIANTS}")
+
+    class PackedPredictiveRNN(nn.Module):
+        def __init__(self, lstm, fc):
+            super().__init__()
+            self.lstm = lstm
+            self.fc = fc
+
+        def forward(self, x, lengths):
+            packed = pack_padded_sequence(x, lengths, batch_first=True, enforce_sorted=False)
+            _, (h_n, _) = self.lstm(packed)
+            return torch.sigmoid(self.fc(h_n[-1]))[:, 0]
+
+    packed = PackedPredictiveRNN(model.lstm, model.fc).eval()
+    if variant == "eager":
+        return packed
+
+    with warnings.catch_warnings():
+        # torch.ao.quantization and torch.jit.trace both emit deprecation warnings on current releases
+        warnings.simplefilter("ignore")
+        if variant == "quantized":
+            # Not traced: the dynamic quantized LSTM's trace bakes in the example batch size
+            return torch.ao.quantization.quantize_dynamic(packed, {nn.LSTM, nn.Linear}, dtype=torch.qint8)
+        # Example lengths must differ or the trace may drop the length sort
+        example = torch.zeros(2, 3, model.lstm.input_size)
+        with torch.no_grad():
+            traced = torch.jit.trace(packed, (example, torch.tensor([3, 2])), check_trace=False)
+        return torch.jit.freeze(traced.eval())
+
+class LSTMWindowBatcher(MicroBatchScheduler):
+    """
+    Cross-device batching for /predict/sequence's LSTM term.
+
+    Windows from concurrent requests are queued and scored as one padded
+    (batch, max_len, 5) tensor through a compiled CPU variant of
+    PredictiveRNN, instead of one tiny forward per request. Uneven window
+    lengths are packed, so every window scores exactly as it would alone.
+    """
+    metric_prefix = "lstm_window"
+    thread_name = "lstm-batcher"
+
+    def __init__(self, models, variant: str = "traced", max_batch_size: int = 128, max_wait_ms: float = 2.0,
+                 queue_depth: int = 4096):
+        if variant not in LSTM_VARIANTS:
+            raise ValueError(f"Unknown LSTM variant {variant!r}; expected one of {LSTM_VARIANTS}")
+        super().__init__(models, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms, queue_depth=queue_depth)
+        self.variant = variant
+        self._model = None
+        self._model_lock = threading.Lock()
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    self._model = build_cpu_model(self.service.rnn_model, self.variant)
+                    logger.info("Batched LSTM model built", extra={"variant": self.variant})
+        return self._model
+
+    def warm_up(self):
+        self.model
+
+    def window_probability(self, scaled_window: np.ndarray, timeout: Optional[float] = None) -> float:
+        """Blocking: queues one (seq_len, 5) scaled window and waits for its batch."""
+        return self.submit_raw(scaled_window).result(timeout=timeout)
+
+    def score_windows(self, windows: List[np.ndarray]) -> np.ndarray:
+        """Scores a list of windows of any lengths in one forward pass."""
+        import torch
+
+        x, lengths = pad_windows(windows)
+        with torch.inference_mode():
+            probs = self.model(torch.from_numpy(x), torch.from_numpy(lengths))
+        return probs.numpy().astype(np.float64)
+
+    def _score_group(self, group: list, version: Optional[str]):
+        try:
+            probs = self.score_windows([p.row for p in group])
+        except Exception as e:
+            logger.error("Batched LSTM scoring failed", extra={"error": str(e), "batch_size": len(group)})
+            for pending in group:
+                pending.future.set_exception(e)
+            return
+
+        for pending, prob in zip(group, probs.tolist()):
+            pending.future.set_result(prob)
+
+sequence_window_batcher = LSTMWindowBatcher(
+    sequence_models,
+    variant=os.getenv("SEQUENCE_LSTM_VARIANT", "traced"),
+    max_batch_size=int(os.getenv("SEQUENCE_BATCH_MAX_SIZE", "128")),
+    max_wait_ms=float(os.getenv("SEQUENCE_BATCH_WAIT_MS", "2"))
+)
@@ -0,0 +1,89 @@
+import threading
+from typing import List, Sequence
+
+import numpy as np
+
+from backend.utils.logger import setup_logger
+from backend.utils.metrics import metrics_collector
+
+logger = setup_logger(__name__)
+
+class ArenaFull(RuntimeError):
+    """Raised when every state slot is in use."""
+
+class LSTMStateArena:
+    """
+    Streaming inference for PredictiveRNN that carries (h, c) per device.
+
+    All devices' states live in two preallocated (num_layers, capacity,
+    hidden_size) tensors; a device holds a slot index for as long as its
+    session is open and the slot is zeroed and reused after release. step()
+    advances the LSTM by one timestep for any number of slots at once, so a
+    reading costs O(hidden_size^2) instead of re-running the whole window.
+
+    The step is the LSTM cell written out with the model's weights (one fused
+    addmm pair per layer): for a single timestep that is several times
+    cheaper than an nn.LSTM call, whose fixed per-call overhead dominates.
+    """
+    def __init__(self, model, capacity: int):
+        import torch
+
+        self._torch = torch
+        self.model = model
+        self.capacity = capacity
+        lstm = model.lstm
+        if lstm.bidirectional or getattr(lstm, "proj_size", 0) or not lstm.batch_first:
+            raise ValueError("LSTMStateArena supports unidirectional, batch_first LSTMs without projections")
+        with torch.no_grad():
+            # Per layer: W_ih^T, W_hh^T and the two biases folded into one
+            self._layers = [
+                (
+                    getattr(lstm, f"weight_ih_l{k}").detach().t().contiguous(),
+                    getattr(lstm, f"weight_hh_l{k}").detach().t().contiguous(),
+                    (getattr(lstm, f"bias_ih_l{k}") + getattr(lstm, f"bias_hh_l{k}")).detach()
+                    if lstm.bias else torch.zeros(4 * lstm.hidden_size)
+                )
+                for k in range(lstm.num_layers)
+            ]
+        shape = (lstm.num_layers, capacity, lstm.hidden_size)
+        self._h = torch.zeros(shape)
+        self._c = torch.zeros(shape)
+        self._free: List[int] = list(range(capacity - 1, -1, -1))
+        self._lock = threading.Lock()
+        metrics_collector.gauge("lstm_state_slots_used", "Per-device LSTM state slots in use", lambda: self.capacity - len(self._free))
+
+    def allocate(self) -> int:
+        with self._lock:
+            if not self._free:
+                raise ArenaFull(f"All {self.capacity} LSTM state slots are in use")
+            return self._free.pop()
+
+    def release(self, slot: int):
+        with self._lock:
+            self._h[:, slot].zero_()
+            self._c[:, slot].zero_()
+            self._free.append(slot)
+
+    def step(self, slots: Sequence[int], x: np.ndarray) -> np.ndarray:
+        """
+        Feeds one scaled reading per slot, x of shape (len(slots), input_size),
+        and returns each device's failure probability after that step. Slots
+        must be distinct within one call.
+        """
+        torch = self._torch
+        index = torch.as_tensor(slots, dtype=torch.long)
+        inputs = torch.as_tensor(x, dtype=torch.float32)
+        with self._lock, torch.inference_mode():
+            h = self._h.index_select(1, index)
+            c = self._c.index_select(1, index)
+            layer_input = inputs
+            for k, (w_ih, w_hh, bias) in enumerate(self._layers):
+                gates = torch.addmm(bias, layer_input, w_ih).addmm_(h[k], w_hh)
+                i, f, g, o = gates.chunk(4, dim=1)
+                c[k] = torch.sigmoid(f) * c[k] + torch.sigmoid(i) * torch.tanh(g)
+                h[k] = torch.sigmoid(o) * torch.tanh(c[k])
+                layer_input = h[k]
+            self._h.index_copy_(1, index, h)
+            self._c.index_copy_(1, index, c)
+            probs = self.model.sigmoid(self.model.fc(layer_input))
+        return probs[:, 0].numpy().astype(np.float64)
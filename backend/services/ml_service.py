@@ -1,8 +1,9 @@
-import pandas as pd
-import joblib
 import os
 import sys
 import numpy as np
+import threading
+import time
+from typing import List, Optional, Sequence
 
 # Add project root to path to ensure we can import from ml
 sys.path.append(os.path.join(os.path.dirname(__file__), "../../"))
@@ -10,133 +11,346 @@ sys.path.append(os.path.join(os.path.dirname(__file__), "../../"))
 from backend.schemas.request import MachineData
 from backend.utils.logger import setup_logger
 from backend.utils.metrics import metrics_collector
+from backend.utils.startup import startup_report
+from backend.services.model_registry import (
+    BASE_FEATURES, SENSOR_COLUMNS, ModelBundle, ModelRegistry, ModelVersionNotLoaded, validate_version
+)
+from backend.services.prediction_cache import PredictionCache, DEFAULT_PRECISION
 from ml.drift_detector import DriftDetector
+from ml.segment_drift import SegmentDriftTracker
 
 logger = setup_logger(__name__)
 
+INFERENCE_ENGINES = ("sklearn", "compiled")
+INFERENCE_EXECUTORS = ("inline", "process")
+
+_BUILD_MATRIX = metrics_collector.stage("predict", "build_matrix")
+_SCALE = metrics_collector.stage("predict", "scale")
+_DRIFT_WINDOW = metrics_collector.stage("predict", "drift_window")
+_CACHE_LOOKUP = metrics_collector.stage("predict", "cache_lookup")
+_LOG = metrics_collector.stage("predict", "log")
+_DRIFT_REPORT = metrics_collector.stage("drift", "report")
+
+def readings_to_matrix(readings: List[MachineData]) -> np.ndarray:
+    """(N, 5) raw input matrix in BASE_FEATURES order; missing sensors become NaN."""
+    return np.array([
+        (d.air_temperature, d.process_temperature, d.rotational_speed, d.torque, d.tool_wear)
+        for d in readings
+    ], dtype=np.float64)
+
 class MLService:
     def __init__(self):
-        self.scaler = None
-        self.failure_model = None
-        self.anomaly_model = None
         self.drift_detector = None
+        self.segment_drift = None
+        self._loaded = False
+        self._load_lock = threading.Lock()
         
         # Determine version and paths
-        self.version = os.getenv("MODEL_VERSION", "v1")
+        self.default_version = validate_version(os.getenv("MODEL_VERSION", "v1"))
+        self.inference_engine = os.getenv("INFERENCE_ENGINE", "sklearn").lower()
+        if self.inference_engine not in INFERENCE_ENGINES:
+            raise ValueError(f"INFERENCE_ENGINE must be one of {INFERENCE_ENGINES}, got {self.inference_engine!r}")
+        self.executor_mode = os.getenv("INFERENCE_EXECUTOR", "inline").lower()
+        if self.executor_mode not in INFERENCE_EXECUTORS:
+            raise ValueError(f"INFERENCE_EXECUTOR must be one of {INFERENCE_EXECUTORS}, got {self.executor_mode!r}")
+        if self.executor_mode == "process" and self.inference_engine != "compiled":
+            # Worker processes share the compiled arrays; sklearn objects would be unpickled per worker
+            logger.info("INFERENCE_EXECUTOR=process requires the compiled engine; switching INFERENCE_ENGINE to compiled")
+            self.inference_engine = "compiled"
+        self.inference_workers = int(os.getenv("INFERENCE_WORKERS", str(os.cpu_count() or 1)))
         # Go up from backend/services -> backend -> root, then ml/artifacts/{version}
         # Current file: backend/services/ml_service.py
         # root is ../../
         base_dir = os.path.join(os.path.dirname(__file__), "../../")
-        self.artifacts_dir = os.path.join(base_dir, "ml", "artifacts", self.version)
-        
-        logger.info(f"Initializing MLService with Model Version: {self.version}")
-        logger.info(f"Artifacts path: {self.artifacts_dir}")
+        self.artifacts_root = os.path.join(base_dir, "ml", "artifacts")
         
-        self._load_models()
+        logger.info(f"Initializing MLService with Model Version: {self.default_version}")
+        logger.info(f"Artifacts path: {self.artifacts_root}")
+        logger.info(f"Inference engine: {self.inference_engine}")
+
+        precision = os.getenv("PREDICTION_CACHE_PRECISION")
+        self.prediction_cache = PredictionCache(
+            max_entries=int(os.getenv("PREDICTION_CACHE_SIZE", "10000")),
+            ttl_seconds=float(os.getenv("PREDICTION_CACHE_TTL_SECONDS", "0")),
+            precision=[float(p) for p in precision.split(",")] if precision else DEFAULT_PRECISION
+        )
+        self.registry = ModelRegistry(
+            self._build_bundle,
+            memory_budget_bytes=int(float(os.getenv("MODEL_MEMORY_BUDGET_MB", "1024")) * 1024 * 1024),
+            on_unload=lambda bundle: self.prediction_cache.discard_namespace(bundle.cache_namespace)
+        )
+        # Models are loaded on first use (or by the warm-up task started in main.lifespan)
+
+    def _build_bundle(self, version: str) -> ModelBundle:
+        return ModelBundle(
+            version,
+            os.path.join(self.artifacts_root, version),
+            inference_engine=self.inference_engine,
+            executor_mode=self.executor_mode,
+            inference_workers=self.inference_workers
+        )
+
+    # The active version's models, for callers that predate the registry
+    @property
+    def version(self) -> str:
+        active = self.registry.active
+        return active.version if active else self.default_version
+
+    @property
+    def artifacts_dir(self) -> str:
+        return os.path.join(self.artifacts_root, self.version)
+
+    @property
+    def scaler(self):
+        active = self.registry.active
+        return active.scaler if active else None
+
+    @property
+    def failure_model(self):
+        active = self.registry.active
+        return active.failure_model if active else None
+
+    @property
+    def anomaly_model(self):
+        active = self.registry.active
+        return active.anomaly_model if active else None
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def ensure_loaded(self):
+        """Loads the default version once; concurrent first callers wait for the same load."""
+        if self._loaded:
+            return
+        with self._load_lock:
+            if not self._loaded:
+                with startup_report.track("tabular_models"):
+                    self._load_models()
 
     def _load_models(self):
         try:
-            scaler_path = os.path.join(self.artifacts_dir, "scaler.joblib")
-            failure_path = os.path.join(self.artifacts_dir, "failure_model.joblib")
-            anomaly_path = os.path.join(self.artifacts_dir, "anomaly_model.joblib")
-            ref_data_path = os.path.join(self.artifacts_dir, "reference_data.joblib")
-            
-            if not os.path.exists(scaler_path):
-                raise FileNotFoundError(f"Scaler not found at {scaler_path}")
-                
-            self.scaler = joblib.load(scaler_path)
-            self.failure_model = joblib.load(failure_path)
-            self.anomaly_model = joblib.load(anomaly_path)
-            
+            bundle = self.registry.activate(self.default_version)
+
             # Initialize Drift Detector
-            self.drift_detector = DriftDetector(ref_data_path)
+            self.drift_detector = DriftDetector(
+                bundle.reference_path,
+                bins=int(os.getenv("DRIFT_BINS", "1024")),
+                refresh_seconds=float(os.getenv("DRIFT_REPORT_TTL_SECONDS", "5"))
+            )
+            self._load_segment_drift()
+            self._loaded = True
             
             logger.info("Models loaded successfully.")
         except Exception as e:
             logger.exception("Error loading models")
             raise RuntimeError("Model loading failed") from e
 
-    def predict(self, data: MachineData):
-        if not self.scaler or not self.failure_model or not self.anomaly_model:
-            logger.error("Attempted prediction with unloaded models.")
-            raise RuntimeError("Models are not loaded.")
+    def load_version(self, version: str, background: bool = True):
+        """Loads (and warms) a version next to the active one without serving it by default."""
+        if background:
+            self.registry.load_async(version)
+        else:
+            self.registry.load(version)
+
+    def activate_version(self, version: str) -> dict:
+        """
+        Switches unpinned traffic to `version`, loading it first if needed.
+        In-flight requests finish on the bundle they already hold.
+        """
+        self.ensure_loaded()
+        bundle = self.registry.activate(version)
+        if self.drift_detector:
+            self.drift_detector.load_reference(bundle.reference_path)
+            self._load_segment_drift()
+        return bundle.describe()
+
+    def _load_segment_drift(self):
+        # Per-device / per-Type drift over the raw sensor columns of the drift reference
+        reference = self.drift_detector.reference_data
+        if reference is None:
+            return
+        reference = np.asarray(reference, dtype=np.float64)[:, :len(BASE_FEATURES)]
+        if self.segment_drift is not None:
+            self.segment_drift.load_reference(reference)
+            return
+        self.segment_drift = SegmentDriftTracker(
+            reference,
+            bins=int(os.getenv("DRIFT_SEGMENT_BINS", "32")),
+            window_size=int(os.getenv("DRIFT_SEGMENT_WINDOW", "256")),
+            max_keys=int(os.getenv("DRIFT_SEGMENT_MAX_KEYS", "10000")),
+            udi_group_size=int(os.getenv("DRIFT_UDI_GROUP_SIZE", "1"))
+        )
+
+    def list_versions(self) -> list:
+        return self.registry.versions()
+
+    def shutdown(self):
+        """Stops every loaded version's worker pool and removes its memory-mapped files."""
+        self.registry.shutdown()
+
+    def _lease(self, version: Optional[str] = None):
+        """The requested version's bundle, held until the block exits (see ModelRegistry.lease)."""
+        self.ensure_loaded()
+        return self.registry.lease(version)
+
+    def _predict_raw(self, raw: np.ndarray, bundle: ModelBundle, udis: Optional[Sequence[Optional[int]]] = None,
+                     machine_types: Optional[Sequence[Optional[str]]] = None) -> List[dict]:
+        """
+        Shared scoring path for an (N, 5) matrix of raw sensor values: scales
+        it, feeds the drift window and the per-device / per-Type drift
+        sketches (keyed by the optional per-row `udis` and `machine_types`),
+        serves what it can from the result cache and runs the forests once
+        over the remaining rows. Everything uses the one `bundle` captured by
+        the caller, so a concurrent version switch cannot mix two versions
+        within a request. Each stage is timed under stage_duration_seconds.
+        """
+        with _SCALE.time():
+            X_scaled = bundle.scale_features(raw)
+
+        with _DRIFT_WINDOW.time():
+            if self.drift_detector:
+                self.drift_detector.add_batch(X_scaled)
+            if self.segment_drift is not None:
+                self.segment_drift.add(X_scaled, udis, machine_types)
+
+        results = [None] * len(raw)
+        keys = None
+        if self.prediction_cache.enabled:
+            with _CACHE_LOOKUP.time():
+                keys = self.prediction_cache.keys_for(raw, bundle.cache_namespace)
+                results = [self.prediction_cache.get(key) for key in keys]
 
+        misses = [i for i, r in enumerate(results) if r is None]
+        if misses:
+            X_miss = X_scaled if len(misses) == len(raw) else X_scaled[misses]
+            anomalies, failure_probs, predictions = bundle.score(X_miss)
+            for i, a, p, c in zip(misses, anomalies, failure_probs, predictions):
+                results[i] = {"anomaly": bool(a), "failure_probability": float(p), "prediction": int(c)}
+                if keys is not None:
+                    self.prediction_cache.put(keys[i], results[i])
+
+        n_anomalies = n_failures = n_anomaly_only = 0
+        for r in results:
+            if r["prediction"] == 1:
+                n_failures += 1
+            elif r["anomaly"]:
+                n_anomaly_only += 1
+            n_anomalies += r["anomaly"]
+        metrics_collector.record_predictions(
+            bundle.version, len(results) - n_failures - n_anomaly_only, n_anomalies, n_failures, n_anomaly_only
+        )
+
+        return results
+
+    def predict(self, data: MachineData, version: Optional[str] = None):
         try:
-            # Update total predictions metric
-            metrics_collector.increment_predictions()
-            
-            # Convert simple input to DataFrame
-            input_dict = {
-                "Air temperature [K]": [data.air_temperature],
-                "Process temperature [K]": [data.process_temperature],
-                "Rotational speed [rpm]": [data.rotational_speed],
-                "Torque [Nm]": [data.torque],
-                "Tool wear [min]": [data.tool_wear]
-            }
-            
-            df = pd.DataFrame(input_dict)
-            
-            # FEATURE ENGINEERING ADAPTATION (Simplified as before)
-            sensor_cols = ['Air temperature [K]', 'Process temperature [K]', 'Rotational speed [rpm]', 'Torque [Nm]']
-            
-            for col in sensor_cols:
-                df[f'{col}_rolling_mean'] = df[col]
-                df[f'{col}_rolling_std'] = 0.0
-                df[f'{col}_delta'] = 0.0
-                
-            # Preprocessing (Scaling)
-            try:
-                if hasattr(self.scaler, 'feature_names_in_'):
-                    df = df[self.scaler.feature_names_in_]
-                
-                X_scaled = self.scaler.transform(df)
-                
-                # Update Drift Detector with single data point
-                if self.drift_detector:
-                    self.drift_detector.add_data(X_scaled[0])
-                
-                # Prediction
-                anomaly_score = self.anomaly_model.predict(X_scaled)[0]
-                is_anomaly = True if anomaly_score == -1 else False
-                
-                if is_anomaly:
-                    metrics_collector.increment_anomalies()
-                
-                failure_prob = self.failure_model.predict_proba(X_scaled)[0][1]
-                prediction = self.failure_model.predict(X_scaled)[0]
-                
-                if prediction == 1:
-                    metrics_collector.increment_failures()
-                
-                result = {
-                    "anomaly": is_anomaly,
-                    "failure_probability": float(failure_prob),
-                    "prediction": int(prediction)
-                }
+            with self._lease(version) as bundle:
+                # Fill the precompiled row layout straight from the request (no DataFrame)
+                with _BUILD_MATRIX.time():
+                    raw = np.array([[
+                        data.air_temperature,
+                        data.process_temperature,
+                        data.rotational_speed,
+                        data.torque,
+                        data.tool_wear
+                    ]], dtype=np.float64)
 
+                result = self._predict_raw(raw, bundle, [data.udi], [data.machine_type])[0]
+
+            with _LOG.time():
                 logger.info("Prediction successful", extra={
-                    "input_uid": data.udi, 
+                    "input_uid": data.udi,
+                    "model_version": bundle.version,
                     "result": result
                 })
-                
-                return result
-                
-            except Exception as e:
-                raise e
-            
+
+            return result
+
+        except ModelVersionNotLoaded:
+            raise  # a request error (404), not a scoring failure
         except Exception as e:
             logger.error("Prediction failed", extra={"error": str(e)}, exc_info=True)
             raise e
             
+    def predict_batch(self, readings: List[MachineData], version: Optional[str] = None) -> dict:
+        """
+        Scores N readings as one matrix: a single standardization, one
+        Isolation Forest pass and one Random Forest pass for the whole batch.
+        """
+        return self.predict_matrix(
+            readings_to_matrix(readings), version,
+            udis=[d.udi for d in readings], machine_types=[d.machine_type for d in readings]
+        )
+
+    def predict_matrix(self, raw: np.ndarray, version: Optional[str] = None,
+                       udis: Optional[Sequence[Optional[int]]] = None,
+                       machine_types: Optional[Sequence[Optional[str]]] = None) -> dict:
+        """
+        Batch scoring on an (N, 5) float array of raw sensor values in
+        BASE_FEATURES order (NaN for missing), for callers that parse input
+        without building MachineData objects. Same return shape as predict_batch.
+        `udis` / `machine_types` (one per row, None when unknown) key the
+        per-segment drift sketches.
+        """
+        start = time.perf_counter()
+        try:
+            with self._lease(version) as bundle:
+                results = self._predict_raw(raw, bundle, udis, machine_types)
+            n_anomalies = sum(r["anomaly"] for r in results)
+            n_failures = sum(r["prediction"] == 1 for r in results)
+            elapsed_ms = (time.perf_counter() - start) * 1000.0
+
+            with _LOG.time():
+                logger.info("Batch prediction successful", extra={
+                    "batch_size": len(raw),
+                    "model_version": bundle.version,
+                    "anomalies": n_anomalies,
+                    "failures": n_failures,
+                    "inference_time_ms": round(elapsed_ms, 3)
+                })
+
+            return {
+                "results": results,
+                "batch_size": len(raw),
+                "inference_time_ms": elapsed_ms,
+                "model_version": bundle.version
+            }
+        except ModelVersionNotLoaded:
+            raise  # a request error (404), not a scoring failure
+        except Exception as e:
+            logger.error("Batch prediction failed", extra={"error": str(e)}, exc_info=True)
+            raise e
+
     def get_drift_report(self):
+        self.ensure_loaded()
         if self.drift_detector:
-            return self.drift_detector.detect_drift()
+            with _DRIFT_REPORT.time():
+                return self.drift_detector.detect_drift()
         return {"error": "Drift detector not initialized"}
 
+    def _segment_drift(self) -> SegmentDriftTracker:
+        self.ensure_loaded()
+        if self.segment_drift is None:
+            raise RuntimeError("Segment drift tracker not initialized")
+        return self.segment_drift
+
+    def get_segment_drift(self, key: str) -> Optional[dict]:
+        """Drift report for one key ("device:<udi group>" or "type:<L|M|H>"), None if untracked."""
+        return self._segment_drift().report(key)
+
+    def get_top_drifted_segments(self, k: int = 10, dimension: Optional[str] = None) -> dict:
+        tracker = self._segment_drift()
+        return {"segments": tracker.top(k, dimension), "tracked_keys": len(tracker)}
+
+    def get_merged_segment_drift(self, dimension: str = "device") -> dict:
+        return self._segment_drift().merged(dimension)
+
     def get_feature_importance(self):
         """
         Returns feature importance from the trained Random Forest model.
         """
+        self.ensure_loaded()
         if not self.failure_model:
             raise RuntimeError("Failure model not loaded.")
             
@@ -0,0 +1,397 @@
+import itertools
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional
+
+import joblib
+import numpy as np
+
+from backend.services.compiled_forest import CompiledForestEngine
+from backend.services.inference_executor import ProcessInferenceExecutor
+from backend.utils.logger import setup_logger
+from backend.utils.metrics import metrics_collector
+
+logger = setup_logger(__name__)
+
+_COMPILED_FORESTS = metrics_collector.stage("predict", "compiled_forests")
+_ISOLATION_FOREST = metrics_collector.stage("predict", "isolation_forest")
+_RANDOM_FOREST = metrics_collector.stage("predict", "random_forest")
+
+# Raw sensor inputs in the order the training DataFrame had them
+BASE_FEATURES = ["Air temperature [K]", "Process temperature [K]", "Rotational speed [rpm]", "Torque [Nm]", "Tool wear [min]"]
+# Sensors that get synthetic rolling/delta columns (see ml/feature_engineering.py)
+SENSOR_COLUMNS = ['Air temperature [K]', 'Process temperature [K]', 'Rotational speed [rpm]', 'Torque [Nm]']
+
+# Version tags become directory names under ml/artifacts; keep them to a safe charset
+VERSION_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$")
+
+# Approximate size of sklearn's per-node Tree struct, used for the memory budget
+_SKLEARN_NODE_BYTES = 64
+
+# Distinguishes successive loads of the same version tag in cache keys
+_load_serial = itertools.count(1)
+
+class ModelVersionNotLoaded(KeyError):
+    """Raised when a request pins a version the registry does not hold."""
+
+def validate_version(version: str) -> str:
+    if not VERSION_PATTERN.match(version) or ".." in version:
+        raise ValueError(f"Invalid model version tag: {version!r}")
+    return version
+
+def _forest_nbytes(model) -> int:
+    return sum(
+        est.tree_.node_count * _SKLEARN_NODE_BYTES + est.tree_.value.nbytes
+        for est in getattr(model, "estimators_", [])
+    )
+
+class ModelBundle:
+    """
+    Everything needed to score with one artifact version: the scaler, both
+    forests, the precompiled feature layout and, depending on settings, the
+    compiled engine and its worker pool.
+    """
+    def __init__(self, version: str, artifacts_dir: str, inference_engine: str = "sklearn",
+                 executor_mode: str = "inline", inference_workers: int = 1):
+        self.version = version
+        self.artifacts_dir = artifacts_dir
+        self.inference_engine = inference_engine
+        self.executor_mode = executor_mode
+        self.inference_workers = inference_workers
+        # Result-cache namespace: unique per bundle, so a reloaded tag never reads the old models' results
+        self.cache_namespace = f"{version}#{next(_load_serial)}"
+
+        self.scaler = None
+        self.failure_model = None
+        self.anomaly_model = None
+        self.compiled_engine = None
+        self.inference_executor = None
+        self.reference_path = os.path.join(artifacts_dir, "reference_data.joblib")
+        self.loaded_at = None
+        self.last_used = time.monotonic()
+        self._compiled_dir = None
+        # Requests currently scoring on this bundle, and whether the registry has let go of it
+        # (both guarded by the registry lock); a retired bundle shuts down when the last lease ends
+        self._leases = 0
+        self._retired = False
+
+        # Precompiled feature layout (see _compile_feature_layout)
+        self._row_template = None
+        self._target_columns = None
+        self._source_columns = None
+        self._scaler_mean = None
+        self._scaler_scale = None
+
+    def load(self):
+        scaler_path = os.path.join(self.artifacts_dir, "scaler.joblib")
+        failure_path = os.path.join(self.artifacts_dir, "failure_model.joblib")
+        anomaly_path = os.path.join(self.artifacts_dir, "anomaly_model.joblib")
+
+        if not os.path.exists(scaler_path):
+            raise FileNotFoundError(f"Scaler not found at {scaler_path}")
+
+        self.scaler = joblib.load(scaler_path)
+        self.failure_model = joblib.load(failure_path)
+        self.anomaly_model = joblib.load(anomaly_path)
+
+        self._compile_feature_layout()
+
+        if self.inference_engine == "compiled":
+            self.compiled_engine = CompiledForestEngine(self.failure_model, self.anomaly_model)
+        if self.executor_mode == "process":
+            self._start_process_executor()
+
+        self.loaded_at = time.time()
+        return self
+
+    def warm_up(self):
+        """Scores one synthetic row so first-request costs (lazy imports, pool spawn) are paid now."""
+        self.score(self.scale_features(np.zeros((1, len(BASE_FEATURES)))))
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate resident size of this version's models, for the registry's memory budget."""
+        total = _forest_nbytes(self.failure_model) + _forest_nbytes(self.anomaly_model)
+        if self.compiled_engine is not None and self._compiled_dir is None:
+            total += self.compiled_engine.nbytes
+        return total
+
+    def _start_process_executor(self):
+        """
+        Persists the compiled arrays once and hands the directory to a worker
+        pool that memory-maps them. The API process switches to the mapped
+        copy as well, so all processes share the same pages.
+        """
+        self.shutdown()
+        self._compiled_dir = tempfile.mkdtemp(prefix=f"pm-compiled-{self.version}-")
+        self.compiled_engine.save(self._compiled_dir)
+        self.compiled_engine = CompiledForestEngine.load(self._compiled_dir, mmap_mode="r")
+        self.inference_executor = ProcessInferenceExecutor(self._compiled_dir, self.inference_workers, version=self.version)
+
+    def shutdown(self):
+        """Stops the worker pool (if any) and removes its memory-mapped model files."""
+        if self.inference_executor is not None:
+            self.inference_executor.shutdown()
+            self.inference_executor = None
+        if self._compiled_dir is not None:
+            shutil.rmtree(self._compiled_dir, ignore_errors=True)
+            self._compiled_dir = None
+
+    def _compile_feature_layout(self):
+        """
+        Precomputes everything the hot path needs to go from the 5 raw sensor
+        values to a scaled model row without pandas: the scaler's column order,
+        which raw value lands in which column, a zero-filled row template for
+        the synthetic rolling_std/delta columns, and the scaler's mean/scale.
+        """
+        if hasattr(self.scaler, 'feature_names_in_'):
+            feature_names = list(self.scaler.feature_names_in_)
+        else:
+            # Same column order predict() used to build its DataFrame in
+            feature_names = list(BASE_FEATURES)
+            for col in SENSOR_COLUMNS:
+                feature_names += [f'{col}_rolling_mean', f'{col}_rolling_std', f'{col}_delta']
+
+        column_index = {name: i for i, name in enumerate(feature_names)}
+
+        targets, sources = [], []
+        for i, name in enumerate(BASE_FEATURES):
+            targets.append(column_index[name])
+            sources.append(i)
+            if name in SENSOR_COLUMNS:
+                # Single reading: rolling mean equals the value itself
+                targets.append(column_index[f'{name}_rolling_mean'])
+                sources.append(i)
+
+        n_features = len(feature_names)
+        self._target_columns = np.array(targets, dtype=np.intp)
+        self._source_columns = np.array(sources, dtype=np.intp)
+        self._row_template = np.zeros((1, n_features), dtype=np.float64)
+
+        # StandardScaler.transform is (X - mean_) / scale_; mirror its flags exactly
+        self._scaler_mean = self.scaler.mean_ if getattr(self.scaler, 'with_mean', True) else np.zeros(n_features)
+        self._scaler_scale = self.scaler.scale_ if getattr(self.scaler, 'with_std', True) else np.ones(n_features)
+
+    def scale_features(self, raw: np.ndarray) -> np.ndarray:
+        """
+        Maps an (N, 5) array of raw sensor values onto the model's feature
+        layout and standardizes it in place. Equivalent to building the
+        engineered DataFrame and calling scaler.transform on it.
+        """
+        if len(raw) == 1:
+            X = self._row_template.copy()
+        else:
+            X = np.repeat(self._row_template, len(raw), axis=0)
+        X[:, self._target_columns] = raw[:, self._source_columns]
+        X -= self._scaler_mean
+        X /= self._scaler_scale
+        return X
+
+    def score(self, X_scaled: np.ndarray):
+        """
+        Runs both forests over a scaled matrix.
+        Returns (is_anomaly, failure_probability, prediction) arrays of length N.
+        """
+        if self.inference_executor is not None or self.compiled_engine is not None:
+            engine = self.inference_executor or self.compiled_engine
+            with _COMPILED_FORESTS.time():
+                scores = engine.score(X_scaled)
+            return scores.is_anomaly, scores.failure_proba[:, 1], scores.prediction
+
+        with _ISOLATION_FOREST.time():
+            anomalies = self.anomaly_model.predict(X_scaled) == -1
+        with _RANDOM_FOREST.time():
+            # predict() is argmax over predict_proba(); derive it instead of walking the trees twice
+            proba = self.failure_model.predict_proba(X_scaled)
+            predictions = self.failure_model.classes_.take(np.argmax(proba, axis=1))
+        return anomalies, proba[:, 1], predictions
+
+    def describe(self) -> dict:
+        return {
+            "version": self.version,
+            "artifacts_dir": self.artifacts_dir,
+            "loaded_at": self.loaded_at,
+            "approx_bytes": self.nbytes,
+            "inference_engine": self.inference_engine,
+            "executor": self.executor_mode
+        }
+
+class ModelRegistry:
+    """
+    Holds several loaded artifact versions at once and an `active` pointer.
+
+    Loading a version builds and warms its bundle entirely off to the side;
+    activation is a single reference assignment, so requests already holding
+    the old bundle finish on it and new requests see the new one, with no
+    window where neither is usable. Requests take the bundle through
+    lease(); a bundle that is replaced or evicted is shut down (worker pool
+    stopped, mapped files removed) only once its last lease is released.
+    Non-active versions are evicted least recently used first once the
+    loaded set exceeds `memory_budget_bytes`; a version that was just
+    loaded is kept until the next load or switch.
+    `on_unload(bundle)` is called for every bundle replaced by a reload or
+    evicted, e.g. to drop its cached results.
+    """
+    def __init__(self, bundle_factory: Callable[[str], ModelBundle], memory_budget_bytes: int,
+                 on_unload: Optional[Callable[[ModelBundle], None]] = None):
+        self._bundle_factory = bundle_factory
+        self.memory_budget_bytes = memory_budget_bytes
+        self._on_unload = on_unload
+        self._bundles: Dict[str, ModelBundle] = {}
+        self._status: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._active: Optional[ModelBundle] = None
+
+    @property
+    def active(self) -> Optional[ModelBundle]:
+        return self._active
+
+    def get(self, version: Optional[str] = None) -> ModelBundle:
+        """
+        Returns the pinned version if given, otherwise the active one. The
+        bundle may be shut down once it is replaced; score through lease().
+        """
+        bundle = self._lookup(version)
+        bundle.last_used = time.monotonic()
+        return bundle
+
+    @contextmanager
+    def lease(self, version: Optional[str] = None) -> Iterator[ModelBundle]:
+        """get() that keeps the bundle from being shut down until the block exits."""
+        with self._lock:
+            bundle = self._lookup(version)
+            bundle._leases += 1
+        bundle.last_used = time.monotonic()
+        try:
+            yield bundle
+        finally:
+            with self._lock:
+                bundle._leases -= 1
+                done = bundle._retired and bundle._leases == 0
+            if done:
+                bundle.shutdown()
+
+    def _lookup(self, version: Optional[str]) -> ModelBundle:
+        if version is None:
+            bundle = self._active
+            if bundle is None:
+                raise ModelVersionNotLoaded("No active model version")
+        else:
+            bundle = self._bundles.get(version)
+            if bundle is None:
+                raise ModelVersionNotLoaded(f"Model version {version!r} is not loaded")
+        return bundle
+
+    def load(self, version: str) -> ModelBundle:
+        """Loads and warms `version` (blocking). Re-loading replaces the held bundle."""
+        validate_version(version)
+        with self._lock:
+            load_lock = self._load_locks.setdefault(version, threading.Lock())
+        with load_lock:
+            self._set_status(version, "loading")
+            started = time.perf_counter()
+            try:
+                bundle = self._bundle_factory(version).load()
+                bundle.warm_up()
+            except Exception as e:
+                self._set_status(version, "failed", error=str(e))
+                logger.error("Model version failed to load", extra={"version": version, "error": str(e)}, exc_info=True)
+                raise
+
+            with self._lock:
+                previous = self._bundles.get(version)
+                self._bundles[version] = bundle
+                if self._active is previous and previous is not None:
+                    self._active = bundle
+            if previous is not None:
+                self._retire(previous)
+
+            self._set_status(version, "ready", load_seconds=round(time.perf_counter() - started, 3))
+            logger.info("Model version loaded", extra={"version": version, "approx_bytes": bundle.nbytes})
+            self._evict_over_budget(keep=bundle)
+            return bundle
+
+    def load_async(self, version: str) -> threading.Thread:
+        validate_version(version)
+        self._set_status(version, "queued")
+        thread = threading.Thread(target=self._load_quietly, args=(version,), name=f"model-load-{version}", daemon=True)
+        thread.start()
+        return thread
+
+    def activate(self, version: str) -> ModelBundle:
+        """Makes `version` the default for unpinned requests, loading it first if needed."""
+        bundle = self._bundles.get(version) or self.load(version)
+        with self._lock:
+            previous = self._active
+            self._active = bundle
+        logger.info("Active model version switched", extra={
+            "from": previous.version if previous else None,
+            "to": version
+        })
+        self._evict_over_budget()
+        return bundle
+
+    def versions(self) -> list:
+        with self._lock:
+            active = self._active.version if self._active else None
+            held = dict(self._bundles)
+            status = {v: dict(s) for v, s in self._status.items()}
+        listing = []
+        for version in sorted(set(held) | set(status)):
+            entry = {"version": version, "active": version == active, **status.get(version, {})}
+            if version in held:
+                entry.update(held[version].describe())
+            listing.append(entry)
+        return listing
+
+    def shutdown(self):
+        with self._lock:
+            bundles = list(self._bundles.values())
+        for bundle in bundles:
+            bundle.shutdown()
+
+    def _load_quietly(self, version: str):
+        try:
+            self.load(version)
+        except Exception:
+            pass  # status already records the failure
+
+    def _set_status(self, version: str, state: str, **extra):
+        with self._lock:
+            self._status[version] = {"status": state, **extra}
+
+    def _retire(self, bundle: ModelBundle):
+        """Called once a bundle is no longer reachable through the registry."""
+        if self._on_unload is not None:
+            self._on_unload(bundle)
+        with self._lock:
+            bundle._retired = True
+            idle = bundle._leases == 0
+        if idle:
+            bundle.shutdown()
+
+    def _evict_over_budget(self, keep: Optional[ModelBundle] = None):
+        """Drops least recently used bundles other than the active one (and `keep`, if just loaded)."""
+        evicted = []
+        with self._lock:
+            total = sum(b.nbytes for b in self._bundles.values())
+            candidates = sorted(
+                (b for b in self._bundles.values() if b is not self._active and b is not keep),
+                key=lambda b: b.last_used
+            )
+            for bundle in candidates:
+                if total <= self.memory_budget_bytes:
+                    break
+                del self._bundles[bundle.version]
+                self._status[bundle.version] = {"status": "evicted"}
+                total -= bundle.nbytes
+                evicted.append(bundle)
+        for bundle in evicted:
+            self._retire(bundle)
+            logger.info("Model version evicted to stay within memory budget", extra={"version": bundle.version})
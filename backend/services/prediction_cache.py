@@ -0,0 +1,101 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from backend.utils.metrics import metrics_collector
+
+# Quantization step per raw input, in BASE_FEATURES order. The defaults are
+# the resolution the AI4I sensors report at, so only genuinely repeated
+# readings share an entry.
+DEFAULT_PRECISION = (0.1, 0.1, 1.0, 0.1, 1.0)
+
+class PredictionCache:
+    """
+    Bounded LRU of prediction results keyed on the quantized raw sensor
+    vector and namespaced by model version. Entries optionally expire after
+    `ttl_seconds` (0 disables expiry).
+    """
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 0.0, precision: Sequence[float] = DEFAULT_PRECISION):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self._steps = np.asarray(precision, dtype=np.float64)
+        if np.any(self._steps <= 0):
+            raise ValueError("Cache precision steps must be positive")
+        self._entries = OrderedDict()  # key -> (result, stored_at)
+        self._lock = threading.Lock()
+
+        self._hits = metrics_collector.counter("prediction_cache_hits_total", "Predictions served from the result cache")
+        self._misses = metrics_collector.counter("prediction_cache_misses_total", "Result cache lookups that had to run the models")
+        self._evictions = metrics_collector.counter("prediction_cache_evictions_total", "Result cache entries dropped by LRU capacity or TTL")
+        metrics_collector.gauge("prediction_cache_size", "Entries currently held in the result cache", lambda: len(self._entries))
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def keys_for(self, raw: np.ndarray, namespace: str) -> List[Optional[tuple]]:
+        """
+        One key per row of an (N, n_inputs) raw matrix. Rows containing NaN
+        (missing sensors) get None and are never cached.
+        """
+        quantized = np.rint(raw / self._steps)
+        valid = ~np.isnan(quantized).any(axis=1)
+        quantized = np.where(valid[:, None], quantized, 0).astype(np.int64)
+        return [
+            (namespace, row.tobytes()) if ok else None
+            for row, ok in zip(quantized, valid)
+        ]
+
+    def get(self, key) -> Optional[dict]:
+        if key is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                result, stored_at = entry
+                if self.ttl and time.monotonic() - stored_at > self.ttl:
+                    del self._entries[key]
+                    self._evictions.inc()
+                    entry = None
+                else:
+                    self._entries.move_to_end(key)
+        if entry is None:
+            self._misses.inc()
+            return None
+        self._hits.inc()
+        return dict(result)
+
+    def put(self, key, result: dict):
+        if key is None:
+            return
+        evicted = 0
+        with self._lock:
+            self._entries[key] = (dict(result), time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                evicted += 1
+        if evicted:
+            self._evictions.inc(evicted)
+
+    def discard_namespace(self, namespace: str):
+        """Drops every entry stored under `namespace`, e.g. when a model version is unloaded."""
+        with self._lock:
+            stale = [key for key in self._entries if key[0] == namespace]
+            for key in stale:
+                del self._entries[key]
+        if stale:
+            self._evictions.inc(len(stale))
+
+    def clear(self):
+        with self._lock:
+            dropped = len(self._entries)
+            self._entries.clear()
+        if dropped:
+            self._evictions.inc(dropped)
+
+    def __len__(self):
+        return len(self._entries)
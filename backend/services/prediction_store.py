@@ -0,0 +1,295 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from backend.utils.logger import setup_logger
+from backend.utils.metrics import metrics_collector
+
+logger = setup_logger(__name__)
+
+FLUSH_SECONDS_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+# Cap on the doubling delay between attempts to open the database
+MAX_REOPEN_SECONDS = 30.0
+
+# Input columns in BASE_FEATURES order
+INPUT_COLUMNS = ("air_temperature", "process_temperature", "rotational_speed", "torque", "tool_wear")
+OUTPUT_COLUMNS = ("anomaly", "failure_probability", "prediction")
+
+_SCHEMA = f"""
+    CREATE TABLE IF NOT EXISTS predictions (
+        ts REAL NOT NULL,
+        udi INTEGER,
+        model_version TEXT,
+        {", ".join(f"{c} REAL" for c in INPUT_COLUMNS)},
+        anomaly INTEGER NOT NULL,
+        failure_probability REAL NOT NULL,
+        prediction INTEGER NOT NULL
+    )
+"""
+_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_predictions_ts ON predictions (ts)",
+    "CREATE INDEX IF NOT EXISTS idx_predictions_udi_ts ON predictions (udi, ts)",
+)
+
+_INSERT = f"INSERT INTO predictions VALUES ({', '.join('?' * (3 + len(INPUT_COLUMNS) + len(OUTPUT_COLUMNS)))})"
+
+class PredictionStore:
+    """
+    Append-only record of scored readings in SQLite (WAL mode).
+
+    append() only buffers rows in memory; a single writer thread commits them
+    in one transaction per `flush_rows` rows or `flush_interval` seconds,
+    whichever comes first, so the ingest path never waits on disk. Readers
+    open their own connections and see committed data, which lags appends by
+    at most one flush interval. When more than `max_pending` rows are
+    waiting (disk slower than ingest), the oldest are dropped and counted.
+
+    The writer opens the database itself, so append() never waits on it.
+    If the open fails (file locked past the busy timeout, missing directory,
+    read-only disk) the writer logs it, keeps the error in `open_error`
+    (prediction_store_up 0, the `/ready` body) and retries with backoff from
+    `reopen_seconds` up to MAX_REOPEN_SECONDS; rows buffer meanwhile, within
+    `max_pending`.
+    """
+    def __init__(self, path: str, flush_rows: int = 2000, flush_interval: float = 1.0, max_pending: int = 200000,
+                 reopen_seconds: float = 1.0):
+        self.path = path
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.reopen_seconds = reopen_seconds
+        self._pending = []
+        self._cond = threading.Condition()
+        self._writer = None
+        self.open_error: Optional[str] = None
+        self._stopping = False
+        self._flush_requested = False
+        self._flushed_through = 0  # rows appended whose transaction has committed
+        self._appended = 0
+
+        self._rows_written = metrics_collector.counter("prediction_store_rows_written_total", "Predictions committed to the prediction store")
+        self._dropped = metrics_collector.counter("prediction_store_dropped_total", "Predictions dropped because the store's write buffer was full")
+        metrics_collector.gauge("prediction_store_pending", "Predictions buffered and not yet committed", lambda: len(self._pending))
+        metrics_collector.gauge(
+            "prediction_store_up", "0 while the writer cannot open the database, else 1",
+            lambda: 0 if self.open_error is not None else 1
+        )
+        self._flush_seconds = metrics_collector.histogram(
+            "prediction_store_flush_seconds",
+            "Time to commit one batch of predictions",
+            FLUSH_SECONDS_BUCKETS
+        )
+
+    def append(self, raw: np.ndarray, udis: Sequence[Optional[int]], results: List[dict],
+               model_version: Optional[str], ts: Optional[float] = None):
+        """Buffers one scored batch: raw (N, 5) inputs, N UDIs and N result dicts."""
+        ts = time.time() if ts is None else ts
+        inputs = np.where(np.isnan(raw), None, raw).tolist() if np.isnan(raw).any() else raw.tolist()
+        rows = [
+            (ts, udi, model_version, *values, int(r["anomaly"]), r["failure_probability"], r["prediction"])
+            for udi, values, r in zip(udis, inputs, results)
+        ]
+        self._ensure_started()
+        dropped = 0
+        with self._cond:
+            self._pending.extend(rows)
+            self._appended += len(rows)
+            if len(self._pending) > self.max_pending:
+                dropped = len(self._pending) - self.max_pending
+                del self._pending[:dropped]
+                self._flushed_through += dropped
+            if len(self._pending) >= self.flush_rows:
+                self._cond.notify()
+        if dropped:
+            self._dropped.inc(dropped)
+            logger.warning("Prediction store buffer full, dropped oldest rows", extra={"dropped": dropped})
+
+    def flush(self, timeout: float = 10.0):
+        """Blocks until everything appended so far is committed; returns early while the database cannot be opened."""
+        if self._writer is None:
+            return
+        with self._cond:
+            target = self._appended
+            self._flush_requested = True
+            self._cond.notify()
+            self._cond.wait_for(lambda: self._flushed_through >= target or self.open_error is not None, timeout=timeout)
+
+    def close(self):
+        """Commits what is buffered and stops the writer thread."""
+        with self._cond:
+            writer = self._writer
+            self._stopping = True
+            self._cond.notify()
+        if writer is not None:
+            writer.join()
+        with self._cond:
+            self._writer = None
+            self._stopping = False
+
+    def query(self, udi: Optional[int] = None, start: Optional[float] = None, end: Optional[float] = None,
+              limit: int = 100) -> dict:
+        """
+        Aggregates over every stored prediction matching the filters, plus the
+        `limit` most recent matching rows. Filters use the (ts) and (udi, ts)
+        indexes, so cost scales with the matching range, not the table.
+        """
+        where, params = [], []
+        if udi is not None:
+            where.append("udi = ?")
+            params.append(udi)
+        if start is not None:
+            where.append("ts >= ?")
+            params.append(start)
+        if end is not None:
+            where.append("ts < ?")
+            params.append(end)
+        clause = f"WHERE {' AND '.join(where)}" if where else ""
+
+        conn = self._connect()
+        try:
+            if not self._table_exists(conn):
+                return {"aggregates": self._aggregates((0, None, None, None, None, None)), "rows": []}
+            stats = conn.execute(
+                f"SELECT COUNT(*), SUM(anomaly), SUM(prediction), AVG(failure_probability), MIN(ts), MAX(ts) "
+                f"FROM predictions {clause}", params
+            ).fetchone()
+            cursor = conn.execute(f"SELECT * FROM predictions {clause} ORDER BY ts DESC LIMIT ?", params + [limit])
+            names = [d[0] for d in cursor.description]
+            rows = [dict(zip(names, row)) for row in cursor.fetchall()]
+        finally:
+            conn.close()
+
+        for row in rows:
+            row["anomaly"] = bool(row["anomaly"])
+        return {"aggregates": self._aggregates(stats), "rows": rows}
+
+    @staticmethod
+    def _aggregates(stats) -> dict:
+        count, anomalies, failures, mean_prob, first_ts, last_ts = stats
+        return {
+            "count": count,
+            "anomalies": anomalies or 0,
+            "failures": failures or 0,
+            "mean_failure_probability": mean_prob,
+            "first_ts": first_ts,
+            "last_ts": last_ts
+        }
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10.0)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # WAL + NORMAL: durable across process crashes, fsync only at checkpoints
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @staticmethod
+    def _table_exists(conn: sqlite3.Connection) -> bool:
+        return conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='predictions'").fetchone() is not None
+
+    def status(self) -> dict:
+        """Path and writer health, for the readiness report."""
+        return {"path": self.path, "up": self.open_error is None, "error": self.open_error, "pending": len(self._pending)}
+
+    def _ensure_started(self):
+        if self._writer is not None:
+            return
+        with self._cond:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._run, name="prediction-store-writer", daemon=True)
+                self._writer.start()
+
+    def _open(self) -> sqlite3.Connection:
+        conn = self._connect()
+        try:
+            conn.execute(_SCHEMA)
+            for statement in _INDEXES:
+                conn.execute(statement)
+            conn.commit()
+        except sqlite3.Error:
+            conn.close()
+            raise
+        return conn
+
+    def _open_with_retry(self) -> Optional[sqlite3.Connection]:
+        """Opens the database, retrying with backoff; None if close() is called first."""
+        delay = self.reopen_seconds
+        while True:
+            try:
+                conn = self._open()
+            except sqlite3.Error as e:
+                logger.error("Prediction store could not be opened", extra={
+                    "path": self.path, "error": str(e), "retry_seconds": delay
+                })
+                with self._cond:
+                    self.open_error = str(e)
+                    self._cond.notify_all()  # flush() stops waiting on a store that is down
+                    if self._cond.wait_for(lambda: self._stopping, timeout=delay):
+                        return None
+                delay = min(delay * 2, MAX_REOPEN_SECONDS)
+                continue
+            with self._cond:
+                self.open_error = None
+            return conn
+
+    def _run(self):
+        conn = self._open_with_retry()
+        if conn is None:
+            with self._cond:
+                lost, self._pending = self._pending, []
+                self._flushed_through += len(lost)
+                self._cond.notify_all()
+            if lost:
+                self._dropped.inc(len(lost))
+                logger.error("Prediction store closed before it could be opened, dropped buffered rows", extra={
+                    "path": self.path, "dropped": len(lost)
+                })
+            return
+        logger.info("Prediction store opened", extra={"path": self.path})
+        try:
+            while True:
+                with self._cond:
+                    self._cond.wait_for(
+                        lambda: self._stopping or self._flush_requested or len(self._pending) >= self.flush_rows,
+                        timeout=self.flush_interval
+                    )
+                    batch, self._pending = self._pending, []
+                    self._flush_requested = False
+                    stopping = self._stopping
+                if batch:
+                    self._write(conn, batch)
+                with self._cond:
+                    self._flushed_through += len(batch)
+                    self._cond.notify_all()
+                if stopping:
+                    return
+        finally:
+            conn.close()
+
+    def _write(self, conn: sqlite3.Connection, batch: list):
+        start = time.perf_counter()
+        try:
+            with conn:
+                conn.executemany(_INSERT, batch)
+        except sqlite3.Error as e:
+            logger.error("Prediction store write failed", extra={"error": str(e), "rows": len(batch)})
+            self._dropped.inc(len(batch))
+            return
+        self._flush_seconds.observe(time.perf_counter() - start)
+        self._rows_written.inc(len(batch))
+
+def build_prediction_store() -> Optional[PredictionStore]:
+    path = os.getenv("PREDICTION_STORE_PATH", "predictions.db")
+    if not path:
+        return None
+    return PredictionStore(
+        path,
+        flush_rows=int(os.getenv("PREDICTION_STORE_FLUSH_ROWS", "2000")),
+        flush_interval=float(os.getenv("PREDICTION_STORE_FLUSH_SECONDS", "1.0"))
+    )
+
+# None when PREDICTION_STORE_PATH is set to an empty string
+prediction_store = build_prediction_store()
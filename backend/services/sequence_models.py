@@ -0,0 +1,107 @@
+import os
+import threading
+
+import joblib
+import numpy as np
+
+from backend.utils.logger import setup_logger
+from backend.utils.startup import startup_report
+
+logger = setup_logger(__name__)
+
+MODEL_PATH = os.path.join("ml", "lstm_car_engine.pt")
+SCALER_PATH = os.path.join("ml", "scaler_car_engine.pkl")
+
+# torch otherwise starts one intra-op thread per core, and every uvicorn
+# threadpool worker scoring an LSTM at once multiplies that
+TORCH_THREADS = int(os.getenv("SEQUENCE_TORCH_THREADS", "1"))
+TORCH_INTEROP_THREADS = int(os.getenv("SEQUENCE_TORCH_INTEROP_THREADS", "0"))
+
+def configure_torch_threads(intra_op: int = TORCH_THREADS, inter_op: int = TORCH_INTEROP_THREADS):
+    """Applies the torch thread counts; 0 keeps torch's default."""
+    import torch
+
+    if intra_op > 0:
+        torch.set_num_threads(intra_op)
+    if inter_op > 0:
+        try:
+            torch.set_num_interop_threads(inter_op)
+        except RuntimeError as e:
+            # Only settable before torch has run any parallel work
+            logger.warning("Could not set torch inter-op threads", extra={"error": str(e)})
+
+class SequenceModels:
+    """
+    Car-engine models used by /predict/sequence. The scaler and the LSTM are
+    loaded independently on first use, so the z-score path never has to
+    import torch.
+    """
+    def __init__(self, model_path: str = MODEL_PATH, scaler_path: str = SCALER_PATH):
+        self.model_path = model_path
+        self.scaler_path = scaler_path
+        self._lock = threading.Lock()
+        self._scaler = None
+        self._scaler_loaded = False
+        self._rnn_model = None
+
+    @property
+    def inference_scaler(self):
+        """StandardScaler fitted on the car-engine telemetry, or None if the file is missing."""
+        if not self._scaler_loaded:
+            with self._lock:
+                if not self._scaler_loaded:
+                    with startup_report.track("sequence_scaler"):
+                        self._scaler = self._load_scaler()
+                    self._scaler_loaded = True
+        return self._scaler
+
+    @property
+    def rnn_model(self):
+        """PredictiveRNN with trained weights, in eval mode on CPU."""
+        if self._rnn_model is None:
+            with self._lock:
+                if self._rnn_model is None:
+                    with startup_report.track("lstm"):
+                        self._rnn_model = self._load_rnn()
+        return self._rnn_model
+
+    @property
+    def loaded(self) -> bool:
+        return self._scaler_loaded and self._rnn_model is not None
+
+    def load_all(self):
+        self.inference_scaler
+        self.rnn_model
+
+    def window_probability(self, scaled_window: np.ndarray) -> float:
+        """LSTM failure probability for one (seq_len, 5) scaled window, from zero state."""
+        import torch
+
+        with torch.inference_mode():
+            x = torch.as_tensor(scaled_window[None, :, :], dtype=torch.float32)
+            return float(self.rnn_model(x)[0, 0])
+
+    def _load_scaler(self):
+        if os.path.exists(self.scaler_path):
+            scaler = joblib.load(self.scaler_path)
+            logger.info(f"Inference scaler loaded from {self.scaler_path}")
+            return scaler
+        logger.warning(f"Scaler NOT FOUND at {self.scaler_path}! Inference will run on unscaled data.")
+        return None
+
+    def _load_rnn(self):
+        import torch
+        from backend.models.rnn_model import PredictiveRNN
+
+        configure_torch_threads()
+        model = PredictiveRNN(input_size=5)
+        if os.path.exists(self.model_path):
+            model.load_state_dict(torch.load(self.model_path, map_location=torch.device('cpu')))
+            logger.info(f"LSTM weights loaded from {self.model_path}")
+        else:
+            logger.warning(f"LSTM weights NOT FOUND at {self.model_path}! Model will output random predictions (~0.5).")
+        model.eval()
+        return model
+
+# Global instance
+sequence_models = SequenceModels()
@@ -0,0 +1,235 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import List, NamedTuple, Optional
+
+import numpy as np
+
+from backend.schemas.request import MachineData
+from backend.services.sequence_models import sequence_models
+from backend.utils.logger import setup_logger
+from backend.utils.metrics import metrics_collector
+
+logger = setup_logger(__name__)
+
+# Training feature order of the car-engine scaler and LSTM
+SEQUENCE_FEATURES = ("engine_rpm", "oil_pressure_psi", "coolant_temp_c", "vibration_level", "engine_temp_c")
+
+def sequence_row(data: MachineData) -> np.ndarray:
+    """The 5 car-engine inputs of one reading in training order, 0.0 for missing."""
+    return np.array([getattr(data, name) or 0.0 for name in SEQUENCE_FEATURES], dtype=np.float64)
+
+def zscore_score(last_scaled: np.ndarray, first_scaled: Optional[np.ndarray] = None) -> float:
+    """
+    Directional z-score anomaly score of the newest reading, plus a trend term
+    from the oldest reading when the window has two or more. Only the two
+    ends of the window matter, which is what lets sessions update in O(1).
+    """
+    # Feature order: [engine_rpm, oil_pressure_psi, coolant_temp_c, vibration_level, engine_temp_c]
+    score = 0.0
+    score += abs(last_scaled[0]) * 0.1         # RPM deviation (mild)
+    score += max(-last_scaled[1], 0) * 0.3     # Oil pressure DROP is bad
+    score += max(last_scaled[2], 0) * 0.3      # Coolant temp HIGH is bad
+    score += max(last_scaled[3], 0) * 0.2      # Vibration HIGH is bad
+    score += max(last_scaled[4], 0) * 0.2      # Engine temp HIGH is bad
+
+    if first_scaled is not None:
+        trend_coolant = last_scaled[2] - first_scaled[2]
+        trend_vibration = last_scaled[3] - first_scaled[3]
+        trend_pressure = first_scaled[1] - last_scaled[1]  # Drop is positive
+        score += max(trend_coolant, 0) * 0.1 + max(trend_vibration, 0) * 0.1 + max(trend_pressure, 0) * 0.1
+    return float(score)
+
+def zscore_probability(score: float) -> float:
+    # Sigmoid mapping: score of 0 -> ~0.05, score of 2 -> ~0.5, score of 4 -> ~0.95
+    return float(1.0 / (1.0 + np.exp(-(score - 2.0) * 1.5)))
+
+def blend_probability(zscore_prob: float, lstm_prob: Optional[float], lstm_weight: float) -> float:
+    if lstm_prob is None or not lstm_weight:
+        return zscore_prob
+    return (1.0 - lstm_weight) * zscore_prob + lstm_weight * lstm_prob
+
+class SessionStep(NamedTuple):
+    failure_probability: float  # blended
+    samples: int  # readings currently in the device's window
+    zscore_probability: float
+    lstm_probability: Optional[float]
+
+class DeviceSession:
+    """Fixed-size ring buffer of one device's most recent scaled readings."""
+    __slots__ = ("window", "head", "count", "last_seen", "lstm_slot")
+
+    def __init__(self, window_size: int, n_features: int):
+        self.window = np.empty((window_size, n_features), dtype=np.float64)
+        self.head = 0   # slot the next reading goes into
+        self.count = 0
+        self.last_seen = time.monotonic()
+        self.lstm_slot = None  # index into the LSTMStateArena, if the LSTM runs
+
+    def push(self, scaled: np.ndarray):
+        self.window[self.head] = scaled
+        self.head = (self.head + 1) % len(self.window)
+        self.count = min(self.count + 1, len(self.window))
+
+    @property
+    def oldest(self) -> np.ndarray:
+        return self.window[self.head if self.count == len(self.window) else 0]
+
+    @property
+    def newest(self) -> np.ndarray:
+        return self.window[self.head - 1]
+
+class SequenceSessionStore:
+    """
+    Per-device streaming state for /predict/sequence/stream.
+
+    Clients send one reading at a time; each device keeps a ring buffer of
+    its last `window_size` scaled readings, so a step costs one row of
+    scaling and an O(1) score update instead of re-posting and rescaling the
+    whole window. Sessions idle for `ttl_seconds` expire, and the least
+    recently used session is dropped once `max_sessions` are open.
+
+    With `lstm` enabled, each session also owns a slot in an LSTMStateArena
+    and the LSTM advances one timestep per reading on the device's carried
+    (h, c). Its probability is blended in with weight `lstm_weight`.
+    """
+    def __init__(self, models, window_size: int = 10, max_sessions: int = 10000, ttl_seconds: float = 600.0,
+                 lstm: bool = True, lstm_weight: float = 0.0):
+        if window_size < 1:
+            raise ValueError("window_size must be >= 1")
+        if not 0.0 <= lstm_weight <= 1.0:
+            raise ValueError("lstm_weight must be in [0, 1]")
+        self.models = models
+        self.window_size = window_size
+        self.max_sessions = max_sessions
+        self.ttl = ttl_seconds
+        self.lstm_enabled = lstm
+        self.lstm_weight = lstm_weight
+        self._sessions: "OrderedDict[str, DeviceSession]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._arena = None
+        self._arena_lock = threading.Lock()
+
+        self._evicted = metrics_collector.counter("sequence_sessions_evicted_total", "Streaming sessions dropped by TTL or the session cap")
+        metrics_collector.gauge("sequence_sessions_active", "Open per-device streaming sessions", lambda: len(self._sessions))
+
+    def step(self, device_id: str, raw: np.ndarray) -> SessionStep:
+        """Appends one raw reading to the device's window and scores the window."""
+        return self.step_many([device_id], raw[None, :])[0]
+
+    def step_many(self, device_ids: List[str], raws: np.ndarray) -> List[SessionStep]:
+        """
+        step() for readings from many devices, raws of shape (n, 5). Results
+        match calling step() for each row in order, but the whole batch is
+        scaled at once and the LSTM advances every device in one arena call
+        (a device appearing k times takes k calls, one per occurrence).
+        """
+        scaler = self.models.inference_scaler
+        if scaler is not None:
+            scaled = (raws - scaler.mean_) / scaler.scale_
+        arena = self._lstm_arena() if scaler is not None else None
+        now = time.monotonic()
+        windows = []
+        lstm_rounds: List[list] = []  # (row, slot) pairs, each device at most once per round
+        with self._lock:
+            self._expire(now)
+            occurrences = {}
+            for i, device_id in enumerate(device_ids):
+                session = self._sessions.get(device_id)
+                if session is None:
+                    if len(self._sessions) >= self.max_sessions:
+                        evicted_id, evicted = self._sessions.popitem(last=False)
+                        if occurrences.pop(evicted_id, None):
+                            # Evicted earlier in this batch: its slot is about to be reused
+                            for pending in lstm_rounds:
+                                pending[:] = [(row, slot) for row, slot in pending if slot != evicted.lstm_slot]
+                        self._release(evicted)
+                        self._evicted.inc()
+                    session = DeviceSession(self.window_size, raws.shape[1])
+                    if arena is not None:
+                        session.lstm_slot = arena.allocate()
+                    self._sessions[device_id] = session
+                else:
+                    self._sessions.move_to_end(device_id)
+                session.last_seen = now
+                if scaler is None:
+                    windows.append((session.count, None, None))
+                    continue
+                session.push(scaled[i])
+                windows.append((session.count, session.newest.copy(), session.oldest.copy() if session.count >= 2 else None))
+                if session.lstm_slot is not None:
+                    k = occurrences.get(device_id, 0)
+                    occurrences[device_id] = k + 1
+                    if k == len(lstm_rounds):
+                        lstm_rounds.append([])
+                    lstm_rounds[k].append((i, session.lstm_slot))
+
+            # Stepped under the store lock so an eviction cannot hand a slot to another device mid-step
+            lstm_probs = [None] * len(device_ids)
+            for pending in lstm_rounds:
+                if not pending:
+                    continue
+                rows, slots = zip(*pending)
+                for i, prob in zip(rows, arena.step(slots, scaled[list(rows)]).tolist()):
+                    lstm_probs[i] = prob
+
+        results = []
+        for (samples, newest, oldest), lstm_prob in zip(windows, lstm_probs):
+            if newest is None:
+                results.append(SessionStep(0.5, samples, 0.5, None))
+                continue
+            zscore_prob = zscore_probability(zscore_score(newest, oldest))
+            results.append(SessionStep(blend_probability(zscore_prob, lstm_prob, self.lstm_weight), samples, zscore_prob, lstm_prob))
+        return results
+
+    def end(self, device_id: str) -> bool:
+        with self._lock:
+            session = self._sessions.pop(device_id, None)
+            if session is not None:
+                self._release(session)
+        return session is not None
+
+    def _lstm_arena(self):
+        if not self.lstm_enabled:
+            return None
+        if self._arena is None:
+            with self._arena_lock:
+                if self._arena is None:
+                    from backend.services.lstm_state import LSTMStateArena
+                    self._arena = LSTMStateArena(self.models.rnn_model, self.max_sessions)
+        return self._arena
+
+    def _release(self, session: DeviceSession):
+        if session.lstm_slot is not None:
+            self._arena.release(session.lstm_slot)
+            session.lstm_slot = None
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def _expire(self, now: float):
+        # Sessions are kept in recency order, so expired ones sit at the front
+        if not self.ttl:
+            return
+        expired = 0
+        while self._sessions:
+            device_id, session = next(iter(self._sessions.items()))
+            if now - session.last_seen <= self.ttl:
+                break
+            del self._sessions[device_id]
+            self._release(session)
+            expired += 1
+        if expired:
+            self._evicted.inc(expired)
+
+SEQUENCE_LSTM_WEIGHT = float(os.getenv("SEQUENCE_LSTM_WEIGHT", "0.0"))
+
+sequence_sessions = SequenceSessionStore(
+    sequence_models,
+    window_size=int(os.getenv("SEQUENCE_WINDOW", "10")),
+    max_sessions=int(os.getenv("SEQUENCE_MAX_SESSIONS", "10000")),
+    ttl_seconds=float(os.getenv("SEQUENCE_SESSION_TTL_SECONDS", "600")),
+    lstm=os.getenv("SEQUENCE_LSTM", "true").lower() in ("1", "true", "yes", "on"),
+    lstm_weight=SEQUENCE_LSTM_WEIGHT
+)
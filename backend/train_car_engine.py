@@ -1,3 +1,5 @@
+import argparse
+import copy
 import os
 import pandas as pd
 import numpy as np
@@ -10,7 +12,7 @@ from sklearn.ensemble import IsolationForest
 from sklearn.preprocessing import StandardScaler
 
 # Import the newly created RNN resources
-from backend.models.rnn_model import PredictiveRNN, create_sequences
+from backend.models.rnn_model import PredictiveRNN, SequenceWindowDataset, window_loader
 import matplotlib.pyplot as plt
 import seaborn as sns
 from sklearn.metrics import confusion_matrix, roc_curve, auc
@@ -27,21 +29,26 @@ if not logger.handlers:
 def build_data_pipeline(data_path: str):
     """
     Ingests dataset, extracts core engine features dynamically without hardcoding
-    AI4I columns, and engineers the target label.
+    AI4I columns, and engineers the target label. Also returns each row's
+    vehicle_id (rows sorted per vehicle by time) so LSTM windows never span
+    two vehicles.
     """
     logger.info(f"Loading data from {data_path}")
     if not os.path.exists(data_path):
         raise FileNotFoundError(f"Dataset not found at {data_path}. Please download it from Kaggle.")
-        
-    df = pd.read_csv(data_path)
     
     # Core Engine Features mapping
     features = ['engine_rpm', 'oil_pressure_psi', 'coolant_temp_c', 'vibration_level', 'engine_temp_c']
     
     # Verify new domain features are present dynamically
-    missing = [f for f in features if f not in df.columns]
+    header = pd.read_csv(data_path, nrows=0).columns
+    missing = [f for f in features + ['vehicle_id', 'timestamp', 'failure_type'] if f not in header]
     if missing:
         raise ValueError(f"Missing required columns in dataset: {missing}")
+
+    # Only the columns we use: the full file has ~40, most of them unused here
+    df = pd.read_csv(data_path, usecols=features + ['vehicle_id', 'timestamp', 'failure_type'])
+    df = df.sort_values(['vehicle_id', 'timestamp'], kind='stable', ignore_index=True)
         
     logger.info("Engineering target label (Failure: 'Engine' -> 1, Normal/Others -> 0)")
     # Data Engineering requirement: failure_type == 'Engine' maps to 1, everything else to 0
@@ -52,12 +59,13 @@ def build_data_pipeline(data_path: str):
     
     X = df[features].values
     y = df['target'].values
+    groups = df['vehicle_id'].values
     
     # Scale features
     scaler = StandardScaler()
     X_scaled = scaler.fit_transform(X)
     
-    return X_scaled, y, scaler, features
+    return X_scaled, y, scaler, features, groups
 
 def train_isolation_forest(X, save_dir: str):
     """
@@ -72,27 +80,26 @@ def train_isolation_forest(X, save_dir: str):
     joblib.dump(iso_forest, model_path)
     logger.info(f"Isolation Forest saved to {model_path}")
 
-def train_lstm(X, y, save_dir: str, seq_length: int = 10, epochs: int = 100):
+def train_lstm(X, y, save_dir: str, seq_length: int = 10, epochs: int = 100, groups=None,
+               batch_size: int = 256, num_workers: int = 0, patience: int = 10, seed: int = 42):
     """
     Trains the LSTM model with manual class weighting and train/val split.
     Uses standard forward() (with sigmoid) + BCELoss for consistency.
+
+    Windows are cut per mini-batch from the scaled matrix (never all at
+    once), shuffled each epoch, and training stops once validation loss
+    hasn't improved for `patience` epochs; the best weights are kept.
     """
     logger.info(f"Creating sequences for LSTM (seq_length={seq_length})...")
-    X_seq = create_sequences(X.tolist(), seq_length=seq_length)
-    y_seq = y[seq_length - 1:]
-    
-    if len(X_seq) != len(y_seq):
-        raise ValueError(f"Sequence mismatch: X={len(X_seq)}, y={len(y_seq)}")
+    dataset = SequenceWindowDataset(X, y, seq_length=seq_length, group_ids=groups)
+    if len(dataset) < 2:
+        raise ValueError(f"Not enough rows for seq_length={seq_length}: {len(dataset)} windows")
     
     # Train/Val split (80/20)
-    split_idx = int(len(X_seq) * 0.8)
-    X_train, X_val = X_seq[:split_idx], X_seq[split_idx:]
-    y_train, y_val = y_seq[:split_idx], y_seq[split_idx:]
-    
-    X_train_t = torch.tensor(X_train, dtype=torch.float32)
-    y_train_t = torch.tensor(y_train, dtype=torch.float32).unsqueeze(1)
-    X_val_t = torch.tensor(X_val, dtype=torch.float32)
-    y_val_t = torch.tensor(y_val, dtype=torch.float32).unsqueeze(1)
+    split_idx = int(len(dataset) * 0.8)
+    train_set, val_set = dataset.subset(0, split_idx), dataset.subset(split_idx)
+    y_train = train_set.window_targets
+    logger.info(f"{len(dataset)} windows ({len(train_set)} train / {len(val_set)} val)")
     
     # Compute manual class weights for BCELoss — CAPPED at 10x to prevent collapse
     n_pos = y_train.sum()
@@ -101,61 +108,85 @@ def train_lstm(X, y, save_dir: str, seq_length: int = 10, epochs: int = 100):
     w_neg = 1.0
     logger.info(f"Class weighting: w_pos={w_pos:.2f}, w_neg={w_neg:.2f} (neg={n_neg}, pos={n_pos})")
     
-    # Build per-sample weight tensor for training set
-    sample_weights_train = torch.where(y_train_t == 1, w_pos, w_neg)
-    sample_weights_val = torch.where(y_val_t == 1, w_pos, w_neg)
-    
+    torch.manual_seed(seed)
     input_size = X.shape[1]
     model = PredictiveRNN(input_size=input_size, hidden_size=64, num_layers=2)
     criterion = nn.BCELoss(reduction='none')  # no reduction so we can apply manual weights
     optimizer = optim.Adam(model.parameters(), lr=0.003, weight_decay=1e-5)  # Higher LR
+
+    def weighted_loss(outputs, targets):
+        return criterion(outputs, targets) * torch.where(targets == 1, w_pos, w_neg)
+
+    train_loader = window_loader(train_set, batch_size, shuffle=True, num_workers=num_workers, seed=seed)
+    val_loader = window_loader(val_set, batch_size, num_workers=num_workers)
     
-    logger.info(f"Training LSTM Model for {epochs} epochs...")
-    model.train()
+    logger.info(f"Training LSTM Model for up to {epochs} epochs (batch_size={batch_size}, patience={patience})...")
     train_losses = []
     val_losses = []
+    best_val, best_state, stale_epochs = float('inf'), None, 0
     
     for epoch in range(epochs):
-        optimizer.zero_grad()
-        outputs = model(X_train_t)  # forward() with sigmoid
-        raw_loss = criterion(outputs, y_train_t)
-        weighted_loss = (raw_loss * sample_weights_train).mean()
-        weighted_loss.backward()
-        optimizer.step()
-        train_losses.append(weighted_loss.item())
+        model.train()
+        total, count = 0.0, 0
+        for xb, yb in train_loader:
+            optimizer.zero_grad()
+            loss = weighted_loss(model(xb), yb).mean()  # forward() with sigmoid
+            loss.backward()
+            optimizer.step()
+            total += loss.item() * len(xb)
+            count += len(xb)
+        train_losses.append(total / count)
         
         # Validation loss
         model.eval()
+        total, count = 0.0, 0
         with torch.no_grad():
-            val_out = model(X_val_t)
-            val_raw = criterion(val_out, y_val_t)
-            val_weighted = (val_raw * sample_weights_val).mean()
-            val_losses.append(val_weighted.item())
-        model.train()
+            for xb, yb in val_loader:
+                total += weighted_loss(model(xb), yb).sum().item()
+                count += len(xb)
+        val_losses.append(total / max(count, 1))
         
         if (epoch + 1) % 10 == 0:
-            logger.info(f"Epoch {epoch+1}/{epochs} - Train Loss: {weighted_loss.item():.4f} | Val Loss: {val_weighted.item():.4f}")
+            logger.info(f"Epoch {epoch+1}/{epochs} - Train Loss: {train_losses[-1]:.4f} | Val Loss: {val_losses[-1]:.4f}")
+
+        if val_losses[-1] < best_val:
+            best_val, best_state, stale_epochs = val_losses[-1], copy.deepcopy(model.state_dict()), 0
+        else:
+            stale_epochs += 1
+            if patience and stale_epochs >= patience:
+                logger.info(f"Early stopping at epoch {epoch+1}: best Val Loss {best_val:.4f}")
+                break
+
+    if best_state is not None:
+        model.load_state_dict(best_state)
     
     model_path = os.path.join(save_dir, "lstm_car_engine.pt")
     torch.save(model.state_dict(), model_path)
     logger.info(f"LSTM model saved to {model_path}")
     
-    # Generate predictions for evaluation using forward() with sigmoid
+    # Generate predictions for evaluation using forward() with sigmoid, batch by batch
     model.eval()
-    X_all_t = torch.tensor(X_seq, dtype=torch.float32)
     with torch.no_grad():
-        preds = model(X_all_t).numpy()
+        preds = np.concatenate([model(xb).numpy() for xb, _ in window_loader(dataset, batch_size, num_workers=num_workers)])
         
-    return train_losses, val_losses, y_seq, preds
+    return train_losses, val_losses, dataset.window_targets, preds
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Train the car-engine Isolation Forest and LSTM')
+    parser.add_argument('--seq-length', type=int, default=10, help='LSTM window length (default: 10)')
+    parser.add_argument('--epochs', type=int, default=100, help='Maximum training epochs (default: 100)')
+    parser.add_argument('--batch-size', type=int, default=256, help='Windows per mini-batch (default: 256)')
+    parser.add_argument('--patience', type=int, default=10, help='Epochs without val improvement before stopping; 0 disables (default: 10)')
+    parser.add_argument('--workers', type=int, default=0, help='DataLoader worker processes (default: 0)')
+    args = parser.parse_args()
+
     # Kaggle dataset path assuming it gets downloaded to data/raw
     DATA_PATH = os.path.join("data", "raw", "vehicle_maintenance_telemetry.csv")
     SAVE_DIR = "ml" # Existing folder for ML models
     os.makedirs(SAVE_DIR, exist_ok=True)
     
     try:
-        X_scaled, y, scaler, features = build_data_pipeline(DATA_PATH)
+        X_scaled, y, scaler, features, groups = build_data_pipeline(DATA_PATH)
         
         # Save scaler for future inference consistency
         scaler_path = os.path.join(SAVE_DIR, "scaler_car_engine.pkl")
@@ -164,7 +195,10 @@ if __name__ == "__main__":
         
         # Train Models
         train_isolation_forest(X_scaled, save_dir=SAVE_DIR)
-        train_losses, val_losses, y_true, y_preds = train_lstm(X_scaled, y, save_dir=SAVE_DIR)
+        train_losses, val_losses, y_true, y_preds = train_lstm(
+            X_scaled, y, save_dir=SAVE_DIR, seq_length=args.seq_length, epochs=args.epochs, groups=groups,
+            batch_size=args.batch_size, num_workers=args.workers, patience=args.patience
+        )
         
         # MLOps Evaluation Graphs
         logger.info("Generating LSTM Evaluation Reports...")
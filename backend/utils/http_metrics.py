@@ -0,0 +1,91 @@
+import time
+
+from fastapi.routing import APIRoute
+
+from backend.utils.metrics import current_endpoint, metrics_collector
+from backend.utils.profiling import request_profiler
+
+HTTP_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def route_label(scope) -> str:
+    """
+    The matched route's template with the prefix it was included under,
+    e.g. "/api/drift/segments/{key}", or "unmatched".
+    """
+    route = scope.get("route")
+    if route is None:
+        return "unmatched"
+    template = route.path
+    # Included routers report their own relative template; the request path has the prefix
+    # in front of as many segments as the template has (no route here uses a {x:path} converter)
+    depth = template.count("/")
+    prefix = "/".join(scope["path"].split("/")[:-depth]) if depth else ""
+    return prefix + template
+
+class RequestMetricsMiddleware:
+    """
+    ASGI middleware recording per-route request latency and the number of
+    requests in flight.
+
+    Latency is labelled with the matched route template (`/api/drift/segments/{key}`,
+    not the raw path), so label cardinality stays bounded; requests that
+    match no route share the "unmatched" label. The timer stops when the
+    response body has been sent, which includes streaming responses.
+    Written as plain ASGI rather than BaseHTTPMiddleware, which would add
+    a task and a stream copy per request.
+    """
+    def __init__(self, app):
+        self.app = app
+        self.in_flight = 0
+        self._latency = metrics_collector.histogram(
+            "http_request_duration_seconds",
+            "HTTP request latency by method, route template and status",
+            HTTP_LATENCY_BUCKETS,
+            ("method", "route", "status")
+        )
+        metrics_collector.gauge("http_requests_in_flight", "HTTP requests currently being handled", lambda: self.in_flight)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500  # if the app raises before starting a response
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        # Single event loop thread: no lock needed around the counter
+        self.in_flight += 1
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            self.in_flight -= 1
+            self._latency.labels(scope["method"], route_label(scope), status).observe(time.perf_counter() - start)
+
+class MeteredRoute(APIRoute):
+    """
+    Route class that sets current_endpoint to the matched route template
+    while its handler runs, so metrics recorded further down (including in
+    threadpool calls it makes) carry an `endpoint` label. Also where sampled
+    cProfile windows open and close (see RequestProfiler).
+    """
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def metered_handler(request):
+            label = route_label(request.scope)
+            token = current_endpoint.set(label)
+            profile = request_profiler.begin() if request_profiler.enabled else None
+            try:
+                return await handler(request)
+            finally:
+                if profile is not None:
+                    request_profiler.end(label, profile)
+                current_endpoint.reset(token)
+
+        return metered_handler
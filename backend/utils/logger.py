@@ -1,27 +1,126 @@
+import atexit
+import copy
 import logging
+import os
+import queue
+import random
 import sys
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
 from pythonjsonlogger import jsonlogger
 
+from backend.utils.metrics import metrics_collector
+
+# Bounded queue between request threads and the stdout writer; 0 writes synchronously as before
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+def parse_sample_rates(spec: str) -> Dict[str, float]:
+    """
+    "Prediction successful=0.01;Received prediction request=0.1" -> {message: rate}.
+    Keys are the record's extra={"sample_key": ...} if set, otherwise the message
+    as passed to the logger (before %-formatting), so an f-string message, which
+    differs on every call, can only be sampled through a sample_key.
+    """
+    rates = {}
+    for entry in spec.split(";"):
+        if not entry.strip():
+            continue
+        message, _, rate = entry.rpartition("=")
+        rates[message.strip()] = min(max(float(rate), 0.0), 1.0)
+    return rates
+
+LOG_SAMPLE_RATES = parse_sample_rates(os.getenv("LOG_SAMPLE_RATES", ""))
+
+_dropped = metrics_collector.counter(
+    "logs_dropped_total", "Log records not written, by reason (sampled or queue_full)", ("reason",)
+)
+_SAMPLED = _dropped.labels("sampled")
+_QUEUE_FULL = _dropped.labels("queue_full")
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps a configured fraction of records per sample_key or message template;
+    warnings and errors are always kept. Runs on the logger, before a record reaches any handler.
+    """
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rates.get(getattr(record, "sample_key", record.msg))
+        if rate is None or random.random() < rate:
+            return True
+        _SAMPLED.inc()
+        return False
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    QueueHandler that never blocks the caller: a full queue drops the record
+    and counts it. prepare() only merges the message arguments and renders a
+    traceback, if any; the JSON formatting and the stdout write happen on the
+    listener thread.
+    """
+    _exception_formatter = logging.Formatter()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            # Rendered here, while the frames are still in the state the exception left them
+            record.exc_text = self._exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _QUEUE_FULL.inc()
+
+def _stdout_handler() -> logging.Handler:
+    handler = logging.StreamHandler(sys.stdout)
+    # Custom JSON formatter
+    handler.setFormatter(jsonlogger.JsonFormatter(
+        "%(timestamp)s %(level)s %(name)s %(message)s",
+        timestamp=True
+    ))
+    return handler
+
+_queue_handler: Optional[DroppingQueueHandler] = None
+
+def _shared_handler() -> logging.Handler:
+    """One queue and one writer thread shared by every logger in the process."""
+    global _queue_handler
+    if LOG_QUEUE_SIZE <= 0:
+        return _stdout_handler()
+    if _queue_handler is None:
+        log_queue = queue.Queue(LOG_QUEUE_SIZE)
+        _queue_handler = DroppingQueueHandler(log_queue)
+        listener = QueueListener(log_queue, _stdout_handler())
+        listener.start()
+        # Drains what is still queued on interpreter exit
+        atexit.register(listener.stop)
+        metrics_collector.gauge("log_queue_depth", "Log records waiting for the writer thread", log_queue.qsize)
+    return _queue_handler
+
 def setup_logger(name: str):
     logger = logging.getLogger(name)
     logger.setLevel(logging.INFO)
-    
+
     # Check if handler exists to avoid duplicate logs in reloads
     if not logger.handlers:
-        handler = logging.StreamHandler(sys.stdout)
-        
-        # Custom JSON formatter
-        formatter = jsonlogger.JsonFormatter(
-            "%(timestamp)s %(level)s %(name)s %(message)s",
-            timestamp=True
-        )
-        handler.setFormatter(formatter)
-        logger.addHandler(handler)
-        
+        logger.addHandler(_shared_handler())
+        if LOG_SAMPLE_RATES:
+            logger.addFilter(SamplingFilter(LOG_SAMPLE_RATES))
+
         # Propagate to root helps sometimes or set root
         logger.propagate = False
-        
+
     return logger
 
-# Create a default logger instance for easy import if needed, 
+# Create a default logger instance for easy import if needed,
 # but usually we call setup_logger(__name__) in modules.
@@ -1,45 +1,341 @@
+import bisect
 import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, Sequence, Tuple
+
+# Finer than request-level buckets: most scoring stages take tens of microseconds
+STAGE_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+# Prometheus text exposition format, served by both /metrics routes
+CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+# Route template of the request being handled, set by RequestMetricsMiddleware. Copied into
+# threadpool calls and tasks started from the request; "internal" for background work.
+current_endpoint: ContextVar[str] = ContextVar("current_endpoint", default="internal")
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _series(name: str, labels: str, extra: str = "") -> str:
+    inner = ",".join(part for part in (labels, extra) if part)
+    return f"{name}{{{inner}}}" if inner else name
+
+class Timer:
+    """Context manager that observes its elapsed perf_counter() seconds on exit."""
+    __slots__ = ("_observe", "_start")
+
+    def __init__(self, observe: Callable[[float], None]):
+        self._observe = observe
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._observe(time.perf_counter() - self._start)
+        return False
+
+class _ThreadSharded:
+    """
+    Base for metrics updated without a lock: each thread accumulates into
+    its own cell (a list of `width` numbers) and only that thread ever
+    writes it, so an update is a thread-local lookup and an in-place add.
+    Scrapes sum the cells. A thread's cell outlives the thread, so totals
+    never go backwards; pools reuse their threads, so the cell count stays
+    bounded by the peak thread count.
+    """
+    def __init__(self, width: int):
+        self._width = width
+        self._local = threading.local()
+        self._cells: list = []
+        self._cells_lock = threading.Lock()  # taken only when a thread first updates, and at scrape
+
+    def _new_cell(self) -> list:
+        cell = [0] * self._width
+        with self._cells_lock:
+            self._cells.append(cell)
+        self._local.cell = cell
+        return cell
+
+    def _totals(self) -> list:
+        with self._cells_lock:
+            cells = list(self._cells)
+        return [sum(column) for column in zip(*cells)] if cells else [0] * self._width
+
+class Counter(_ThreadSharded):
+    """Monotonic counter rendered in Prometheus text format."""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str):
+        super().__init__(1)
+        self.name = name
+        self.documentation = documentation
+
+    def inc(self, amount: int = 1):
+        try:
+            self._local.cell[0] += amount
+        except AttributeError:
+            self._new_cell()[0] += amount
+
+    @property
+    def value(self):
+        return self._totals()[0]
+
+    def samples(self, labels: str = "") -> list:
+        return [f"{_series(self.name, labels)} {self.value}"]
+
+    def render(self) -> list:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} counter",
+            *self.samples()
+        ]
+
+class Gauge:
+    """Gauge whose value is read from a callback at scrape time."""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[], float]):
+        self.name = name
+        self.documentation = documentation
+        self._callback = callback
+
+    def render(self) -> list:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} gauge",
+            f"{self.name} {self._callback()}"
+        ]
+
+class Histogram(_ThreadSharded):
+    """Cumulative-bucket histogram rendered in Prometheus text format."""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float]):
+        self.name = name
+        self.documentation = documentation
+        self._bounds = sorted(buckets)
+        super().__init__(len(self._bounds) + 2)  # bucket counts, the +Inf count, then the sum
+
+    def observe(self, value: float):
+        idx = bisect.bisect_left(self._bounds, value)
+        try:
+            cell = self._local.cell
+        except AttributeError:
+            cell = self._new_cell()
+        cell[idx] += 1
+        cell[-1] += value
+
+    def time(self) -> Timer:
+        """`with histogram.time():` observes the block's duration in seconds."""
+        return Timer(self.observe)
+
+    def samples(self, labels: str = "") -> list:
+        *counts, total = self._totals()
+
+        lines = []
+        cumulative = 0
+        bucket = self.name + "_bucket"
+        for bound, count in zip(self._bounds, counts):
+            cumulative += count
+            le = f'le="{bound}"'
+            lines.append(f"{_series(bucket, labels, le)} {cumulative}")
+        cumulative += counts[-1]
+        inf = 'le="+Inf"'
+        lines.append(f"{_series(bucket, labels, inf)} {cumulative}")
+        lines.append(f"{_series(self.name + '_sum', labels)} {total}")
+        lines.append(f"{_series(self.name + '_count', labels)} {cumulative}")
+        return lines
+
+    def render(self) -> list:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+            *self.samples()
+        ]
+
+class Summary(_ThreadSharded):
+    """
+    Count and sum of observations (a Prometheus summary without quantiles,
+    as prometheus_client's Summary does); cheaper than a histogram when only
+    the mean rate matters.
+    """
+    kind = "summary"
+
+    def __init__(self, name: str, documentation: str):
+        super().__init__(2)  # count, sum
+        self.name = name
+        self.documentation = documentation
+
+    def observe(self, value: float):
+        try:
+            cell = self._local.cell
+        except AttributeError:
+            cell = self._new_cell()
+        cell[0] += 1
+        cell[1] += value
+
+    def time(self) -> Timer:
+        return Timer(self.observe)
+
+    def samples(self, labels: str = "") -> list:
+        count, total = self._totals()
+        return [f"{_series(self.name + '_sum', labels)} {total}", f"{_series(self.name + '_count', labels)} {count}"]
+
+    def render(self) -> list:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} summary",
+            *self.samples()
+        ]
+
+class MetricFamily:
+    """
+    Labelled children of one metric, rendered under a single HELP/TYPE
+    header. labels() creates a child on first use and afterwards is one
+    lock-free dict lookup; hot paths can still resolve a child once and
+    keep it.
+    """
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str], factory: Callable[[], object]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._factory = factory
+        self._lock = threading.Lock()
+        # Keyed by the values as callers pass them (e.g. status 404) and as strings ("404"), both
+        # mapping to the same child; _series holds each child once, by its string label values
+        self._children: Dict[tuple, object] = {}
+        self._series: Dict[Tuple[str, ...], object] = {}
+        self.kind = factory().kind
+
+    def labels(self, *values, **kwargs):
+        if kwargs:
+            values = tuple(kwargs[name] for name in self.labelnames)
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} takes labels {self.labelnames}, got {values}")
+            key = tuple(str(v) for v in values)
+            with self._lock:
+                child = self._series.get(key)
+                if child is None:
+                    child = self._series[key] = self._factory()
+                self._children[values] = self._children[key] = child
+        return child
+
+    def children(self) -> Dict[Tuple[str, ...], object]:
+        """Snapshot of label values -> child metric."""
+        with self._lock:
+            return dict(self._series)
+
+    def render(self) -> list:
+        with self._lock:
+            series = sorted(self._series.items())
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in series:
+            labels = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, values))
+            lines.extend(child.samples(labels))
+        return lines
 
 class MetricsCollector:
+    """
+    Registry of named metrics, rendered in registration order by
+    generate_latest(). Updates never take the registry lock: counters,
+    histograms and summaries accumulate per thread and are summed at scrape.
+    """
     def __init__(self):
         self._lock = threading.Lock()
-        self._predictions_total = 0
-        self._anomalies_total = 0
-        self._failures_total = 0
+        self._metrics = {}
+        self.predictions = self.counter(
+            "predictions_total", "Total number of predictions served", ("model_version", "endpoint", "outcome")
+        )
+        self.anomalies = self.counter(
+            "anomalies_total", "Total number of anomalies detected", ("model_version", "endpoint")
+        )
+        self.failures = self.counter(
+            "failures_total", "Total number of machine failures predicted", ("model_version", "endpoint")
+        )
 
-    def increment_predictions(self):
+    def _register(self, name: str, factory):
         with self._lock:
-            self._predictions_total += 1
+            if name not in self._metrics:
+                self._metrics[name] = factory()
+            return self._metrics[name]
 
-    def increment_anomalies(self):
+    def register(self, name: str, collector):
+        """Registers any object exposing render() -> list of exposition lines."""
         with self._lock:
-            self._anomalies_total += 1
+            self._metrics[name] = collector
+        return collector
 
-    def increment_failures(self):
-        with self._lock:
-            self._failures_total += 1
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        """
+        Returns the counter registered under `name`, creating it on first use;
+        a MetricFamily of counters when `labelnames` are given.
+        """
+        return self._register(name, self._family(name, documentation, labelnames, lambda: Counter(name, documentation)))
+
+    def gauge(self, name: str, documentation: str, callback: Callable[[], float]) -> Gauge:
+        """Registers a callback gauge; re-registering a name replaces its callback."""
+        return self.register(name, Gauge(name, documentation, callback))
+
+    def histogram(self, name: str, documentation: str, buckets: Sequence[float], labelnames: Sequence[str] = ()):
+        """Returns the histogram (or labelled MetricFamily) registered under `name`, creating it on first use."""
+        return self._register(
+            name, self._family(name, documentation, labelnames, lambda: Histogram(name, documentation, buckets))
+        )
+
+    def summary(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        """Returns the summary (or labelled MetricFamily) registered under `name`, creating it on first use."""
+        return self._register(name, self._family(name, documentation, labelnames, lambda: Summary(name, documentation)))
+
+    @staticmethod
+    def _family(name: str, documentation: str, labelnames: Sequence[str], factory):
+        if not labelnames:
+            return factory
+        return lambda: MetricFamily(name, documentation, labelnames, factory)
+
+    def stage(self, operation: str, stage: str) -> Histogram:
+        """
+        Latency histogram for one stage of a request path, e.g.
+        `stage("predict", "scale")`. Resolve it once at import and time the
+        stage with `with span.time():`.
+        """
+        return self.histogram(
+            "stage_duration_seconds",
+            "Time spent in each stage of a request path",
+            STAGE_BUCKETS,
+            ("operation", "stage")
+        ).labels(operation, stage)
+
+    def record_predictions(self, model_version: str, n_normal: int, n_anomalies: int, n_failures: int,
+                           n_anomaly_only: int):
+        """
+        Counts one scored batch. Each row's outcome is "failure" if it was
+        predicted to fail, else "anomaly" if flagged as one, else "normal";
+        anomalies_total still counts every anomaly, failing or not. The
+        endpoint label comes from current_endpoint.
+        """
+        endpoint = current_endpoint.get()
+        if n_normal:
+            self.predictions.labels(model_version, endpoint, "normal").inc(n_normal)
+        if n_anomaly_only:
+            self.predictions.labels(model_version, endpoint, "anomaly").inc(n_anomaly_only)
+        if n_failures:
+            self.predictions.labels(model_version, endpoint, "failure").inc(n_failures)
+            self.failures.labels(model_version, endpoint).inc(n_failures)
+        if n_anomalies:
+            self.anomalies.labels(model_version, endpoint).inc(n_anomalies)
 
     def generate_latest(self) -> str:
         """Returns metrics in Prometheus text format."""
-        lines = []
-        
         with self._lock:
-            p_count = self._predictions_total
-            a_count = self._anomalies_total
-            f_count = self._failures_total
-            
-        lines.append("# HELP predictions_total Total number of predictions served")
-        lines.append("# TYPE predictions_total counter")
-        lines.append(f"predictions_total {p_count}")
-        
-        lines.append("# HELP anomalies_total Total number of anomalies detected")
-        lines.append("# TYPE anomalies_total counter")
-        lines.append(f"anomalies_total {a_count}")
-        
-        lines.append("# HELP failures_total Total number of machine failures predicted")
-        lines.append("# TYPE failures_total counter")
-        lines.append(f"failures_total {f_count}")
-        
+            registered = list(self._metrics.values())
+
+        lines = []
+        for metric in registered:
+            lines.extend(metric.render())
         return "\n".join(lines) + "\n"
 
 # Global instance
@@ -0,0 +1,219 @@
+import cProfile
+import io
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Dict, Optional
+
+class ProfilerBusy(RuntimeError):
+    """Raised when a profiling session of the same kind is already running."""
+
+def _frame_label(code) -> str:
+    # Qualified name and the function's first line, so one function is one flamegraph node
+    path = "/".join(code.co_filename.split(os.sep)[-2:])
+    return f"{code.co_qualname} ({path}:{code.co_firstlineno})"
+
+# Leaf frames of threads parked waiting for work: pool workers (concurrent.futures blocks in a
+# C-level SimpleQueue.get, so its leaf Python frame is _worker), the selector, queue gets
+IDLE_LEAVES = {
+    ("threading.py", "wait"), ("threading.py", "_wait_for_tstate_lock"), ("thread.py", "_worker"),
+    ("selectors.py", "select"), ("queue.py", "get")
+}
+
+class StackSampler:
+    """
+    Wall-clock sampling profiler over every Python thread.
+
+    A helper thread reads sys._current_frames() every `interval` seconds and
+    counts each thread's stack, root first, in collapsed form ("a;b;c 12"),
+    which flamegraph.pl, speedscope and inferno read directly. Nothing is
+    installed in the profiled threads, so the cost is the sampling thread's
+    own GIL time and only while a session runs. Async code shows up under
+    the event loop thread; stacks parked in a wait are dropped unless
+    `include_idle`.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def sample(self, seconds: float, interval: float = 0.005, include_idle: bool = False) -> dict:
+        """Blocking: samples for `seconds` and returns {"collapsed", "samples", "seconds"}."""
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusy("A CPU profile is already running")
+        try:
+            stacks: Counter = Counter()
+            me = threading.get_ident()
+            names = {}
+            samples = 0
+            deadline = time.perf_counter() + seconds
+            while time.perf_counter() < deadline:
+                for ident, frame in sys._current_frames().items():
+                    if ident == me:
+                        continue
+                    leaf = frame.f_code
+                    if not include_idle and (os.path.basename(leaf.co_filename), leaf.co_name) in IDLE_LEAVES:
+                        continue
+                    labels = []
+                    while frame is not None:
+                        labels.append(_frame_label(frame.f_code))
+                        frame = frame.f_back
+                    if ident not in names:
+                        names = {t.ident: t.name for t in threading.enumerate()}
+                    labels.append(f"thread:{names.get(ident, ident)}")
+                    stacks[";".join(reversed(labels))] += 1
+                samples += 1
+                time.sleep(interval)
+        finally:
+            self._lock.release()
+        collapsed = "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+        return {"collapsed": collapsed, "samples": samples, "seconds": seconds}
+
+class MemoryProfiler:
+    """
+    tracemalloc sessions: start() begins tracing (allocations made before it
+    are not seen), snapshot() reports the top allocation sites, compared to
+    the start when asked, and stop() turns tracing off. tracemalloc slows
+    every allocation while tracing, so leave it stopped when not in use.
+    """
+    def __init__(self):
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int = 1):
+        if tracemalloc.is_tracing():
+            raise ProfilerBusy("tracemalloc is already tracing")
+        tracemalloc.start(frames)
+        self._baseline = self._take()
+
+    def stop(self):
+        self._baseline = None
+        tracemalloc.stop()
+
+    def snapshot(self, top: int = 25, group_by: str = "lineno", compare: bool = False) -> dict:
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is not tracing; start a memory session first")
+        snapshot = self._take()
+        current, peak = tracemalloc.get_traced_memory()
+        if compare and self._baseline is not None:
+            allocations = [
+                {"location": self._location(stat.traceback), "size_bytes": stat.size, "size_diff_bytes": stat.size_diff,
+                 "count": stat.count, "count_diff": stat.count_diff}
+                for stat in snapshot.compare_to(self._baseline, group_by)[:top]
+            ]
+        else:
+            allocations = [
+                {"location": self._location(stat.traceback), "size_bytes": stat.size, "count": stat.count}
+                for stat in snapshot.statistics(group_by)[:top]
+            ]
+        return {"traced_current_bytes": current, "traced_peak_bytes": peak, "group_by": group_by, "top": allocations}
+
+    @staticmethod
+    def _take() -> tracemalloc.Snapshot:
+        # Leave out tracemalloc's own bookkeeping and import machinery
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>")
+        ))
+
+    @staticmethod
+    def _location(traceback: tracemalloc.Traceback) -> str:
+        return " <- ".join(f"{frame.filename}:{frame.lineno}" for frame in traceback)
+
+class RequestProfiler:
+    """
+    cProfile windows opened for a sampled fraction of requests, aggregated
+    by the route of the request that opened them.
+
+    Routes check `enabled` (a plain attribute) before anything else, so
+    while off the only cost is that check. The stats are not the request's
+    own work: on Python 3.12+ cProfile hooks the whole interpreter, and the
+    window stays open across the handler's awaits, so every thread and every
+    coroutine that ran while the request was in flight is counted. They
+    show where the process spent its time while requests to that route
+    were being served, which is why the report calls them `in_flight` and
+    records the wall time covered. One window is open at a time (a second
+    profiler could not start anyway). Streaming bodies run after the
+    handler returns and are not included; use the stack sampler for those.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.fraction = 0.0
+        self._active = threading.Lock()
+        self._lock = threading.Lock()
+        self._stats: Dict[str, pstats.Stats] = {}
+        self._profiled: Counter = Counter()
+        self._seconds: Counter = Counter()
+
+    def start(self, fraction: float):
+        if not 0.0 < fraction <= 1.0:
+            raise ValueError("fraction must be in (0, 1]")
+        with self._lock:
+            self._stats.clear()
+            self._profiled.clear()
+            self._seconds.clear()
+        self.fraction = fraction
+        self.enabled = True
+
+    def stop(self):
+        self.enabled = False
+
+    def begin(self) -> Optional[cProfile.Profile]:
+        """A started profile if this request is sampled (and none is running), else None."""
+        if random.random() >= self.fraction or not self._active.acquire(blocking=False):
+            return None
+        profile = cProfile.Profile()
+        profile.started_at = time.perf_counter()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler (e.g. a debugger or an outer cProfile) owns the hook
+            self._active.release()
+            return None
+        return profile
+
+    def end(self, route: str, profile: cProfile.Profile):
+        profile.disable()
+        self._active.release()
+        elapsed = time.perf_counter() - profile.started_at
+        with self._lock:
+            self._seconds[route] += elapsed
+            if route in self._stats:
+                self._stats[route].add(profile)
+            else:
+                self._stats[route] = pstats.Stats(profile)
+            self._profiled[route] += 1
+
+    def report(self, top: int = 30, sort: str = "cumulative") -> dict:
+        """
+        pstats text of the top `top` functions per route, with how many
+        requests opened a window and the wall seconds those windows covered.
+        """
+        with self._lock:
+            in_flight = {}
+            for route, stats in self._stats.items():
+                out = io.StringIO()
+                stats.stream = out
+                stats.sort_stats(sort).print_stats(top)
+                in_flight[route] = {
+                    "requests": self._profiled[route],
+                    "wall_seconds": round(self._seconds[route], 6),
+                    "stats": out.getvalue()
+                }
+        return {
+            "enabled": self.enabled,
+            "fraction": self.fraction,
+            "scope": "interpreter-wide: all threads and coroutines that ran while a sampled request was in flight",
+            "in_flight": in_flight
+        }
+
+stack_sampler = StackSampler()
+memory_profiler = MemoryProfiler()
+request_profiler = RequestProfiler()
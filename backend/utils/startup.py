@@ -0,0 +1,46 @@
+import threading
+import time
+from contextlib import contextmanager
+
+class StartupReport:
+    """
+    Records how long each lazily initialized component took to come up, so
+    /ready can show where cold-start time goes.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._components = {}
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def track(self, component: str):
+        with self._lock:
+            self._components[component] = {"status": "loading", "seconds": None}
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            with self._lock:
+                self._components[component] = {
+                    "status": "failed",
+                    "seconds": round(time.perf_counter() - start, 4),
+                    "error": str(e)
+                }
+            raise
+        with self._lock:
+            self._components[component] = {"status": "ready", "seconds": round(time.perf_counter() - start, 4)}
+
+    def record(self, component: str, seconds: float):
+        with self._lock:
+            self._components[component] = {"status": "ready", "seconds": round(seconds, 4)}
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            components = {name: dict(info) for name, info in self._components.items()}
+        return {
+            "uptime_seconds": round(time.perf_counter() - self._started, 3),
+            "components": components
+        }
+
+# Global instance
+startup_report = StartupReport()
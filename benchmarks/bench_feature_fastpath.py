@@ -0,0 +1,84 @@
+"""
+Micro-benchmark: legacy pandas feature construction + scaler.transform vs the
+precompiled NumPy row layout used by MLService.predict.
+
+Run from the repo root:
+    python -m benchmarks.bench_feature_fastpath --iterations 20000
+"""
+import argparse
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from backend.schemas.request import MachineData
+from backend.services.ml_service import ml_service, SENSOR_COLUMNS
+
+SAMPLE = MachineData(**{
+    "Air temperature [K]": 298.1,
+    "Process temperature [K]": 308.6,
+    "Rotational speed [rpm]": 1551,
+    "Torque [Nm]": 42.8,
+    "Tool wear [min]": 0
+})
+
+def legacy_features(data: MachineData) -> np.ndarray:
+    """The pre-fast-path implementation, kept verbatim for comparison."""
+    input_dict = {
+        "Air temperature [K]": [data.air_temperature],
+        "Process temperature [K]": [data.process_temperature],
+        "Rotational speed [rpm]": [data.rotational_speed],
+        "Torque [Nm]": [data.torque],
+        "Tool wear [min]": [data.tool_wear]
+    }
+    df = pd.DataFrame(input_dict)
+    for col in SENSOR_COLUMNS:
+        df[f'{col}_rolling_mean'] = df[col]
+        df[f'{col}_rolling_std'] = 0.0
+        df[f'{col}_delta'] = 0.0
+    if hasattr(ml_service.scaler, 'feature_names_in_'):
+        df = df[ml_service.scaler.feature_names_in_]
+    return ml_service.scaler.transform(df)
+
+def fast_features(data: MachineData) -> np.ndarray:
+    raw = np.array([[
+        data.air_temperature,
+        data.process_temperature,
+        data.rotational_speed,
+        data.torque,
+        data.tool_wear
+    ]], dtype=np.float64)
+    return ml_service.registry.active.scale_features(raw)
+
+def time_calls(fn, iterations: int) -> np.ndarray:
+    samples = np.empty(iterations)
+    for i in range(iterations):
+        start = time.perf_counter_ns()
+        fn(SAMPLE)
+        samples[i] = time.perf_counter_ns() - start
+    return samples / 1000.0  # microseconds
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the MLService feature fast path')
+    parser.add_argument('--iterations', type=int, default=20000)
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore")
+    ml_service.ensure_loaded()
+    assert np.array_equal(legacy_features(SAMPLE), fast_features(SAMPLE)), "fast path output differs from scaler.transform"
+
+    for fn in (legacy_features, fast_features):
+        time_calls(fn, 200)  # warm-up
+
+    results = {fn.__name__: time_calls(fn, args.iterations) for fn in (legacy_features, fast_features)}
+
+    print(f"{'path':<18}{'p50 (us)':>12}{'p99 (us)':>12}")
+    for name, samples in results.items():
+        print(f"{name:<18}{np.percentile(samples, 50):>12.2f}{np.percentile(samples, 99):>12.2f}")
+
+    speedup = np.percentile(results['legacy_features'], 50) / np.percentile(results['fast_features'], 50)
+    print(f"p50 speedup: {speedup:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Benchmark: cross-device LSTM batching and the CPU model variants.
+
+Windows (uneven lengths, 1..--max-len readings) are scored one request at a
+time through PredictiveRNN, as /predict/sequence used to, and then as one
+padded batch through each variant of build_cpu_model(). For every variant
+and batch size it reports throughput, speedup over the per-window loop and
+the largest absolute probability difference from it. The last table does
+the same for streaming steps: one arena call per device versus step_many().
+
+The shipped LSTM's output barely moves with its input, so accuracy deltas
+are measured on a randomly initialised PredictiveRNN unless --shipped is set.
+
+Run from the repo root:
+    python -m benchmarks.bench_lstm_variants --batch-sizes 1 16 128 512 --threads 1
+"""
+import argparse
+import time
+
+import numpy as np
+import torch
+
+from backend.models.rnn_model import PredictiveRNN
+from backend.services.lstm_batching import LSTM_VARIANTS, build_cpu_model, pad_windows
+from backend.services.sequence_models import configure_torch_threads, sequence_models
+from backend.services.sequence_sessions import SequenceSessionStore
+
+def time_call(fn, min_seconds: float = 0.5) -> float:
+    """Median seconds per call over repeated runs."""
+    fn()
+    samples = []
+    deadline = time.perf_counter() + min_seconds
+    while time.perf_counter() < deadline or len(samples) < 3:
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return float(np.median(samples))
+
+def per_window(model, windows) -> np.ndarray:
+    with torch.inference_mode():
+        return np.array([float(model(torch.as_tensor(w[None], dtype=torch.float32))[0, 0]) for w in windows])
+
+def bench_windows(model, batch_sizes, max_len: int, rng):
+    variants = {name: build_cpu_model(model, name) for name in LSTM_VARIANTS}
+    print(f"{'variant':>10}{'batch':>7}{'windows/s':>12}{'speedup':>10}{'max |delta|':>14}")
+    for n in batch_sizes:
+        windows = [rng.normal(size=(k, 5)) for k in rng.integers(1, max_len + 1, size=n)]
+        reference = per_window(model, windows)
+        baseline = time_call(lambda: per_window(model, windows))
+        print(f"{'loop':>10}{n:>7}{n / baseline:>12.0f}{1.0:>9.1f}x{0.0:>14.2e}")
+
+        x, lengths = pad_windows(windows)
+        x, lengths = torch.from_numpy(x), torch.from_numpy(lengths)
+        for name, compiled in variants.items():
+            def run():
+                with torch.inference_mode():
+                    return compiled(x, lengths).numpy()
+            delta = np.abs(run() - reference).max()
+            seconds = time_call(run)
+            print(f"{name:>10}{n:>7}{n / seconds:>12.0f}{baseline / seconds:>9.1f}x{delta:>14.2e}")
+
+def bench_steps(device_counts, rng):
+    scaler = sequence_models.inference_scaler
+    print(f"\n{'devices':>8}{'step() us/dev':>15}{'step_many us/dev':>18}{'speedup':>10}")
+    for n in device_counts:
+        devices = [f"car-{i}" for i in range(n)]
+        raw = rng.normal(scaler.mean_, scaler.scale_, size=(n, 5))
+        single = SequenceSessionStore(sequence_models, max_sessions=n, ttl_seconds=0, lstm=True)
+        batched = SequenceSessionStore(sequence_models, max_sessions=n, ttl_seconds=0, lstm=True)
+        one_by_one = time_call(lambda: [single.step(d, r) for d, r in zip(devices, raw)])
+        together = time_call(lambda: batched.step_many(devices, raw))
+        print(f"{n:>8}{one_by_one / n * 1e6:>15.1f}{together / n * 1e6:>18.1f}{one_by_one / together:>9.1f}x")
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare per-window and batched LSTM variants')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 16, 128, 512])
+    parser.add_argument('--max-len', type=int, default=10, help='Longest window; lengths are uniform in 1..max-len')
+    parser.add_argument('--threads', type=int, default=1, help='torch intra-op threads (0 keeps the torch default)')
+    parser.add_argument('--shipped', action='store_true', help='Use the shipped LSTM weights instead of random ones')
+    args = parser.parse_args()
+
+    shipped = sequence_models.rnn_model  # loading applies SEQUENCE_TORCH_THREADS, so override afterwards
+    configure_torch_threads(args.threads, 0)
+    torch.manual_seed(0)
+    model = shipped if args.shipped else PredictiveRNN(input_size=5).eval()
+    print(f"torch intra-op threads: {torch.get_num_threads()}\n")
+
+    rng = np.random.default_rng(0)
+    bench_windows(model, args.batch_sizes, args.max_len, rng)
+    bench_steps([n for n in args.batch_sizes if n > 1], rng)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark: ingest throughput and write amplification of the SQLite prediction
+store, plus filtered query latency once it holds the data.
+
+Write amplification is bytes the process actually wrote to disk (from
+/proc/self/io, falling back to final database + WAL size) divided by the
+logical payload (8 bytes per stored column).
+
+Run from the repo root:
+    python -m benchmarks.bench_prediction_store --rows 500000 --batch 512
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from backend.services.prediction_store import PredictionStore, INPUT_COLUMNS, OUTPUT_COLUMNS
+
+def disk_bytes_written() -> int | None:
+    try:
+        with open("/proc/self/io") as f:
+            for line in f:
+                if line.startswith("write_bytes:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+def file_bytes(path: str) -> int:
+    return sum(os.path.getsize(p) for p in (path, path + "-wal") if os.path.exists(p))
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the prediction store')
+    parser.add_argument('--rows', type=int, default=500000)
+    parser.add_argument('--batch', type=int, default=512, help='rows per append() call, like one ingest batch')
+    parser.add_argument('--flush-rows', type=int, default=2000)
+    parser.add_argument('--devices', type=int, default=1000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    raw = rng.normal([300, 310, 1500, 40, 100], [2, 1.5, 180, 10, 60], size=(args.batch, len(INPUT_COLUMNS)))
+    results = [
+        {"anomaly": bool(a), "failure_probability": float(p), "prediction": int(p > 0.5)}
+        for a, p in zip(rng.random(args.batch) < 0.05, rng.random(args.batch))
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "predictions.db")
+        store = PredictionStore(path, flush_rows=args.flush_rows, flush_interval=1.0, max_pending=10 ** 9)
+
+        written_before = disk_bytes_written()
+        start = time.perf_counter()
+        ts = 1.7e9
+        for offset in range(0, args.rows, args.batch):
+            n = min(args.batch, args.rows - offset)
+            udis = rng.integers(0, args.devices, n).tolist()
+            store.append(raw[:n], udis, results[:n], "v1", ts=ts)
+            ts += 1.0
+        append_seconds = time.perf_counter() - start
+        store.flush(timeout=600)
+        total_seconds = time.perf_counter() - start
+        store.close()
+
+        written_after = disk_bytes_written()
+        physical = (written_after - written_before) if written_before is not None else file_bytes(path)
+        logical = args.rows * 8 * (3 + len(INPUT_COLUMNS) + len(OUTPUT_COLUMNS))
+
+        query_ms = []
+        for udi in rng.integers(0, args.devices, 50):
+            q_start = time.perf_counter()
+            store.query(udi=int(udi), start=1.7e9 + 100, end=1.7e9 + 200, limit=100)
+            query_ms.append((time.perf_counter() - q_start) * 1000.0)
+        full_start = time.perf_counter()
+        store.query(limit=0)
+        full_ms = (time.perf_counter() - full_start) * 1000.0
+
+        print(f"rows                      {args.rows}")
+        print(f"append() throughput       {args.rows / append_seconds:,.0f} rows/s")
+        print(f"committed throughput      {args.rows / total_seconds:,.0f} rows/s")
+        print(f"database + WAL size       {file_bytes(path) / 1e6:.1f} MB")
+        print(f"write amplification       {physical / logical:.2f}x ({physical / 1e6:.1f} MB written for {logical / 1e6:.1f} MB logical)")
+        print(f"udi + time range query    p50 {np.percentile(query_ms, 50):.2f} ms, p99 {np.percentile(query_ms, 99):.2f} ms")
+        print(f"full-table aggregate      {full_ms:.1f} ms")
+
+if __name__ == "__main__":
+    main()
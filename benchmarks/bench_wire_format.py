@@ -0,0 +1,66 @@
+"""
+Benchmark: bytes on the wire and server-side parse cost for a batch of
+readings sent as BatchPredictionRequest JSON versus the binary
+application/x-telemetry-f32 format. Parse cost covers everything up to the
+(N, 5) input matrix the scoring path consumes.
+
+Run from the repo root:
+    python -m benchmarks.bench_wire_format --sizes 1 100 10000
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from backend.schemas import wire
+from backend.schemas.request import BatchPredictionRequest
+from backend.services.ml_service import readings_to_matrix
+
+def make_batch(n: int, rng) -> tuple:
+    raw = np.round(rng.normal([300, 310, 1500, 40, 100], [2, 1.5, 180, 10, 60], size=(n, 5)), 1)
+    udis = np.arange(n)
+    records = [
+        {
+            "UDI": int(u),
+            "Air temperature [K]": a, "Process temperature [K]": p,
+            "Rotational speed [rpm]": s, "Torque [Nm]": t, "Tool wear [min]": w
+        }
+        for u, (a, p, s, t, w) in zip(udis, raw.tolist())
+    ]
+    return json.dumps({"readings": records}).encode(), wire.encode(raw, udis)
+
+def parse_json(body: bytes) -> np.ndarray:
+    return readings_to_matrix(BatchPredictionRequest.model_validate_json(body).readings)
+
+def parse_binary(body: bytes) -> np.ndarray:
+    return wire.decode(body)[1]
+
+def time_parse(fn, body: bytes, min_seconds: float = 0.5) -> float:
+    """Median microseconds per parse over repeated runs."""
+    fn(body)
+    samples = []
+    deadline = time.perf_counter() + min_seconds
+    while time.perf_counter() < deadline or len(samples) < 5:
+        start = time.perf_counter_ns()
+        fn(body)
+        samples.append(time.perf_counter_ns() - start)
+    return float(np.median(samples)) / 1000.0
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare JSON and binary telemetry encodings')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 100, 10000])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'rows':>7}{'json bytes':>13}{'bin bytes':>12}{'ratio':>8}{'json parse (us)':>18}{'bin parse (us)':>17}{'speedup':>10}")
+    for n in args.sizes:
+        json_body, bin_body = make_batch(n, rng)
+        np.testing.assert_allclose(parse_json(json_body), parse_binary(bin_body), rtol=1e-6)
+        json_us = time_parse(parse_json, json_body)
+        bin_us = time_parse(parse_binary, bin_body)
+        print(f"{n:>7}{len(json_body):>13}{len(bin_body):>12}{len(json_body) / len(bin_body):>7.1f}x"
+              f"{json_us:>18.1f}{bin_us:>17.1f}{json_us / bin_us:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,406 @@
+"""
+Benchmark suite for the inference, drift, sequence and HTTP hot paths.
+
+Runs offline against the bundled ml/artifacts/v1 models and data/raw/*.csv:
+MLService.predict / predict_batch / predict_matrix, /predict/sequence at
+several window lengths (the route function, LSTM blend included), the
+drift window (add_data, add_batch, a forced detect_drift recompute),
+create_sequences over the vehicle telemetry, and the full ASGI app (auth,
+parsing, middleware) through an in-process TestClient.
+
+Each case is timed in rounds of calls calibrated to take at least
+--min-round-ms; the per-call median, p95, min, mean and items/second go to
+--output as JSON together with the interpreter, library versions and git
+commit. With --baseline, the median (or --metric min) of every case is
+compared with the baseline's and the run exits with status 1 if any case
+is slower than its threshold allows (--threshold for all cases,
+--case-threshold PATTERN=FRACTION for some). The stored
+benchmarks/baseline.json is from a single-core shared VM, where run-to-run
+noise alone reaches 30-40%; regenerate it on the machine that runs the
+comparison, and loosen the thresholds on hosts that are not quiet.
+
+App INFO logs are off while timing (their cost is what
+benchmarks.bench_logging measures); --app-logs keeps them. The asgi.* cases
+run the app's lifespan, which creates the auth database (users.db) in the
+working directory as the server does.
+
+Run from the repo root:
+    python -m benchmarks.suite --output results.json
+    python -m benchmarks.suite --baseline benchmarks/baseline.json --threshold 0.25 --case-threshold 'asgi.*=0.5'
+    python -m benchmarks.suite --filter 'predict.*' 'drift.*' --quick
+    python -m benchmarks.suite --output benchmarks/baseline.json   # refresh the baseline
+"""
+import os
+
+# Tokens for the in-process client are signed with this unless a real key is configured
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark-suite")
+# Whether a call hits the result cache would depend on how many calls a round makes, so the
+# cases time the models; set PREDICTION_CACHE_SIZE explicitly to time the cache instead
+os.environ.setdefault("PREDICTION_CACHE_SIZE", "0")
+
+import argparse
+import datetime
+import fnmatch
+import json
+import logging
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import warnings
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from backend.models.rnn_model import create_sequences
+from backend.schemas.request import MachineData, SequencePredictionRequest
+from backend.services.ml_service import ml_service
+from backend.services.sequence_sessions import SEQUENCE_FEATURES
+from ml.drift_detector import DriftDetector
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MACHINE_CSV = os.path.join(REPO_ROOT, "data", "raw", "ai4i2020.csv")
+VEHICLE_CSV = os.path.join(REPO_ROOT, "data", "raw", "vehicle_maintenance_telemetry.csv")
+REFERENCE_PATH = os.path.join(REPO_ROOT, "ml", "artifacts", "v1", "reference_data.joblib")
+# Settings recorded with the results, since they change what the cases measure
+CONFIG_PREFIXES = ("INFERENCE_", "PREDICT", "DRIFT_", "SEQUENCE_", "LOG_")
+SENSOR_ALIASES = ("Air temperature [K]", "Process temperature [K]", "Rotational speed [rpm]", "Torque [Nm]", "Tool wear [min]")
+SEQUENCE_WINDOWS = (10, 50, 200)
+
+# name -> setup(); setup loads what the case needs and returns (call, items per call)
+CASES: Dict[str, Callable[[], Tuple[Callable[[], object], int]]] = {}
+
+def case(name: str):
+    def register(setup):
+        CASES[name] = setup
+        return setup
+    return register
+
+def machine_readings() -> List[dict]:
+    frame = pd.read_csv(MACHINE_CSV, encoding="utf-8-sig")
+    return frame[["UDI", "Type", *SENSOR_ALIASES]].to_dict("records")
+
+def vehicle_rows() -> np.ndarray:
+    return pd.read_csv(VEHICLE_CSV)[list(SEQUENCE_FEATURES)].to_numpy(dtype=np.float64)
+
+def cycle(items: list) -> Callable[[], object]:
+    """Returns the next item on every call, wrapping around, so no case scores one row over and over."""
+    state = {"i": -1}
+
+    def next_item():
+        state["i"] = (state["i"] + 1) % len(items)
+        return items[state["i"]]
+    return next_item
+
+@case("predict.single")
+def predict_single():
+    ml_service.ensure_loaded()
+    next_reading = cycle([MachineData(**r) for r in machine_readings()[:1000]])
+    return (lambda: ml_service.predict(next_reading())), 1
+
+def predict_batch_case(size: int):
+    def setup():
+        ml_service.ensure_loaded()
+        readings = [MachineData(**r) for r in machine_readings()]
+        next_batch = cycle([readings[i:i + size] for i in range(0, len(readings) - size + 1, size)])
+        return (lambda: ml_service.predict_batch(next_batch())), size
+    return setup
+
+case("predict.batch_32")(predict_batch_case(32))
+case("predict.batch_256")(predict_batch_case(256))
+
+@case("predict.matrix_1024")
+def predict_matrix():
+    ml_service.ensure_loaded()
+    raw = pd.DataFrame(machine_readings())[list(SENSOR_ALIASES)].to_numpy(dtype=np.float64)
+    next_block = cycle([raw[i:i + 1024] for i in range(0, len(raw) - 1024 + 1, 1024)])
+    return (lambda: ml_service.predict_matrix(next_block())), 1024
+
+def sequence_case(window: int):
+    def setup():
+        from backend.api.routes import predict_sequence
+        from backend.services.sequence_models import sequence_models
+
+        sequence_models.load_all()
+        rows = vehicle_rows()
+        requests = [
+            SequencePredictionRequest(sequence=[dict(zip(SEQUENCE_FEATURES, row)) for row in rows[start:start + window]])
+            for start in range(0, len(rows) - window + 1, max(window, 50))
+        ]
+        next_request = cycle(requests)
+        return (lambda: predict_sequence(next_request())), 1
+    return setup
+
+for _window in SEQUENCE_WINDOWS:
+    case(f"sequence.window_{_window}")(sequence_case(_window))
+
+def drift_detector() -> Tuple[DriftDetector, np.ndarray]:
+    """A detector on the v1 reference and scaled feature rows, as _predict_raw feeds it."""
+    ml_service.ensure_loaded()
+    detector = DriftDetector(REFERENCE_PATH)
+    raw = pd.DataFrame(machine_readings())[list(SENSOR_ALIASES)].to_numpy(dtype=np.float64)
+    rows = ml_service.registry.get().scale_features(raw)
+    detector.add_batch(rows[:detector.window_size])  # start from a full window, as in steady state
+    return detector, rows
+
+@case("drift.add_data")
+def drift_add_data():
+    detector, rows = drift_detector()
+    next_row = cycle(list(rows))
+    return (lambda: detector.add_data(next_row())), 1
+
+@case("drift.add_batch_256")
+def drift_add_batch():
+    detector, rows = drift_detector()
+    next_block = cycle([rows[i:i + 256] for i in range(0, len(rows) - 256 + 1, 256)])
+    return (lambda: detector.add_batch(next_block())), 256
+
+@case("drift.detect_drift")
+def drift_detect():
+    detector, _ = drift_detector()
+    # refresh() is what detect_drift runs once new rows have arrived; the cached path is a dict lookup
+    return detector.refresh, 1
+
+def create_sequences_case(seq_length: int):
+    def setup():
+        rows = vehicle_rows()
+        # Materialized, as training does; the view alone costs nothing
+        return (lambda: np.ascontiguousarray(create_sequences(rows, seq_length))), len(rows) - seq_length + 1
+    return setup
+
+case("sequences.create_10")(create_sequences_case(10))
+case("sequences.create_50")(create_sequences_case(50))
+
+class AsgiApp:
+    """The full app behind one in-process TestClient, started on first use (lifespan included)."""
+    _client = None
+
+    @classmethod
+    def client(cls):
+        if cls._client is None:
+            from fastapi.testclient import TestClient
+            from backend.auth.utils import create_access_token
+            from backend.main import app
+
+            cls._client = TestClient(app)
+            cls._client.__enter__()
+            token = create_access_token({"sub": "benchmark", "role": "user"})
+            cls._client.headers["Authorization"] = f"Bearer {token}"
+            ml_service.ensure_loaded()
+        return cls._client
+
+    @classmethod
+    def close(cls):
+        if cls._client is not None:
+            cls._client.__exit__(None, None, None)
+            cls._client = None
+
+def checked(response):
+    if response.status_code != 200:
+        raise RuntimeError(f"{response.request.url.path} returned {response.status_code}: {response.text[:200]}")
+    return response
+
+@case("asgi.predict")
+def asgi_predict():
+    client = AsgiApp.client()
+    next_body = cycle([json.dumps(r) for r in machine_readings()[:1000]])
+    headers = {"Content-Type": "application/json"}
+    return (lambda: checked(client.post("/api/predict", content=next_body(), headers=headers))), 1
+
+@case("asgi.predict_batch_256")
+def asgi_predict_batch():
+    client = AsgiApp.client()
+    readings = machine_readings()
+    next_body = cycle([
+        json.dumps({"readings": readings[i:i + 256]}) for i in range(0, len(readings) - 256 + 1, 256)
+    ])
+    headers = {"Content-Type": "application/json"}
+    return (lambda: checked(client.post("/api/predict/batch", content=next_body(), headers=headers))), 256
+
+@case("asgi.predict_sequence_50")
+def asgi_predict_sequence():
+    client = AsgiApp.client()
+    rows = vehicle_rows()
+    next_body = cycle([
+        json.dumps({"sequence": [dict(zip(SEQUENCE_FEATURES, row)) for row in rows[start:start + 50].tolist()]})
+        for start in range(0, len(rows) - 50 + 1, 50)
+    ])
+    headers = {"Content-Type": "application/json"}
+    return (lambda: checked(client.post("/api/predict/sequence", content=next_body(), headers=headers))), 1
+
+def measure(call: Callable[[], object], rounds: int, min_round_seconds: float, warmup: int) -> dict:
+    """Times `rounds` rounds of `number` calls each; statistics are seconds per call across rounds."""
+    for _ in range(warmup):
+        call()
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            call()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_round_seconds:
+            break
+        number *= 2 if elapsed <= 0 else max(2, min(10, int(min_round_seconds / elapsed) + 1))
+    per_call = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(number):
+            call()
+        per_call.append((time.perf_counter() - start) / number)
+    per_call.sort()
+    return {
+        "median_s": statistics.median(per_call),
+        "p95_s": per_call[min(len(per_call) - 1, int(round(0.95 * (len(per_call) - 1))))],
+        "min_s": per_call[0],
+        "mean_s": statistics.fmean(per_call),
+        "stdev_s": statistics.stdev(per_call) if len(per_call) > 1 else 0.0,
+        "rounds": rounds,
+        "calls_per_round": number
+    }
+
+def environment() -> dict:
+    versions = {"python": platform.python_version(), "numpy": np.__version__, "pandas": pd.__version__}
+    for module in ("sklearn", "torch", "fastapi"):
+        try:
+            versions[module] = __import__(module).__version__
+        except ImportError:
+            pass
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, timeout=10
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "versions": versions,
+        "config": {key: value for key, value in sorted(os.environ.items()) if key.startswith(CONFIG_PREFIXES)}
+    }
+
+def selected(patterns: Optional[List[str]]) -> List[str]:
+    if not patterns:
+        return list(CASES)
+    return [name for name in CASES if any(fnmatch.fnmatchcase(name, p) for p in patterns)]
+
+def run(names: List[str], rounds: int, min_round_seconds: float, warmup: int) -> dict:
+    results = {}
+    try:
+        for name in names:
+            call, items = CASES[name]()
+            stats = measure(call, rounds, min_round_seconds, warmup)
+            stats["items_per_call"] = items
+            stats["items_per_s"] = items / stats["median_s"] if stats["median_s"] else None
+            results[name] = stats
+            print(f"{name:<28}{stats['median_s'] * 1e6:>14.1f}{stats['p95_s'] * 1e6:>14.1f}"
+                  f"{stats['items_per_s'] or 0:>16.0f}", file=sys.stderr)
+    finally:
+        AsgiApp.close()
+    return {"schema": 1, "environment": environment(), "results": results}
+
+def parse_case_thresholds(specs: List[str]) -> List[Tuple[str, float]]:
+    """["asgi.*=0.5"] -> [("asgi.*", 0.5)]; later entries win when several patterns match."""
+    thresholds = []
+    for spec in specs:
+        pattern, sep, value = spec.rpartition("=")
+        if not sep or not pattern:
+            raise ValueError(f"--case-threshold takes PATTERN=FRACTION, got {spec!r}")
+        thresholds.append((pattern, float(value)))
+    return thresholds
+
+def compare(current: dict, baseline: dict, threshold: float,
+            case_thresholds: Optional[List[Tuple[str, float]]] = None, metric: str = "median") -> List[dict]:
+    """
+    One row per case in `current`: the ratio of its `metric` ("median" or
+    "min" seconds per call) to the baseline's and whether that exceeds 1 +
+    the case's threshold. Cases missing from the baseline have status "new"
+    and never fail.
+    """
+    field = f"{metric}_s"
+    rows = []
+    for name, stats in current["results"].items():
+        allowed = threshold
+        for pattern, value in case_thresholds or ():
+            if fnmatch.fnmatchcase(name, pattern):
+                allowed = value
+        reference = baseline.get("results", {}).get(name)
+        if reference is None or not reference.get(field):
+            rows.append({"case": name, "status": "new", "threshold": allowed})
+            continue
+        ratio = stats[field] / reference[field]
+        if ratio > 1.0 + allowed:
+            status = "regression"
+        elif ratio < 1.0 / (1.0 + allowed):
+            status = "improvement"
+        else:
+            status = "ok"
+        rows.append({
+            "case": name, "status": status, "ratio": ratio, "threshold": allowed,
+            "baseline_s": reference[field], "current_s": stats[field]
+        })
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline benchmark suite with baseline regression checks')
+    parser.add_argument('--filter', nargs='+', metavar='PATTERN', help='Glob patterns of cases to run (default all)')
+    parser.add_argument('--list', action='store_true', help='List case names and exit')
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--min-round-ms', type=float, default=20.0, help='Calls per round grow until a round takes this long')
+    parser.add_argument('--warmup', type=int, default=3, help='Untimed calls before calibration')
+    parser.add_argument('--quick', action='store_true', help='5 rounds of at least 5 ms, for a smoke run')
+    parser.add_argument('--output', help='Write results as JSON to this path ("-" for stdout)')
+    parser.add_argument('--baseline', help='Results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='Allowed slowdown of the median as a fraction (0.25 = 25%% slower)')
+    parser.add_argument('--case-threshold', nargs='+', default=[], metavar='PATTERN=FRACTION',
+                        help='Per-case thresholds, e.g. "asgi.*=0.5"')
+    parser.add_argument('--metric', choices=('median', 'min'), default='median', help='Statistic compared to the baseline')
+    parser.add_argument('--app-logs', action='store_true', help='Keep the app INFO logs while timing')
+    args = parser.parse_args()
+
+    if args.list:
+        print("\n".join(CASES))
+        return
+    names = selected(args.filter)
+    if not names:
+        parser.error(f"no case matches {args.filter}")
+    case_thresholds = parse_case_thresholds(args.case_threshold)
+    if args.quick:
+        args.rounds, args.min_round_ms = 5, 5.0
+    if not args.app_logs:
+        logging.disable(logging.INFO)
+    # sklearn's feature-name and pickle-version warnings would repeat on every round
+    warnings.simplefilter("ignore")
+
+    print(f"{'case':<28}{'median us':>14}{'p95 us':>14}{'items/s':>16}", file=sys.stderr)
+    current = run(names, args.rounds, args.min_round_ms / 1000.0, args.warmup)
+
+    if args.output == "-":
+        json.dump(current, sys.stdout, indent=2)
+        print()
+    elif args.output:
+        with open(args.output, "w") as f:
+            json.dump(current, f, indent=2)
+            f.write("\n")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        rows = compare(current, baseline, args.threshold, case_thresholds, args.metric)
+        print(f"\n{'case (' + args.metric + ')':<28}{'baseline us':>14}{'now us':>14}{'ratio':>8}  status", file=sys.stderr)
+        for row in rows:
+            if row["status"] == "new":
+                print(f"{row['case']:<28}{'-':>14}{'-':>14}{'-':>8}  new", file=sys.stderr)
+            else:
+                print(f"{row['case']:<28}{row['baseline_s'] * 1e6:>14.1f}{row['current_s'] * 1e6:>14.1f}"
+                      f"{row['ratio']:>8.2f}  {row['status']} (threshold +{row['threshold']:.0%})", file=sys.stderr)
+        if any(row["status"] == "regression" for row in rows):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
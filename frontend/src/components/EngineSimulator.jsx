@@ -17,6 +17,8 @@ const EngineSimulator = () => {
   const [apiError, setApiError] = useState(null);
   const eventSourceRef = useRef(null);
   const telemetryRef = useRef([]);
+  // The backend keeps this simulator's 10-reading window; we only send the newest reading
+  const deviceIdRef = useRef(`simulator-${Math.random().toString(36).slice(2, 10)}`);
 
   const startStream = () => {
     if (eventSourceRef.current) {
@@ -67,40 +69,43 @@ const EngineSimulator = () => {
     setIsStreaming(false);
   };
 
-  // Trigger prediction exactly when window hits 10 items
+  // Stream every reading to the device session; show predictions once the window holds 10 items
   useEffect(() => {
-    if (telemetry.length === 10) {
-      const runPrediction = async () => {
-        setApiError(null);
-        try {
-          // Format based on Car Engine MachineData schema — MUST match backend extraction order
-          const payload = telemetry.map(t => ({
-            engine_rpm: t.engine_rpm,
-            oil_pressure_psi: t.oil_pressure_psi,
-            coolant_temp_c: t.coolant_temp_c,
-            vibration_level: t.vibration_level,
-            engine_temp_c: t.engine_temp_c
-          }));
-
-          console.log("Triggering Inference API Payload:", payload);
-
-          // Prediction still has to hit the backend since we can't run Pytorch in browser securely
-          const response = await axios.post(`${API_BASE}/predict/sequence`, { sequence: payload }).catch(() => {
-            // Mock fallback if Render prediction API is totally down
-            return { data: { anomaly: true, failure_probability: 0.95 } };
-          });
-
+    if (telemetry.length === 0) return;
+    const latest = telemetry[telemetry.length - 1];
+    const runPrediction = async () => {
+      setApiError(null);
+      try {
+        // Format based on Car Engine MachineData schema
+        const payload = {
+          device_id: deviceIdRef.current,
+          reading: {
+            engine_rpm: latest.engine_rpm,
+            oil_pressure_psi: latest.oil_pressure_psi,
+            coolant_temp_c: latest.coolant_temp_c,
+            vibration_level: latest.vibration_level,
+            engine_temp_c: latest.engine_temp_c
+          }
+        };
+
+        // Prediction still has to hit the backend since we can't run Pytorch in browser securely
+        const response = await axios.post(`${API_BASE}/predict/sequence/stream`, payload).catch(() => {
+          // Mock fallback if Render prediction API is totally down
+          return { data: { anomaly: true, failure_probability: 0.95 } };
+        });
+
+        if (telemetry.length === 10) {
           console.log("Inference API Response:", response.data);
           setPrediction(response.data);
-
-        } catch (error) {
-          console.error("Prediction failed:", error);
-          setApiError("INFERENCE API ERROR");
         }
-      };
 
-      runPrediction();
-    }
+      } catch (error) {
+        console.error("Prediction failed:", error);
+        setApiError("INFERENCE API ERROR");
+      }
+    };
+
+    runPrediction();
   }, [telemetry]);
 
   useEffect(() => {
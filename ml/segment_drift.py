@@ -0,0 +1,241 @@
+import numpy as np
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, List, Optional, Sequence
+
+from ml.drift_detector import (
+    FEATURE_NAMES, MIN_SAMPLES, ReferenceSketch, bin_index, build_sketch, drift_report, ks_pvalues, ks_statistics
+)
+
+class SegmentDriftTracker:
+    """
+    Drift per device group and per machine Type, for thousands of keys.
+
+    Each reading counts towards two keys: "device:<UDI // udi_group_size>"
+    (or "device:unknown") and, when the reading carries one, "type:<L|M|H>".
+    A key owns a slot in one preallocated (max_keys, 2, sketch size) uint32
+    array: two tumbling buckets of at most `window_size` readings that swap
+    when the current one would overflow, so a key's report covers between
+    its last window_size and 2 * window_size readings and no raw values are
+    kept. Every key counts against the same coarse sketch of the reference,
+    so keys merge by adding counts and the top-k view scores all keys in one
+    vectorized pass. The least recently updated key is dropped once
+    `max_keys` are tracked.
+
+    add() only queues a copy of the rows. The queue is binned and counted in
+    one pass when a report is read or once `drain_rows` rows are waiting, so
+    a single-row request pays for a copy and a list append.
+
+    With quantile edges the KS statistic can read low by up to one bin's
+    mass (about 1 / bins): see DriftDetector.
+    """
+    def __init__(self, reference: np.ndarray, bins: int = 32, window_size: int = 256, max_keys: int = 10000,
+                 threshold: float = 0.05, udi_group_size: int = 1, feature_names: List[str] = FEATURE_NAMES,
+                 drain_rows: int = 4096):
+        if window_size < 1 or max_keys < 1 or udi_group_size < 1:
+            raise ValueError("window_size, max_keys and udi_group_size must be >= 1")
+        self.bins = bins
+        self.window_size = window_size
+        self.max_keys = max_keys
+        self.threshold = threshold
+        self.udi_group_size = udi_group_size
+        self.feature_names = feature_names
+        self.drain_rows = drain_rows
+        self._queued: List[tuple] = []  # (rows, udis, machine_types) added since the last drain
+        self._queued_rows = 0
+        self._slots: "OrderedDict[str, int]" = OrderedDict()
+        self._free: List[int] = list(range(max_keys - 1, -1, -1))
+        self._counts = None  # (max_keys, 2, sketch.size), allocated on the first add
+        self._bucket_samples = np.zeros((max_keys, 2), dtype=np.int64)
+        self._current = np.zeros(max_keys, dtype=np.int64)  # bucket each slot is filling
+        self._lock = Lock()
+        self._sketch: Optional[ReferenceSketch] = None
+        self.load_reference(reference)
+
+    def load_reference(self, reference: np.ndarray):
+        """Re-bins against a new reference; existing counts no longer apply and are dropped."""
+        sketch = build_sketch(np.asarray(reference, dtype=np.float64)[:, :len(self.feature_names)], self.bins)
+        with self._lock:
+            self._sketch = sketch
+            self._counts = None
+            self._queued, self._queued_rows = [], 0
+            self._slots.clear()
+            self._free = list(range(self.max_keys - 1, -1, -1))
+            self._bucket_samples[:] = 0
+            self._current[:] = 0
+
+    def device_key(self, udi: Optional[int]) -> str:
+        return f"device:{udi // self.udi_group_size}" if udi is not None else "device:unknown"
+
+    def add(self, rows: np.ndarray, udis: Optional[Sequence[Optional[int]]] = None,
+            machine_types: Optional[Sequence[Optional[str]]] = None):
+        """Queues (n, n_features) scaled rows (extra columns ignored) to count towards each row's keys."""
+        n = len(rows)
+        if n == 0 or self._sketch is None:
+            return
+        # Copies: the caller may reuse its buffers before the queue is drained
+        rows = np.array(np.asarray(rows)[:, :len(self.feature_names)], dtype=np.float64)
+        udis = list(udis) if udis is not None else None
+        machine_types = list(machine_types) if machine_types is not None else None
+        with self._lock:
+            self._queued.append((rows, udis, machine_types))
+            self._queued_rows += n
+            full = self._queued_rows >= self.drain_rows
+        if full:
+            self.drain()
+
+    def drain(self):
+        """Bins and counts every queued row in one pass. Readers call it first, so reports are current."""
+        with self._lock:
+            if not self._queued:
+                return
+            queued, self._queued, self._queued_rows = self._queued, [], 0
+            sketch = self._sketch
+        index = bin_index(np.concatenate([rows for rows, _, _ in queued]), sketch)
+
+        groups: Dict[str, List[int]] = {}
+        i = 0
+        for rows, udis, machine_types in queued:
+            for j in range(len(rows)):
+                groups.setdefault(self.device_key(udis[j] if udis is not None else None), []).append(i)
+                machine_type = machine_types[j] if machine_types is not None else None
+                if machine_type:
+                    groups.setdefault(f"type:{machine_type}", []).append(i)
+                i += 1
+        if len(groups) > self.max_keys:
+            # Every slot would be recycled within this one batch; keep the last max_keys keys
+            groups = dict(list(groups.items())[-self.max_keys:])
+        # Older rows of a key would be rotated out by its newer ones anyway
+        groups = {key: g[-self.window_size:] for key, g in groups.items()}
+
+        with self._lock:
+            if self._sketch is not sketch:
+                return  # The reference changed while binning; these counts would not apply
+            if self._counts is None:
+                self._counts = np.zeros((self.max_keys, 2, sketch.size), dtype=np.uint32)
+            slots = np.fromiter((self._slot(key) for key in groups), dtype=np.int64, count=len(groups))
+            sizes = np.fromiter((len(g) for g in groups.values()), dtype=np.int64, count=len(groups))
+
+            # Swap buckets for keys whose current bucket would overflow: the older one is cleared and refilled
+            filled = self._bucket_samples[slots, self._current[slots]]
+            full = slots[(filled > 0) & (filled + sizes > self.window_size)]
+            if len(full):
+                self._current[full] = 1 - self._current[full]
+                self._counts[full, self._current[full]] = 0
+                self._bucket_samples[full, self._current[full]] = 0
+
+            row_slots = np.repeat(slots, sizes)
+            row_ids = np.concatenate([np.asarray(g, dtype=np.int64) for g in groups.values()])
+            base = (row_slots * 2 + self._current[row_slots]) * sketch.size
+            np.add.at(self._counts.reshape(-1), (base[:, None] + index[row_ids]).ravel(), 1)
+            self._bucket_samples[slots, self._current[slots]] += sizes
+
+    def _slot(self, key: str) -> int:
+        # Called with the lock held
+        slot = self._slots.get(key)
+        if slot is not None:
+            self._slots.move_to_end(key)
+            return slot
+        if not self._free:
+            _, evicted = self._slots.popitem(last=False)
+            self._counts[evicted] = 0
+            self._bucket_samples[evicted] = 0
+            self._current[evicted] = 0
+            self._free.append(evicted)
+        slot = self._free.pop()
+        self._slots[key] = slot
+        return slot
+
+    def _gather(self, keys: List[str]):
+        # Called with the lock held: summed bucket counts and samples per key
+        slots = np.fromiter((self._slots[k] for k in keys), dtype=np.int64, count=len(keys))
+        return self._counts[slots].sum(axis=1), self._bucket_samples[slots].sum(axis=1)
+
+    def keys(self, dimension: Optional[str] = None) -> List[str]:
+        self.drain()
+        with self._lock:
+            return self._keys(dimension)
+
+    def _keys(self, dimension: Optional[str]) -> List[str]:
+        # Called with the lock held
+        return [k for k in self._slots if dimension is None or k.startswith(dimension + ":")]
+
+    def report(self, key: str) -> Optional[dict]:
+        """Per-feature drift report for one key, or None if it is not tracked."""
+        self.drain()
+        with self._lock:
+            if key not in self._slots:
+                return None
+            counts, samples = self._gather([key])
+            sketch = self._sketch
+        return {"key": key, **self._report(counts[0], int(samples[0]), sketch)}
+
+    def merged(self, dimension: str = "device") -> dict:
+        """
+        One report over every key of a dimension. "device" covers every
+        reading; "type" only those sent with a Type.
+        """
+        self.drain()
+        with self._lock:
+            keys = self._keys(dimension)
+            if not keys or self._counts is None:
+                return {"status": "insufficient_data", "current_samples": 0, "keys": 0}
+            counts, samples = self._gather(keys)
+            sketch = self._sketch
+        return {"keys": len(keys), **self._report(counts.sum(axis=0), int(samples.sum()), sketch)}
+
+    def top(self, k: int = 10, dimension: Optional[str] = None) -> List[dict]:
+        """
+        The `k` keys with the strongest drift evidence (smallest p-value over
+        their features), among keys with at least MIN_SAMPLES readings.
+        """
+        self.drain()
+        with self._lock:
+            keys = self._keys(dimension)
+            if not keys or self._counts is None:
+                return []
+            counts, samples = self._gather(keys)
+            sketch = self._sketch
+        eligible = samples >= MIN_SAMPLES
+        if not eligible.any():
+            return []
+        keys = [key for key, ok in zip(keys, eligible) if ok]
+        counts, samples = counts[eligible], samples[eligible]
+
+        statistics = ks_statistics(counts, samples, sketch)
+        # Within a key every feature shares the sample sizes, so its smallest p-value is the
+        # one of its largest statistic; rank on the scaled statistic and only evaluate the top k
+        worst = statistics.argmax(axis=1)
+        max_statistic = statistics[np.arange(len(keys)), worst]
+        scaled = np.sqrt(sketch.n_reference * samples / (sketch.n_reference + samples)) * max_statistic
+        order = np.argsort(-scaled, kind="stable")[:k]
+        min_p = ks_pvalues(max_statistic[order], sketch.n_reference, samples[order])
+        return [
+            {
+                "key": keys[i],
+                "samples": int(samples[i]),
+                "min_p_value": float(p),
+                "max_statistic": float(max_statistic[i]),
+                "most_drifted_feature": self._feature_name(int(worst[i])),
+                "drift_detected": bool(p < self.threshold)
+            }
+            for i, p in zip(order, min_p)
+        ]
+
+    def _report(self, counts: np.ndarray, samples: int, sketch: ReferenceSketch) -> dict:
+        if samples < MIN_SAMPLES:
+            return {"status": "insufficient_data", "current_samples": samples}
+        statistics = ks_statistics(counts, samples, sketch)
+        return drift_report(statistics, ks_pvalues(statistics, sketch.n_reference, samples), samples,
+                            self.threshold, self.feature_names)
+
+    def _feature_name(self, i: int) -> str:
+        return self.feature_names[i] if i < len(self.feature_names) else f"Feature {i}"
+
+    @property
+    def nbytes(self) -> int:
+        return (self._counts.nbytes if self._counts is not None else 0) + self._bucket_samples.nbytes + self._current.nbytes
+
+    def __len__(self):
+        self.drain()
+        return len(self._slots)
@@ -0,0 +1,29 @@
+import pytest
+
+from backend.schemas.request import MachineData
+from backend.services.ml_service import ml_service
+
+@pytest.fixture(scope="session")
+def loaded_service():
+    """Loads the default model version once for the whole session, on first use."""
+    ml_service.ensure_loaded()
+    return ml_service
+
+@pytest.fixture
+def service(loaded_service):
+    """The loaded MLService with an empty result cache, so no test reads back another's cached scores."""
+    loaded_service.prediction_cache.clear()
+    return loaded_service
+
+@pytest.fixture
+def no_prediction_cache(service, monkeypatch):
+    """Scores every call with the models, so comparisons don't read back the first call's cached results."""
+    monkeypatch.setattr(service.prediction_cache, "max_entries", 0)
+
+@pytest.fixture
+def readings():
+    return [
+        MachineData(**{"Air temperature [K]": 298.1, "Process temperature [K]": 308.6, "Rotational speed [rpm]": 1551, "Torque [Nm]": 42.8, "Tool wear [min]": 0}),
+        MachineData(**{"Air temperature [K]": 302.5, "Process temperature [K]": 311.2, "Rotational speed [rpm]": 1282, "Torque [Nm]": 68.1, "Tool wear [min]": 215}),
+        MachineData(**{"Air temperature [K]": 296.9, "Process temperature [K]": 307.4, "Rotational speed [rpm]": 2860, "Torque [Nm]": 4.6, "Tool wear [min]": 140}),
+    ]
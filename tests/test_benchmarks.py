@@ -0,0 +1,21 @@
+import pytest
+
+def test_benchmark_suite_flags_regressions_against_baseline():
+    from benchmarks.suite import CASES, compare, measure, parse_case_thresholds
+
+    assert {"predict.single", "drift.detect_drift", "sequences.create_10", "asgi.predict"} <= set(CASES)
+    stats = measure(lambda: sum(range(100)), rounds=3, min_round_seconds=0.001, warmup=1)
+    assert stats["rounds"] == 3 and stats["calls_per_round"] >= 1 and 0 < stats["min_s"] <= stats["median_s"]
+
+    def results(**medians):
+        return {"results": {name.replace("_", "."): {"median_s": s, "min_s": s} for name, s in medians.items()}}
+
+    baseline = results(predict_single=1.0, asgi_predict=1.0, drift_add=1.0)
+    current = results(predict_single=1.3, asgi_predict=1.3, drift_add=0.5, sequences_new=1.0)
+    rows = {row["case"]: row for row in compare(current, baseline, 0.25, parse_case_thresholds(["asgi.*=0.5"]))}
+    assert rows["predict.single"]["status"] == "regression"
+    assert rows["asgi.predict"]["status"] == "ok" and rows["asgi.predict"]["threshold"] == 0.5
+    assert rows["drift.add"]["status"] == "improvement"
+    assert rows["sequences.new"]["status"] == "new"
+    with pytest.raises(ValueError):
+        parse_case_thresholds(["0.5"])
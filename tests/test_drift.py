@@ -0,0 +1,122 @@
+import pytest
+import numpy as np
+
+def test_drift_window_ring_buffer_keeps_last_rows_in_order(tmp_path):
+    from ml.drift_detector import DriftDetector
+
+    detector = DriftDetector(str(tmp_path / "missing.joblib"), window_size=7)
+    rows = np.arange(60, dtype=np.float64).reshape(30, 2)
+    assert detector.snapshot().shape[0] == 0
+    seen = 0
+    for n in (1, 3, 5, 0, 2, 9, 10):  # wraps around, and one batch exceeds the window
+        detector.add_batch(rows[seen:seen + n])
+        seen += n
+        np.testing.assert_array_equal(detector.snapshot(), rows[max(0, seen - 7):seen])
+    detector.add_data(np.array([-1.0, -2.0]))
+    assert detector.samples == 7 and detector.snapshot()[-1].tolist() == [-1.0, -2.0]
+
+def test_binned_drift_matches_ks_2samp_within_tolerance(tmp_path):
+    import joblib
+    from scipy.stats import ks_2samp
+    from ml.drift_detector import DriftDetector
+
+    rng = np.random.default_rng(5)
+    reference = rng.normal(size=(1000, 3))
+    joblib.dump(reference, tmp_path / "reference.joblib")
+    exact_bins = DriftDetector(str(tmp_path / "reference.joblib"), window_size=400)  # every reference value is an edge
+    quantile_bins = DriftDetector(str(tmp_path / "reference.joblib"), window_size=400, bins=64)
+
+    # Stream more than a window so evicted rows have to leave the bin counts
+    live = rng.normal(loc=[0.0, 0.15, 0.6], size=(1000, 3))
+    for start in range(0, len(live), 64):
+        exact_bins.add_batch(live[start:start + 64])
+        quantile_bins.add_batch(live[start:start + 64])
+    exact_report, quantile_report = exact_bins.detect_drift(), quantile_bins.detect_drift()
+
+    window = live[-400:]
+    assert exact_report["samples"] == 400
+    for i, name in enumerate(["Air temperature [K]", "Process temperature [K]", "Rotational speed [rpm]"]):
+        expected = ks_2samp(reference[:, i], window[:, i])
+        assert exact_report["report"][name]["statistic"] == pytest.approx(expected.statistic, abs=1e-12)
+        assert exact_report["report"][name]["p_value"] == pytest.approx(expected.pvalue, abs=0.015)
+        assert 0.0 <= expected.statistic - quantile_report["report"][name]["statistic"] <= 0.03
+    assert not exact_report["report"]["Air temperature [K]"]["drift_detected"]
+    assert exact_report["report"]["Rotational speed [rpm]"]["drift_detected"]
+
+def test_segment_drift_isolates_keys_and_merges_by_addition():
+    from ml.segment_drift import SegmentDriftTracker
+
+    rng = np.random.default_rng(9)
+    reference = rng.normal(size=(1000, 5))
+    tracker = SegmentDriftTracker(reference, bins=32, window_size=300, max_keys=6, udi_group_size=10)
+
+    # UDIs 0..29 fall into device groups 0, 1 and 2; only group 1 drifts
+    udis = np.repeat(np.arange(30), 10)
+    rows = rng.normal(size=(300, 5))
+    rows[(udis // 10) == 1, 3] += 1.5
+    tracker.add(rows, udis.tolist(), ["L", "M", "H"] * 100)
+
+    top = tracker.top(3, dimension="device")
+    assert [t["key"] for t in top][0] == "device:1"
+    assert top[0]["drift_detected"] and top[0]["most_drifted_feature"] == "Torque [Nm]"
+    assert not tracker.report("device:0")["overall_drift"]
+    assert tracker.report("type:M")["samples"] == 100
+    assert tracker.report("device:7") is None
+
+    # Keys share one sketch, so both dimensions merge to the counts of all 300 rows
+    merged = tracker.merged("device")
+    assert merged["keys"] == 3 and merged["samples"] == 300
+    assert merged["report"] == tracker.merged("type")["report"]
+
+    # Two tumbling buckets bound each key to at most 2 * window_size readings
+    tracker.add(rng.normal(size=(700, 5)), [0] * 700)
+    assert 300 <= tracker.report("device:0")["samples"] <= 600
+
+    # At max_keys the least recently updated key is evicted
+    tracker.add(rng.normal(size=(60, 5)), [990] * 60)
+    assert len(tracker) == 6 and tracker.report("type:L") is None
+
+def test_segment_drift_queues_rows_until_read_or_full():
+    from ml.segment_drift import SegmentDriftTracker
+
+    rng = np.random.default_rng(10)
+    tracker = SegmentDriftTracker(rng.normal(size=(500, 5)), bins=16, window_size=100, drain_rows=50)
+    rows = rng.normal(size=(30, 5))
+    tracker.add(rows, [1] * 30, ["L"] * 30)
+    rows[:] = 0.0  # the tracker kept its own copy
+    assert tracker._counts is None  # nothing binned on the request path yet
+    tracker.add(rng.normal(size=(30, 5)), [2] * 30)  # reaches drain_rows
+    assert tracker._counts is not None and tracker._queued_rows == 0
+
+    tracker.add(rng.normal(size=(5, 5)), [1] * 5)
+    report = tracker.report("device:1")  # reads drain what is queued first
+    assert report["current_samples"] == 35 and tracker.report("type:L")["current_samples"] == 30
+
+def test_drift_monitor_skips_unchanged_window_and_exports_gauges(tmp_path):
+    import joblib
+    from types import SimpleNamespace
+    from ml.drift_detector import DriftDetector
+    from backend.services.drift_monitor import DriftMonitor
+
+    rng = np.random.default_rng(11)
+    joblib.dump(rng.normal(size=(500, 5)), tmp_path / "reference.joblib")
+    detector = DriftDetector(str(tmp_path / "reference.joblib"), window_size=200)
+    monitor = DriftMonitor(SimpleNamespace(drift_detector=detector), interval_seconds=30)
+
+    detector.add_batch(rng.normal(loc=[0, 0, 0, 2.0, 0], size=(200, 5)))
+    report = monitor.evaluate()
+    assert report["overall_drift"] and report["report"]["Torque [Nm]"]["drift_detected"]
+    evaluations = monitor._evaluations.value
+
+    # No new rows: the report object is reused and nothing is recomputed
+    assert monitor.evaluate() is report
+    assert monitor._evaluations.value == evaluations and monitor._skipped.value >= 1
+    assert detector.detect_drift() is report
+
+    lines = monitor.gauges.render()
+    assert "drift_overall 1" in lines
+    assert 'drift_detected{feature="Torque [Nm]"} 1' in lines
+    assert any(line.startswith('drift_p_value{feature="Air temperature [K]"}') for line in lines)
+
+    detector.add_data(np.zeros(5))
+    assert monitor.evaluate() is not report
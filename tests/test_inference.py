@@ -0,0 +1,119 @@
+import os
+
+import pytest
+import numpy as np
+from backend.utils.metrics import metrics_collector
+
+def test_predict_batch_matches_single_predictions(service, readings, no_prediction_cache):
+    """Batch scoring must give the same answer as scoring each row on its own."""
+    batch = service.predict_batch(readings)
+    assert batch["batch_size"] == len(readings)
+    assert batch["inference_time_ms"] >= 0
+
+    for reading, result in zip(readings, batch["results"]):
+        single = service.predict(reading)
+        assert result["anomaly"] == single["anomaly"]
+        assert result["prediction"] == single["prediction"]
+        assert result["failure_probability"] == pytest.approx(single["failure_probability"])
+
+def predictions_served() -> int:
+    return sum(counter.value for counter in metrics_collector.predictions.children().values())
+
+def test_predict_batch_counts_every_row(service, readings):
+    before = predictions_served()
+    service.predict_batch(readings)
+    assert predictions_served() == before + len(readings)
+
+def test_scale_features_matches_scaler_transform(service, readings):
+    """The pandas-free layout must reproduce scaler.transform on the engineered DataFrame exactly."""
+    pd = pytest.importorskip("pandas")
+    from backend.services.ml_service import BASE_FEATURES, SENSOR_COLUMNS
+
+    for reading in readings:
+        raw = [reading.air_temperature, reading.process_temperature, reading.rotational_speed, reading.torque, reading.tool_wear]
+        df = pd.DataFrame({name: [value] for name, value in zip(BASE_FEATURES, raw)})
+        for col in SENSOR_COLUMNS:
+            df[f'{col}_rolling_mean'] = df[col]
+            df[f'{col}_rolling_std'] = 0.0
+            df[f'{col}_delta'] = 0.0
+        expected = service.scaler.transform(df[service.scaler.feature_names_in_])
+
+        actual = service.registry.active.scale_features(np.array([raw], dtype=np.float64))
+        assert np.array_equal(actual, expected)
+
+def test_compiled_engine_matches_sklearn(service):
+    from backend.services.compiled_forest import CompiledForestEngine
+
+    engine = CompiledForestEngine(service.failure_model, service.anomaly_model)
+    rng = np.random.default_rng(0)
+    X = np.vstack([service.drift_detector.reference_data[:200], rng.normal(scale=3.0, size=(200, engine.n_features))])
+    X[::11, 2] = np.nan
+
+    scores = engine.score(X)
+    np.testing.assert_allclose(scores.failure_proba, service.failure_model.predict_proba(X), atol=1e-9)
+    np.testing.assert_array_equal(scores.prediction, service.failure_model.predict(X))
+    np.testing.assert_allclose(scores.anomaly_score, service.anomaly_model.score_samples(X), atol=1e-9)
+    np.testing.assert_array_equal(scores.is_anomaly, service.anomaly_model.predict(X) == -1)
+
+def test_micro_batch_scheduler_resolves_each_caller(service, readings, no_prediction_cache):
+    from backend.services.batch_scheduler import MicroBatchScheduler
+
+    scheduler = MicroBatchScheduler(service, max_batch_size=8, max_wait_ms=20.0)
+    try:
+        futures = [scheduler.submit(reading) for reading in readings * 3]
+        results = [f.result(timeout=10) for f in futures]
+    finally:
+        scheduler.stop()
+
+    expected = service.predict_batch(readings * 3)["results"]
+    for result, exp in zip(results, expected):
+        assert result["prediction"] == exp["prediction"]
+        assert result["failure_probability"] == pytest.approx(exp["failure_probability"])
+
+def test_prediction_cache_hits_on_quantized_repeat():
+    from backend.services.prediction_cache import PredictionCache
+
+    cache = PredictionCache(max_entries=2)
+    raw = np.array([[298.1, 308.6, 1551.0, 42.8, 0.0], [298.12, 308.58, 1551.2, 42.81, 0.0], [300.0, 310.0, 1500.0, 40.0, np.nan]])
+    keys = cache.keys_for(raw, "v1")
+    assert keys[0] == keys[1]
+    assert keys[2] is None
+    assert cache.keys_for(raw[:1], "v2")[0] != keys[0]
+
+    cache.put(keys[0], {"anomaly": False, "failure_probability": 0.1, "prediction": 0})
+    assert cache.get(keys[1])["failure_probability"] == 0.1
+
+    other = cache.keys_for(raw[:1] + 5.0, "v1") + cache.keys_for(raw[:1] + 10.0, "v1")
+    cache.put(other[0], {"anomaly": False, "failure_probability": 0.2, "prediction": 0})
+    cache.put(other[1], {"anomaly": True, "failure_probability": 0.9, "prediction": 1})
+    assert len(cache) == 2
+    assert cache.get(keys[0]) is None
+
+def test_compiled_engine_roundtrips_through_memory_map(service, tmp_path):
+    from backend.services.compiled_forest import CompiledForestEngine
+
+    engine = CompiledForestEngine(service.failure_model, service.anomaly_model)
+    engine.save(str(tmp_path))
+    mapped = CompiledForestEngine.load(str(tmp_path), mmap_mode="r")
+    assert isinstance(mapped._children, np.memmap)
+
+    X = service.drift_detector.reference_data[:100]
+    expected, actual = engine.score(X), mapped.score(X)
+    np.testing.assert_array_equal(actual.failure_proba, expected.failure_proba)
+    np.testing.assert_array_equal(actual.anomaly_score, expected.anomaly_score)
+
+def test_binary_and_json_scoring_agree_within_float32_rounding(service, no_prediction_cache):
+    pd = pytest.importorskip("pandas")
+    from backend.schemas import wire
+    from backend.services.ml_service import BASE_FEATURES
+
+    csv = os.path.join(os.path.dirname(__file__), "..", "data", "raw", "ai4i2020.csv")
+    raw = pd.read_csv(csv, encoding="utf-8-sig")[BASE_FEATURES].to_numpy(np.float64)[:5000]
+    _, decoded = wire.decode(wire.encode(raw))
+    as_json = service.predict_matrix(raw)["results"]
+    as_binary = service.predict_matrix(decoded)["results"]
+
+    prob_diff = np.array([abs(a["failure_probability"] - b["failure_probability"]) for a, b in zip(as_json, as_binary)])
+    label_flips = sum(a["prediction"] != b["prediction"] or a["anomaly"] != b["anomaly"] for a, b in zip(as_json, as_binary))
+    assert prob_diff.max() <= 0.05  # a handful of trees at most
+    assert (prob_diff > 0).mean() < 0.01 and label_flips <= len(raw) * 0.001
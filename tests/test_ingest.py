@@ -0,0 +1,162 @@
+import pytest
+import numpy as np
+from backend.utils.metrics import metrics_collector
+
+def test_ingest_pipeline_batches_and_rejects_when_full(service, readings):
+    import asyncio
+    from backend.services.ingest_queue import IngestPipeline, IngestQueueFull
+
+    async def run():
+        pipeline = IngestPipeline(service, max_depth=4, workers=1, max_batch_size=4, max_wait_ms=50.0)
+        processed = pipeline._processed.value
+        for reading in readings + readings[:1]:
+            pipeline.offer(reading)
+        with pytest.raises(IngestQueueFull):
+            pipeline.offer(readings[0])  # consumer has not run yet, queue is at depth
+        await pipeline.stop(drain=True)
+        return pipeline._processed.value - processed
+
+    assert asyncio.run(run()) == 4
+
+def test_ingest_consumer_survives_store_failures(service, readings):
+    import asyncio
+    from backend.services.ingest_queue import IngestPipeline
+
+    class BrokenStore:
+        def append(self, *args):
+            raise OSError("disk full")
+
+    async def run():
+        pipeline = IngestPipeline(service, max_depth=8, workers=1, max_batch_size=2, max_wait_ms=1.0, store=BrokenStore())
+        store_failed, processed = pipeline._store_failed.value, pipeline._processed.value
+        for reading in readings:
+            pipeline.offer(reading)
+        await asyncio.wait_for(pipeline._queue.join(), 10)
+        alive = all(not task.done() for task in pipeline._consumers)
+        await pipeline.stop()
+        return alive, pipeline._store_failed.value - store_failed, pipeline._processed.value - processed
+
+    alive, store_failed, processed = asyncio.run(run())
+    assert alive and store_failed == len(readings) and processed == len(readings)
+
+def test_bulk_ndjson_stream_scores_in_order_across_chunk_boundaries(service, readings):
+    import asyncio, gzip, json
+    from backend.services.bulk_ingest import score_ndjson_stream
+
+    lines = [json.dumps({**json.loads(r.model_dump_json(by_alias=True, exclude_none=True)), "Type": " h"}) for r in readings]
+    body = gzip.compress(("\n".join(lines[:2] + ["{not json"] + lines[2:]) + "\n").encode())
+
+    def type_h_samples():
+        report = service.segment_drift.report("type:H") or {}
+        return report.get("samples", report.get("current_samples", 0))  # the latter below MIN_SAMPLES
+
+    before = type_h_samples()
+
+    async def chunks():
+        for i in range(0, len(body), 7):  # split records and the gzip stream at odd offsets
+            yield body[i:i + 7]
+
+    async def run():
+        return [json.loads(line) async for part in score_ndjson_stream(chunks(), gzipped=True, chunk_rows=2)
+                for line in part.decode().splitlines()]
+
+    out = asyncio.run(run())
+    expected = service.predict_batch(readings)["results"]
+    assert [o.get("line") for o in out[:-1]] == [1, 2, 3, 4]
+    assert "error" in out[2]
+    for got, exp in zip(out[:2] + out[3:4], expected):
+        assert got["failure_probability"] == pytest.approx(exp["failure_probability"])
+    assert out[-1]["summary"]["rows"] == 3 and out[-1]["summary"]["errors"] == 1
+    # Type reaches the per-Type drift sketches, as it does through /predict and /ingest
+    assert type_h_samples() == before + len(readings)
+
+def test_bulk_ndjson_stream_keeps_bad_lines_in_place_and_survives_scoring_errors(service, readings, monkeypatch):
+    import asyncio, json
+    from backend.services import bulk_ingest
+    from backend.services.model_registry import ModelVersionNotLoaded
+
+    good = [r.model_dump_json(by_alias=True, exclude_none=True) for r in readings]
+    body = "\n".join([good[0], "[]", good[1], "{not json", good[2]]).encode()
+    calls = []
+    predict_matrix = service.predict_matrix
+
+    def scoring(raw, *args):
+        calls.append(len(raw))
+        if len(calls) > 1:
+            raise ModelVersionNotLoaded("v1-canary")  # evicted mid-upload
+        return predict_matrix(raw, *args)
+
+    monkeypatch.setattr(service, "predict_matrix", scoring)
+
+    async def run(data):
+        async def chunks():
+            yield data
+        return [json.loads(line) async for part in bulk_ingest.score_ndjson_stream(chunks(), chunk_rows=8)
+                for line in part.decode().splitlines()]
+
+    out = asyncio.run(run(body))
+    assert calls == [3]  # bad lines no longer split the chunk into several scoring calls
+    assert [o["line"] for o in out[:-1]] == [1, 2, 3, 4, 5]
+    assert ["error" in o for o in out[:-1]] == [False, True, False, True, False]
+
+    out = asyncio.run(run(body))
+    assert [o["line"] for o in out[:-1]] == [1, 2, 3, 4, 5] and all("error" in o for o in out[:-1])
+    assert "Scoring failed" in out[0]["error"]
+    assert out[-1]["summary"]["rows"] == 0 and out[-1]["summary"]["errors"] == 5
+
+def test_prediction_store_persists_and_filters(service, readings, tmp_path):
+    from backend.services.prediction_store import PredictionStore
+
+    store = PredictionStore(str(tmp_path / "predictions.db"), flush_rows=2, flush_interval=60.0)
+    output = service.predict_batch(readings)
+    raw = np.array([[r.air_temperature, r.process_temperature, r.rotational_speed, r.torque, np.nan] for r in readings])
+    store.append(raw, [1, 2, 1], output["results"], "v1", ts=1000.0)
+    store.append(raw[:1], [1], output["results"][:1], "v1", ts=2000.0)
+    store.flush()
+
+    everything = store.query()
+    assert everything["aggregates"]["count"] == 4
+    device = store.query(udi=1, start=1500.0)
+    assert device["aggregates"]["count"] == 1
+    assert device["rows"][0]["ts"] == 2000.0 and device["rows"][0]["tool_wear"] is None
+    assert store.query(udi=2, end=1000.0)["aggregates"]["count"] == 0
+    store.close()
+
+def test_prediction_store_appends_without_waiting_for_the_writer_to_open(service, readings, tmp_path):
+    import sqlite3
+    import threading
+    import time
+    from backend.services.prediction_store import PredictionStore
+
+    output = service.predict_batch(readings)
+    raw = np.array([[r.air_temperature, r.process_temperature, r.rotational_speed, r.torque, r.tool_wear] for r in readings])
+
+    # Another process holds the file: the writer waits on the busy timeout, the caller must not
+    path = str(tmp_path / "predictions.db")
+    locker = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    locker.execute("BEGIN EXCLUSIVE")
+    locked = PredictionStore(path, flush_rows=1)
+    started = time.perf_counter()
+    locked.append(raw, [1, 2, 3], output["results"], "v1")
+    assert time.perf_counter() - started < 0.1
+    threading.Timer(0.3, lambda: locker.execute("COMMIT")).start()
+    locked.flush()
+    assert locked.query()["aggregates"]["count"] == 3
+    locked.close()
+    locker.close()
+
+    # The directory does not exist yet: the error is reported and the open retried until it does
+    directory = tmp_path / "missing"
+    store = PredictionStore(str(directory / "predictions.db"), flush_rows=1, reopen_seconds=0.05)
+    store.append(raw, [1, 2, 3], output["results"], "v1")
+    store.flush()  # returns once the open has failed instead of waiting out its timeout
+    assert store.status()["up"] is False and store.status()["pending"] == 3 and "unable to open" in store.open_error
+    assert "prediction_store_up 0" in metrics_collector.generate_latest()
+
+    directory.mkdir()
+    deadline = time.monotonic() + 5
+    while store.open_error is not None and time.monotonic() < deadline:
+        time.sleep(0.02)
+    store.flush()
+    assert store.status()["up"] is True and store.query()["aggregates"]["count"] == 3
+    store.close()
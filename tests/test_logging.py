@@ -0,0 +1,33 @@
+def test_logging_is_sampled_per_message_and_drops_instead_of_blocking():
+    import logging
+    import queue
+    from backend.utils.logger import DroppingQueueHandler, SamplingFilter, _dropped, parse_sample_rates
+
+    assert parse_sample_rates("Prediction successful=0.01; Received prediction request=2") == {
+        "Prediction successful": 0.01, "Received prediction request": 1.0
+    }
+
+    log_queue = queue.Queue(2)
+    logger = logging.getLogger("test_sampled_logging")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.addHandler(DroppingQueueHandler(log_queue))
+    logger.addFilter(SamplingFilter({"Prediction successful": 0.0, "Z-score anomaly": 0.0}))
+    sampled = _dropped.labels("sampled").value
+    full = _dropped.labels("queue_full").value
+
+    logger.info("Prediction successful", extra={"result": {"prediction": 0}})
+    logger.error("Prediction successful")  # errors are never sampled out
+    score = 2.5
+    logger.info(f"Z-score anomaly_score={score:.3f}", extra={"sample_key": "Z-score anomaly"})
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        logger.exception("Prediction failed %s", "for udi 7")
+    logger.info("Models loaded successfully.")  # queue holds two records
+
+    assert _dropped.labels("sampled").value == sampled + 2
+    assert _dropped.labels("queue_full").value == full + 1
+    first, second = log_queue.get_nowait(), log_queue.get_nowait()
+    assert first.levelno == logging.ERROR and second.msg == "Prediction failed for udi 7"
+    assert second.exc_info is None and "ValueError: boom" in second.exc_text
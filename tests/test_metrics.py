@@ -0,0 +1,96 @@
+from backend.utils.metrics import metrics_collector
+
+def test_labelled_stage_histograms_and_request_middleware_render():
+    import asyncio
+    from backend.utils.http_metrics import RequestMetricsMiddleware
+    from backend.utils.metrics import MetricsCollector
+
+    collector = MetricsCollector()
+    span = collector.stage("predict", "scale")
+    assert collector.stage("predict", "scale") is span
+    with span.time():
+        pass
+    collector.summary("bench_seconds", "doc", ("path",)).labels(path='a"b').observe(0.5)
+    text = collector.generate_latest()
+    assert text.count("# TYPE stage_duration_seconds histogram") == 1
+    assert 'stage_duration_seconds_bucket{operation="predict",stage="scale",le="+Inf"} 1' in text
+    assert 'bench_seconds_count{path="a\\"b"} 1' in text
+
+    class Route:
+        path = "/drift/segments/{key}"
+
+    async def app(scope, receive, send):
+        scope["route"] = Route
+        assert middleware.in_flight == 1
+        await send({"type": "http.response.start", "status": 404, "headers": []})
+
+    async def send(message):
+        pass
+
+    middleware = RequestMetricsMiddleware(app)
+    asyncio.run(middleware({"type": "http", "method": "GET", "path": "/api/drift/segments/device:1"}, None, send))
+    assert middleware.in_flight == 0
+    assert ('http_request_duration_seconds_count{method="GET",route="/api/drift/segments/{key}",status="404"}'
+            in metrics_collector.generate_latest())
+
+def test_sharded_counters_sum_across_threads_with_endpoint_labels():
+    import threading
+    from backend.utils.metrics import MetricsCollector, current_endpoint
+
+    collector = MetricsCollector()
+    family = collector.counter("bench_total", "doc", ("endpoint",))
+    histogram = collector.histogram("bench_seconds", "doc", (0.5,))
+
+    def work():
+        counter = family.labels("/api/predict")
+        for _ in range(5000):
+            counter.inc()
+            histogram.observe(0.25)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    text = collector.generate_latest()
+    assert 'bench_total{endpoint="/api/predict"} 40000' in text
+    assert 'bench_seconds_bucket{le="0.5"} 40000' in text and "bench_seconds_sum 10000.0" in text
+    # Status codes passed as ints and as strings are one series
+    assert family.labels(404) is family.labels("404")
+
+    token = current_endpoint.set("/api/predict/batch")
+    try:
+        collector.record_predictions("v1", n_normal=2, n_anomalies=1, n_failures=1, n_anomaly_only=0)
+    finally:
+        current_endpoint.reset(token)
+    text = collector.generate_latest()
+    assert 'predictions_total{model_version="v1",endpoint="/api/predict/batch",outcome="normal"} 2' in text
+    assert 'predictions_total{model_version="v1",endpoint="/api/predict/batch",outcome="failure"} 1' in text
+    assert 'anomalies_total{model_version="v1",endpoint="/api/predict/batch"} 1' in text
+
+def test_worker_utilization_is_labelled_by_version_and_dropped_on_shutdown():
+    import time
+    from backend.services.inference_executor import _WorkerUtilization
+
+    class FakeExecutor:
+        def __init__(self, version, busy):
+            self.version, self._busy, self._started = version, busy, time.monotonic() - 10.0
+
+        def busy_seconds(self):
+            return self._busy, self._started
+
+    utilization = _WorkerUtilization()
+    v1, v2 = FakeExecutor("v1", {0: 5.0}), FakeExecutor("v2", {0: 1.0, 1: 2.0})
+    utilization.add(v1)
+    utilization.add(v2)
+    text = "\n".join(utilization.render())
+    assert 'inference_worker_busy_seconds_total{version="v1",worker="0"} 5.0' in text
+    assert 'inference_worker_utilization{version="v2",worker="1"}' in text
+    assert text.count("# TYPE inference_worker_utilization gauge") == 1
+
+    reloaded = FakeExecutor("v1", {0: 0.0})
+    utilization.add(reloaded)
+    utilization.remove(v1)  # the replaced pool shutting down leaves the reload's series alone
+    utilization.remove(v2)
+    text = "\n".join(utilization.render())
+    assert 'version="v2"' not in text and 'inference_worker_busy_seconds_total{version="v1",worker="0"} 0.0' in text
@@ -0,0 +1,76 @@
+import pytest
+import numpy as np
+
+def test_model_registry_hot_swap_and_budget_eviction(service):
+    from backend.services.model_registry import ModelBundle, ModelRegistry, ModelVersionNotLoaded
+
+    # Every tag points at the v1 artifacts; only the bookkeeping differs
+    registry = ModelRegistry(lambda v: ModelBundle(v, service.artifacts_dir), memory_budget_bytes=1)
+    old = registry.activate("v1")
+    new = registry.load("v1-canary")
+    assert registry.get("v1-canary") is new
+    assert registry.get() is old
+
+    registry.activate("v1-canary")
+    assert registry.get() is new
+    # Over budget: the no-longer-active version is evicted, the active one never is
+    with pytest.raises(ModelVersionNotLoaded):
+        registry.get("v1")
+    assert {v["version"]: v["status"] for v in registry.versions()} == {"v1": "evicted", "v1-canary": "ready"}
+
+    with pytest.raises(ValueError):
+        registry.load("../v1")
+
+def test_reloading_a_version_drops_its_cached_results(service, readings):
+    cache = service.prediction_cache
+    service.predict(readings[0])
+    old = service.registry.active
+    raw = np.array([[readings[0].air_temperature, readings[0].process_temperature, readings[0].rotational_speed,
+                     readings[0].torque, readings[0].tool_wear]])
+    assert cache.get(cache.keys_for(raw, old.cache_namespace)[0]) is not None
+
+    new = service.registry.load(old.version)  # same tag, e.g. after the artifacts were retrained
+    assert service.registry.active is new and new.cache_namespace != old.cache_namespace
+    assert cache.get(cache.keys_for(raw, old.cache_namespace)[0]) is None
+    assert cache.get(cache.keys_for(raw, new.cache_namespace)[0]) is None
+    service.predict(readings[0])
+    assert cache.get(cache.keys_for(raw, new.cache_namespace)[0]) is not None
+
+def test_registry_defers_shutdown_of_swapped_or_evicted_bundle_until_released(service):
+    import threading
+    from backend.services.model_registry import ModelBundle, ModelRegistry
+
+    shut_down = []
+
+    class TrackedBundle(ModelBundle):
+        def shutdown(self):
+            shut_down.append(self)
+            super().shutdown()
+
+    registry = ModelRegistry(lambda v: TrackedBundle(v, service.artifacts_dir), memory_budget_bytes=1)
+    first = registry.activate("v1")
+    holding, swapped = threading.Event(), threading.Event()
+    scored = []
+
+    def in_flight_request():
+        with registry.lease() as bundle:
+            holding.set()
+            swapped.wait(10)
+            # The request finishes on the bundle it started with, after it was replaced
+            scored.append(bundle.score(bundle.scale_features(np.zeros((1, 5)))))
+
+    request = threading.Thread(target=in_flight_request)
+    request.start()
+    holding.wait(10)
+    second = registry.load("v1")  # replaces the leased bundle
+    assert registry.get() is second and first not in shut_down
+    swapped.set()
+    request.join(10)
+    assert scored and shut_down == [first]
+
+    # Eviction of a leased (pinned) version waits for the lease as well
+    with registry.lease("v1") as pinned:
+        registry.load("v1-canary")
+        registry.activate("v1-canary")  # over budget: v1 is evicted
+        assert pinned not in shut_down
+    assert shut_down[-1] is pinned
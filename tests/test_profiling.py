@@ -0,0 +1,44 @@
+import pytest
+
+def test_stack_sampler_collapses_busy_thread_and_request_profiler_is_sampled():
+    import threading
+    from backend.utils.profiling import ProfilerBusy, RequestProfiler, StackSampler
+
+    stop = threading.Event()
+
+    def spin_for_profiler():
+        while not stop.is_set():
+            sum(range(1000))
+
+    worker = threading.Thread(target=spin_for_profiler, name="spinner")
+    worker.start()
+    sampler = StackSampler()
+    try:
+        result = sampler.sample(0.3, interval=0.005)
+    finally:
+        stop.set()
+        worker.join()
+    lines = result["collapsed"].splitlines()
+    assert result["samples"] > 10
+    spinner = [line for line in lines if line.startswith("thread:spinner;")]
+    assert spinner and all("spin_for_profiler" in line for line in spinner)
+    stack, count = spinner[0].rsplit(" ", 1)
+    assert int(count) > 0
+
+    sampler._lock.acquire()
+    with pytest.raises(ProfilerBusy):
+        sampler.sample(0.01)
+    sampler._lock.release()
+
+    profiler = RequestProfiler()
+    assert not profiler.enabled and profiler.begin() is None  # fraction 0: never sampled
+    profiler.start(1.0)
+    profile = profiler.begin()
+    assert profile is not None and profiler.begin() is None  # one request at a time
+    sum(range(1000))
+    profiler.end("/api/predict", profile)
+    report = profiler.report(top=5)
+    window = report["in_flight"]["/api/predict"]
+    assert report["scope"].startswith("interpreter-wide")
+    assert window["requests"] == 1 and window["wall_seconds"] > 0
+    assert "function calls" in window["stats"]
@@ -0,0 +1,115 @@
+import gzip
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.api import routes
+from backend.auth.utils import create_access_token
+from backend.main import app
+
+READING = {"Air temperature [K]": 298.1, "Process temperature [K]": 308.6, "Rotational speed [rpm]": 1551, "Torque [Nm]": 42.8, "Tool wear [min]": 0}
+CAR_READING = {"engine_rpm": 2400, "oil_pressure_psi": 40, "coolant_temp_c": 90, "vibration_level": 0.3, "engine_temp_c": 95}
+
+@pytest.fixture
+def client(service):
+    # No lifespan: its shutdown would stop the session's loaded models
+    return TestClient(app)
+
+def auth(role: str = "user") -> dict:
+    return {"Authorization": f"Bearer {create_access_token({'sub': f'{role}@example.com', 'role': role})}"}
+
+def test_streaming_sequence_session_lifecycle(client):
+    device = "route-test-car"
+    first = client.post("/api/predict/sequence/stream", json={"device_id": device, "reading": CAR_READING})
+    assert first.status_code == 200
+    assert first.json()["device_id"] == device and first.json()["window_samples"] == 1
+    assert 0.0 <= first.json()["failure_probability"] <= 1.0
+
+    batch = client.post("/api/predict/sequence/stream/batch", json={"steps": [
+        {"device_id": device, "reading": CAR_READING},
+        {"device_id": "route-test-other", "reading": CAR_READING},
+    ]})
+    assert batch.status_code == 200 and batch.json()["batch_size"] == 2
+    assert [r["window_samples"] for r in batch.json()["results"]] == [2, 1]
+
+    assert client.delete(f"/api/predict/sequence/stream/{device}").json() == {"status": "closed", "device_id": device}
+    assert client.delete(f"/api/predict/sequence/stream/{device}").status_code == 404
+    assert client.post("/api/predict/sequence/stream", json={"device_id": "", "reading": CAR_READING}).status_code == 422
+    assert client.post("/api/predict/sequence/stream/batch", json={"steps": []}).status_code == 422
+
+def test_ingest_returns_429_with_retry_after_when_the_queue_is_full(client, monkeypatch):
+    class FullPipeline:
+        def offer(self, data):
+            raise routes.IngestQueueFull("Ingest queue is full (1 readings)")
+
+    monkeypatch.setattr(routes, "ingest_pipeline", FullPipeline())
+    response = client.post("/api/ingest", json=READING)
+    assert response.status_code == 429 and response.headers["Retry-After"] == "1"
+    assert "full" in response.json()["detail"]
+
+def test_bulk_ingest_accepts_gzip_and_rejects_other_encodings(client, monkeypatch, tmp_path):
+    from backend.services.prediction_store import PredictionStore
+
+    store = PredictionStore(str(tmp_path / "predictions.db"))
+    monkeypatch.setattr(routes, "prediction_store", store)
+    body = gzip.compress((json.dumps(READING) + "\n{not json\n" + json.dumps({**READING, "UDI": 7}) + "\n").encode())
+
+    response = client.post("/api/ingest/bulk", content=body, headers={"Content-Encoding": "gzip"})
+    assert response.status_code == 200 and response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line.get("line") for line in lines[:-1]] == [1, 2, 3]
+    assert "error" in lines[1] and lines[2]["udi"] == 7 and "failure_probability" in lines[2]
+    assert lines[-1]["summary"]["rows"] == 2 and lines[-1]["summary"]["errors"] == 1
+
+    store.flush()
+    assert store.query()["aggregates"]["count"] == 2
+    store.close()
+
+    assert client.post("/api/ingest/bulk", content=body, headers={"Content-Encoding": "br"}).status_code == 415
+    assert client.post("/api/ingest/bulk?model_version=v404", content=b"").status_code == 404
+
+def test_predictions_require_a_valid_token(client, monkeypatch, tmp_path):
+    from backend.services.prediction_store import PredictionStore
+
+    assert client.get("/api/predictions").status_code == 401
+    assert client.get("/api/predictions", headers={"Authorization": "Bearer not-a-token"}).status_code == 401
+
+    monkeypatch.setattr(routes, "prediction_store", PredictionStore(str(tmp_path / "predictions.db")))
+    response = client.get("/api/predictions?udi=7&limit=5", headers=auth())
+    assert response.status_code == 200 and response.json()["aggregates"]["count"] == 0 and response.json()["rows"] == []
+
+    monkeypatch.setattr(routes, "prediction_store", None)
+    assert client.get("/api/predictions", headers=auth()).status_code == 404
+
+@pytest.mark.parametrize("method, path", [
+    ("get", "/api/models"),
+    ("post", "/api/models/v1/activate"),
+    ("get", "/api/admin/profile/requests"),
+    ("post", "/api/admin/profile/memory/stop"),
+])
+def test_admin_routes_reject_anonymous_and_non_admin_users(client, method, path):
+    assert client.request(method, path).status_code == 401
+    assert client.request(method, path, headers=auth("user")).status_code == 403
+
+def test_admin_routes_serve_admins(client):
+    models = client.get("/api/models", headers=auth("admin"))
+    assert models.status_code == 200 and any(v["version"] == "v1" for v in models.json()["versions"])
+    assert client.post("/api/models/..%2Fv1/load", headers=auth("admin")).status_code in (400, 404)
+
+    profile = client.get("/api/admin/profile/requests", headers=auth("admin"))
+    assert profile.status_code == 200 and profile.json()["enabled"] is False
+
+def test_segment_drift_routes(client):
+    assert client.post("/api/predict/batch", json={"readings": [{**READING, "UDI": 4242, "Type": "h"}]}, headers=auth()).status_code == 200
+
+    top = client.get("/api/drift/segments?top=5")
+    assert top.status_code == 200 and set(top.json()) == {"segments", "tracked_keys"}
+    assert client.get("/api/drift/segments?dimension=vendor").status_code == 422
+
+    merged = client.get("/api/drift/segments/merged?dimension=type")
+    assert merged.status_code == 200 and merged.json()["keys"] >= 1
+
+    device = client.get("/api/drift/segments/device:4242")
+    assert device.status_code == 200 and device.json()["key"] == "device:4242"
+    assert client.get("/api/drift/segments/device:no-such-group").status_code == 404
@@ -1,4 +1,5 @@
 import pytest
+import numpy as np
 from backend.schemas.request import MachineData
 
 def test_machine_data_schema():
@@ -25,3 +26,25 @@ def test_machine_data_schema_invalid():
     }
     with pytest.raises(ValueError):
         MachineData(**invalid_data)
+
+def test_binary_wire_format_roundtrip_and_validation():
+    from backend.schemas import wire
+
+    raw = np.array([[298.1, 308.6, 1551.0, 42.8, np.nan], [302.5, 311.2, 1282.0, 68.1, 215.0]])
+    udis, decoded = wire.decode(wire.encode(raw, np.array([7, wire.UDI_MISSING])))
+    np.testing.assert_array_equal(decoded, raw.astype(np.float32))
+    assert wire.udi_list(udis, 2) == [7, None]
+
+    no_udi = wire.encode(raw)
+    assert len(no_udi) == wire.HEADER_SIZE + 2 * 20
+    assert wire.decode(no_udi)[0] is None
+    with pytest.raises(wire.WireFormatError):
+        wire.decode(no_udi[:-1])
+    with pytest.raises(wire.WireFormatError):
+        wire.decode(b"JUNK" + no_udi[4:])
+
+def test_machine_type_is_normalized_and_unknown_values_are_untracked():
+    base = {"Air temperature [K]": 300.0, "Torque [Nm]": 40.0}
+    assert MachineData(**base, Type=" m ").machine_type == "M"
+    for value in ("", "Low", "X", 3, None):
+        assert MachineData(**base, Type=value).machine_type is None
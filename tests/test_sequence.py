@@ -0,0 +1,104 @@
+import pytest
+import numpy as np
+
+def test_sequence_session_matches_stateless_window_and_evicts():
+    from backend.services.sequence_models import sequence_models
+    from backend.services.sequence_sessions import SequenceSessionStore, zscore_score, zscore_probability
+
+    scaler = sequence_models.inference_scaler
+    rng = np.random.default_rng(1)
+    raw = rng.normal([2500, 40, 90, 0.3, 95], [600, 8, 6, 0.1, 5], size=(15, 5))
+
+    store = SequenceSessionStore(sequence_models, window_size=10, max_sessions=2, ttl_seconds=0, lstm=False)
+    for i in range(len(raw)):
+        step = store.step("car-1", raw[i])
+        window = scaler.transform(raw[max(0, i - 9):i + 1])
+        expected = zscore_probability(zscore_score(window[-1], window[0] if len(window) >= 2 else None))
+        assert step.samples == len(window)
+        assert step.failure_probability == pytest.approx(expected, abs=1e-12)
+
+    store.step("car-2", raw[0])
+    store.step("car-3", raw[0])
+    assert len(store) == 2 and not store.end("car-1")
+
+def test_stateful_lstm_steps_match_full_sequence_forward():
+    from backend.services.sequence_models import sequence_models
+    from backend.services.sequence_sessions import SequenceSessionStore
+
+    scaler = sequence_models.inference_scaler
+    rng = np.random.default_rng(2)
+    raw = rng.normal(scaler.mean_, scaler.scale_, size=(12, 5))
+
+    store = SequenceSessionStore(sequence_models, window_size=10, max_sessions=2, ttl_seconds=0, lstm=True, lstm_weight=0.5)
+    store.step("other", raw[0])  # a second device must not disturb car-1's state
+    steps = [store.step("car-1", row) for row in raw]
+
+    scaled = scaler.transform(raw)
+    for t in (0, 5, 11):
+        expected = sequence_models.window_probability(scaled[:t + 1])
+        assert steps[t].lstm_probability == pytest.approx(expected, abs=1e-5)
+    assert steps[-1].failure_probability == pytest.approx(0.5 * steps[-1].zscore_probability + 0.5 * steps[-1].lstm_probability)
+
+    # Ending a session zeroes its slot for the next device
+    store.end("car-1")
+    fresh = store.step("car-9", raw[0])
+    assert fresh.lstm_probability == pytest.approx(steps[0].lstm_probability, abs=1e-6)
+
+def test_batched_lstm_variants_match_per_window_forward():
+    import torch
+    from types import SimpleNamespace
+    from backend.models.rnn_model import PredictiveRNN
+    from backend.services.lstm_batching import LSTMWindowBatcher
+
+    torch.manual_seed(0)
+    model = PredictiveRNN(input_size=5).eval()  # random weights: the shipped LSTM's output is nearly constant
+    rng = np.random.default_rng(3)
+    windows = [rng.normal(size=(n, 5)) for n in rng.integers(1, 11, size=40)]
+    with torch.inference_mode():
+        expected = [float(model(torch.as_tensor(w[None], dtype=torch.float32))[0, 0]) for w in windows]
+
+    for variant, tolerance in (("traced", 1e-5), ("quantized", 1e-2)):
+        batcher = LSTMWindowBatcher(SimpleNamespace(rnn_model=model), variant=variant, max_batch_size=64, max_wait_ms=50)
+        futures = [batcher.submit_raw(w) for w in windows]  # uneven lengths share one padded batch
+        got = [f.result(timeout=10) for f in futures]
+        batcher.stop()
+        assert got == pytest.approx(expected, abs=tolerance)
+
+def test_step_many_matches_sequential_steps():
+    from backend.services.sequence_models import sequence_models
+    from backend.services.sequence_sessions import SequenceSessionStore
+
+    scaler = sequence_models.inference_scaler
+    rng = np.random.default_rng(4)
+    raw = rng.normal(scaler.mean_, scaler.scale_, size=(9, 5))
+    devices = ["a", "b", "a", "c", "a", "b", "d", "c", "a"]  # repeats need several LSTM rounds
+
+    sequential = SequenceSessionStore(sequence_models, max_sessions=8, ttl_seconds=0, lstm=True, lstm_weight=0.5)
+    batched = SequenceSessionStore(sequence_models, max_sessions=8, ttl_seconds=0, lstm=True, lstm_weight=0.5)
+    expected = [sequential.step(d, row) for d, row in zip(devices, raw)]
+    got = batched.step_many(devices, raw)
+    for e, g in zip(expected, got):
+        assert g.samples == e.samples
+        assert g.zscore_probability == pytest.approx(e.zscore_probability, abs=1e-12)
+        assert g.lstm_probability == pytest.approx(e.lstm_probability, abs=1e-6)
+
+def test_sequence_windows_are_views_and_respect_vehicle_boundaries():
+    from backend.models.rnn_model import create_sequences, sequence_end_indices, SequenceWindowDataset, window_loader
+
+    data = np.arange(60, dtype=np.float32).reshape(12, 5)
+    windows = create_sequences(data, seq_length=4)
+    assert windows.shape == (9, 4, 5) and np.shares_memory(windows, data)
+    np.testing.assert_array_equal(windows[3], data[3:7])
+
+    vehicles = np.array(["a"] * 5 + ["b"] * 3 + ["c"] * 4)
+    ends = sequence_end_indices(len(data), 4, vehicles)
+    np.testing.assert_array_equal(ends, [3, 4, 11])  # vehicle b has too few rows for a window
+
+    targets = np.arange(12) % 2
+    dataset = SequenceWindowDataset(data, targets, seq_length=4, group_ids=vehicles)
+    batches = list(window_loader(dataset, batch_size=2, shuffle=True, seed=1))
+    assert [len(x) for x, _ in batches] == [2, 1]
+    seen = sorted(float(x[i, -1, 0]) for x, _ in batches for i in range(len(x)))
+    assert seen == [15.0, 20.0, 55.0]  # first feature of each window's last row
+    x, y = dataset[np.array([2])]
+    assert x.shape == (1, 4, 5) and y.tolist() == [[1.0]]